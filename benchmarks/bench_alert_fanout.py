@@ -0,0 +1,161 @@
+"""
+Alert fan-out when one price move triggers many alerts at once.
+
+- serial: the old check_markets: a blocking Twilio call then alert.save()
+          per alert, on the price loop
+- outbox: Monitor.evaluate: one bulk claim UPDATE and one multi-row INSERT
+          into the outbox, sent by the OutboxWorker (services/outbox.py)
+
+Twilio is a local stand-in on the real Messages endpoint, reached via the
+twilio client itself. It takes LATENCY_MS per request, answers 429 above
+RATE messages/s, and fails 1% of requests with a 500. The outbox worker's
+token bucket is set to the same RATE.
+
+"loop stall" is how long price evaluation is blocked; "all sent" is when
+the last message went out.
+
+Run from the project root:
+    python -m benchmarks.bench_alert_fanout [alerts] [latency_ms] [rate]
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+class TwilioStandIn:
+    def __init__(self, latency, rate, bad_numbers=()):
+        self.latency = latency
+        self.rate = rate
+        self.bad_numbers = set(bad_numbers) # answered 400 (invalid 'To' number)
+        self.window = []
+        self.accepted = 0
+        self.throttled = 0
+        self.errors = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+        self._rng = random.Random(9)
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                form = parse_qs(self.rfile.read(int(self.headers.get('Content-Length', 0))).decode())
+                time.sleep(stand_in.latency)
+                status = stand_in.decide(form.get('To', [''])[0].replace('whatsapp:', ''))
+                codes = {400: 21211, 429: 20429, 500: 20500}
+                body = json.dumps({'sid': 'SM' + '0' * 32, 'status': 'queued'} if status == 201
+                                  else {'code': codes[status], 'message': 'stand-in error', 'status': status})
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def decide(self, to=''):
+        with self._lock:
+            if to in self.bad_numbers:
+                self.rejected += 1
+                return 400
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1]
+            if len(self.window) >= self.rate:
+                self.throttled += 1
+                return 429
+            self.window.append(now)
+            if self._rng.random() < 0.01:
+                self.errors += 1
+                return 500
+            self.accepted += 1
+            return 201
+
+def serial(monitor, outbox, Alert, User, symbol, price):
+    # The original check_markets body
+    for alert in Alert.select(Alert, User).join(User).where(Alert.is_active == True):
+        if alert.condition == 'above' and price >= alert.target_price:
+            try:
+                outbox.twilio_send(alert.user.phone, monitor.get_strategic_phrase(symbol, alert.condition, alert.target_price))
+            except Exception as e:
+                pass
+            alert.is_active = False
+            alert.save()
+
+def seed(database, count):
+    from database import Alert, User
+    Alert.delete().execute()
+    User.delete().execute()
+    with database.atomic_write():
+        for i in range(count):
+            user = User.create(phone=f"+234{i:010d}")
+            Alert.create(user=user, symbol='BTCUSDT', target_price=100000 + i % 50, condition='above', is_active=True)
+
+def run(count, latency_ms, rate):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'alerts.db')}"
+    os.environ['TWILIO_ACCOUNT_SID'] = 'AC' + '0' * 32
+    os.environ['TWILIO_AUTH_TOKEN'] = 'bench'
+    os.environ['TWILIO_PHONE'] = '+15550000000'
+    import database
+    from database import Alert, User
+    import monitor
+    from database import OutboxMessage
+    from services import outbox
+
+    stand_in = TwilioStandIn(latency_ms / 1000, rate)
+    outbox.get_client().api.base_url = stand_in.url
+    database.init_db()
+    print(f"📣 {count} alerts crossing at once; Twilio stand-in {latency_ms}ms/request, {rate} msg/s\n")
+    print(f"{'mode':<10} | {'loop stall':>10} | {'delivered':>9} | {'failed':>6} | {'429s':>5} | {'all sent':>8} | {'queue p99':>9}")
+    print("-" * 76)
+
+    seed(database, count)
+    stand_in.throttled = 0
+    began = time.perf_counter()
+    serial(monitor, outbox, Alert, User, 'BTCUSDT', 200000)
+    elapsed = time.perf_counter() - began
+    print(f"{'serial':<10} | {elapsed:>9.2f}s | {stand_in.accepted:>9} | {count - stand_in.accepted:>6} | "
+          f"{stand_in.throttled:>5} | {elapsed:>7.2f}s | {'-':>9}")
+
+    seed(database, count)
+    stand_in.accepted = stand_in.throttled = 0
+    pipeline = monitor.Monitor()
+    worker = outbox.OutboxWorker(rate=rate, retry_delay=0.2, poll_interval=0.05)
+    stop = threading.Event()
+    thread = threading.Thread(target=worker.run, args=(stop,))
+    thread.start()
+
+    async def fan_out():
+        await pipeline.sync()
+        began = time.perf_counter()
+        await pipeline.evaluate('BTCUSDT', 200000)
+        stall = time.perf_counter() - began
+        while await pipeline.db_call(
+                lambda: OutboxMessage.select().where(OutboxMessage.status.in_(['queued', 'sending'])).exists()):
+            await asyncio.sleep(0.05)
+        return stall, time.perf_counter() - began
+
+    stall, elapsed = asyncio.run(fan_out())
+    stop.set()
+    thread.join()
+    worker.drain()
+    stats = worker.stats()
+    print(f"{'outbox':<10} | {stall:>9.2f}s | {stats['sent']:>9} | {stats['dead']:>6} | "
+          f"{stand_in.throttled:>5} | {elapsed:>7.2f}s | {stats['p99']:>8.2f}s")
+    still_active = Alert.select().where(Alert.is_active == True).count()
+    print(f"\n   alerts left active: {still_active}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 50)
@@ -0,0 +1,110 @@
+"""
+Alert evaluation with 1M active alerts across 500 symbols.
+
+- scan:   the old check_markets: every active alert compared against its
+          symbol's price on every pass
+- index:  AlertIndex: two bisects per symbol (sorted above/below thresholds)
+
+Reported per full pass (one price per symbol, what a 10s poll evaluates)
+and per single-symbol tick (what the stream evaluates), with prices near
+the thresholds so a few alerts cross each time. Also times building the
+index and keeping it current from SQLite: the old per-pass reload of every
+active alert against AlertIndex.sync() when nothing new was created.
+
+Run from the project root:
+    python -m benchmarks.bench_alert_index [alerts] [symbols]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+def make_alerts(count, symbols, rng):
+    bases = {f"S{i:03d}USDT": rng.uniform(0.1, 50000) for i in range(symbols)}
+    names = list(bases)
+    rows = []
+    for alert_id in range(1, count + 1):
+        symbol = names[alert_id % symbols]
+        condition = rng.choice(('above', 'below'))
+        offset = rng.uniform(0.001, 0.3)
+        target = bases[symbol] * (1 + offset if condition == 'above' else 1 - offset)
+        rows.append((alert_id, symbol, 'cross', condition, target, None, True))
+    return bases, rows
+
+def scan_pass(rows, prices):
+    fired = 0
+    for alert_id, symbol, _, condition, target, _, _ in rows:
+        price = prices[symbol]
+        if (condition == 'above' and price >= target) or (condition == 'below' and price <= target):
+            fired += 1
+    return fired
+
+def index_pass(index, prices):
+    return sum(len(index.triggered(symbol, price)) for symbol, price in prices.items())
+
+def timed(fn, repeat):
+    began = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - began) / repeat, result
+
+def run(count, symbols):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'alerts.db')}"
+    import database
+    from database import Alert, User
+    from services.alert_index import AlertIndex
+
+    rng = random.Random(5)
+    bases, rows = make_alerts(count, symbols, rng)
+    # Prices drift up to 0.3% from the base: a handful of alerts cross per symbol
+    prices = {symbol: base * (1 + rng.uniform(-0.003, 0.003)) for symbol, base in bases.items()}
+    print(f"🔔 {count:,} alerts across {symbols} symbols\n")
+
+    index = AlertIndex()
+    build, _ = timed(lambda: index.load(rows), 1)
+    expected = scan_pass(rows, prices)
+    assert index_pass(index, prices) == expected
+
+    print(f"{'':<26} | {'scan':>10} | {'index':>10} | speed-up")
+    print("-" * 62)
+    scan_full, _ = timed(lambda: scan_pass(rows, prices), 3)
+    index_full, _ = timed(lambda: index_pass(index, prices), 200)
+    print(f"{'full pass (all symbols)':<26} | {scan_full * 1000:>8.1f}ms | {index_full * 1000:>8.3f}ms | {scan_full / index_full:>6.0f}x")
+
+    symbol = next(iter(bases))
+    per_symbol = [r for r in rows if r[1] == symbol]
+    scan_tick, _ = timed(lambda: scan_pass(per_symbol, prices), 200)
+    index_tick, _ = timed(lambda: index.triggered(symbol, prices[symbol]), 20000)
+    print(f"{'one tick (per-symbol list)':<26} | {scan_tick * 1e6:>8.1f}us | {index_tick * 1e6:>8.2f}us | {scan_tick / index_tick:>6.0f}x")
+    print(f"\n   {expected} alerts cross per pass; index build {build:.2f}s")
+
+    churn = rows[:10000]
+    removed, _ = timed(lambda: [index.remove(r[0]) for r in churn], 1)
+    added, _ = timed(lambda: [index.add(*r) for r in churn], 1)
+    print(f"   incremental: {len(churn) / removed:,.0f} removes/s, {len(churn) / added:,.0f} adds/s")
+
+    database.init_db()
+    with database.atomic_write():
+        User.insert(phone="+2340000000000").execute()
+        for start in range(0, count, 5000):
+            Alert.insert_many([{'id': a, 'user': 1, 'symbol': s, 'condition': c, 'target_price': t, 'is_active': True}
+                               for a, s, _, c, t, _, _ in rows[start:start + 5000]]).execute()
+    # Fold the freshly seeded WAL into the main file, as a settled database would be
+    database.db.execute_sql('PRAGMA wal_checkpoint(TRUNCATE)')
+    synced = AlertIndex()
+    # What check_markets did on every pass
+    reload_all, _ = timed(lambda: list(Alert.select(Alert, User).join(User).where(Alert.is_active == True)), 1)
+    full_sync, _ = timed(lambda: synced.sync(full=True), 1)
+    incremental, new = timed(lambda: synced.sync(), 20)
+    print(f"\n{'keeping alerts current':<26} | {'time':>10}")
+    print("-" * 40)
+    print(f"{'reload all (old, per pass)':<26} | {reload_all * 1000:>8.0f}ms")
+    print(f"{'AlertIndex.sync(full=True)':<26} | {full_sync * 1000:>8.0f}ms")
+    print(f"{'AlertIndex.sync() (0 new)':<26} | {incremental * 1000:>8.3f}ms")
+    database.db.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 500)
@@ -0,0 +1,119 @@
+"""
+CoinGecko lookups the way swap used to make them (a new
+CoinGeckoPriceService per quote, so its lru_cache never hit: one
+/simple/price request per lookup) against the shared TTL cache.
+
+A local HTTP stand-in serves /simple/price and /coins/list with
+LATENCY_MS of simulated network delay and counts the requests.
+
+- sequential: lookups over HOT_COINS coins, one at a time
+- burst:      THREADS threads asking for the same cold coin at once
+              (request coalescing: should cost one request)
+- batch:      get_prices() for BATCH coins on a cold cache
+
+Run from the project root:
+    python -m benchmarks.bench_coingecko [lookups] [latency_ms]
+"""
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from pycoingecko import CoinGeckoAPI
+from services.coingecko_price import CoinGeckoPriceService, CoinIndex
+
+COINS = 2000
+HOT_COINS = 40
+THREADS = 50
+BATCH = 30
+
+def make_coins():
+    return [{'id': f"coin-{i}", 'symbol': f"c{i}", 'name': f"Coin {i}"} for i in range(COINS)]
+
+def start_server(latency):
+    coins = make_coins()
+    prices = {coin['id']: round(random.Random(i).uniform(0.01, 60000), 4) for i, coin in enumerate(coins)}
+    hits = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[0] += 1
+            time.sleep(latency)
+            url = urlparse(self.path)
+            if url.path.endswith('/coins/list'):
+                payload = coins
+            else:
+                query = parse_qs(url.query)
+                currencies = query['vs_currencies'][0].split(',')
+                payload = {coin_id: {vs: prices[coin_id] for vs in currencies}
+                           for coin_id in query['ids'][0].split(',') if coin_id in prices}
+            body = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}/api/v3/", hits
+
+def client(url):
+    cg = CoinGeckoAPI()
+    cg.api_base_url = url
+    return cg
+
+def old_lookup(url, symbol):
+    # The old swap path: a fresh service per quote, so a fresh lru_cache
+    data = client(url).get_price(ids=f"coin-{symbol[1:]}", vs_currencies='usdt')
+    return data[f"coin-{symbol[1:]}"]['usdt']
+
+def run(lookups, latency_ms):
+    url, hits = start_server(latency_ms / 1000)
+    snapshot = os.path.join(tempfile.mkdtemp(), 'coins.json')
+    service = CoinGeckoPriceService(ttl=60, cg=client(url), index=CoinIndex(snapshot))
+    service.index.build(service.cg)
+    rng = random.Random(3)
+    symbols = [f"c{rng.randrange(HOT_COINS)}" for _ in range(lookups)]
+    print(f"🦎 {lookups} lookups over {HOT_COINS} coins, {COINS} coins listed, {latency_ms}ms per request\n")
+    print(f"{'mode':<22} | {'time':>9} | {'http requests':>13}")
+    print("-" * 52)
+
+    def report(mode, fn):
+        hits[0] = 0
+        began = time.perf_counter()
+        fn()
+        print(f"{mode:<22} | {(time.perf_counter() - began) * 1000:>7.0f}ms | {hits[0]:>13}")
+
+    report('sequential (old)', lambda: [old_lookup(url, s) for s in symbols])
+    report('sequential (cache)', lambda: [service.get_price(s) for s in symbols])
+
+    def burst(lookup):
+        threads = [threading.Thread(target=lookup, args=('c1999',)) for _ in range(THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    report(f'burst x{THREADS} (old)', lambda: burst(lambda s: old_lookup(url, s)))
+    report(f'burst x{THREADS} (cache)', lambda: burst(service.get_price))
+
+    batch = [f"c{1000 + i}" for i in range(BATCH)]
+    report(f'{BATCH} coins (old)', lambda: [old_lookup(url, s) for s in batch])
+    service.clear_cache()
+    report(f'{BATCH} coins (get_prices)', lambda: service.get_prices(batch))
+
+    # A second process starts from the snapshot instead of /coins/list
+    hits[0] = 0
+    CoinIndex(snapshot).build(client(url))
+    print(f"\n   coin index from snapshot: {hits[0]} requests; service made {service.requests} in total")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 40)
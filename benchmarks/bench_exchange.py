@@ -0,0 +1,108 @@
+"""
+Swap-quote latency with a ccxt exchange built per call (the old
+services.exchange.get_exchange) against the shared ExchangeSession.
+
+The transport is mocked: ccxt.bybit.fetch is replaced by a function that
+sleeps LATENCY_MS and answers Bybit V5 shaped JSON for the endpoints
+ccxt uses (server time, instruments-info, tickers) over SYMBOLS spot
+pairs, so every number is ccxt's own work plus the simulated round trips.
+
+- per-call:  a new exchange per quote; fetch_ticker() first loads the
+             market list (every category) again
+- session:   one instance, markets loaded once, shared rate limiter
+- batch:     session.fetch_tickers() for all quoted symbols at once
+- restart:   a new session in a fresh process, markets from the disk cache
+
+Run from the project root:
+    python -m benchmarks.bench_exchange [quotes] [latency_ms]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse, parse_qs
+import ccxt
+from services.exchange import ExchangeSession
+
+SYMBOLS = 400
+
+def make_transport(latency):
+    rng = random.Random(4)
+    coins = [f"C{i:03d}" for i in range(SYMBOLS)]
+    prices = {f"{coin}USDT": rng.uniform(0.01, 60000) for coin in coins}
+    instruments = [{
+        'symbol': f"{coin}USDT", 'baseCoin': coin, 'quoteCoin': 'USDT', 'innovation': '0', 'status': 'Trading',
+        'marginTrading': 'none', 'lotSizeFilter': {'basePrecision': '0.0001', 'quotePrecision': '0.0001',
+                                                   'minOrderQty': '0.0001', 'maxOrderQty': '100000',
+                                                   'minOrderAmt': '1', 'maxOrderAmt': '2000000'},
+        'priceFilter': {'tickSize': '0.0001'},
+    } for coin in coins]
+    stats = {'requests': 0}
+
+    def ticker(symbol):
+        last = f"{prices[symbol]:.4f}"
+        return {'symbol': symbol, 'bid1Price': last, 'bid1Size': '1', 'ask1Price': last, 'ask1Size': '1',
+                'lastPrice': last, 'prevPrice24h': last, 'price24hPcnt': '0', 'highPrice24h': last,
+                'lowPrice24h': last, 'turnover24h': '0', 'volume24h': '0'}
+
+    def fetch(self, url, method='GET', headers=None, body=None):
+        stats['requests'] += 1
+        time.sleep(latency)
+        parsed = urlparse(url)
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        now = int(time.time() * 1000)
+        if parsed.path.endswith('/market/time'):
+            result = {'timeSecond': str(now // 1000), 'timeNano': str(now * 1000000)}
+        elif parsed.path.endswith('/market/instruments-info'):
+            rows = instruments if query.get('category') == 'spot' else []
+            result = {'category': query.get('category'), 'list': rows, 'nextPageCursor': ''}
+        elif parsed.path.endswith('/market/tickers'):
+            wanted = [query['symbol']] if 'symbol' in query else list(prices)
+            result = {'category': 'spot', 'list': [ticker(s) for s in wanted]}
+        else:
+            raise ccxt.NetworkError(f"stand-in has no {parsed.path}")
+        return {'retCode': 0, 'retMsg': 'OK', 'result': result, 'retExtInfo': {}, 'time': now}
+
+    return fetch, stats
+
+def per_call_exchange():
+    # The old get_exchange(), called by every get_price / swap quote
+    exchange = ccxt.bybit({
+        'apiKey': None,
+        'secret': None,
+        'enableRateLimit': True,
+        'options': {'defaultType': 'swap', 'adjustForTimeDifference': True, 'recvWindow': 10000},
+    })
+    exchange.options['defaultType'] = 'spot'
+    return exchange
+
+def run(quotes, latency_ms):
+    fetch, stats = make_transport(latency_ms / 1000)
+    ccxt.bybit.fetch = fetch
+    markets_file = os.path.join(tempfile.mkdtemp(), 'bybit_markets.json')
+    rng = random.Random(5)
+    symbols = [f"C{rng.randrange(40):03d}/USDT" for _ in range(quotes)]
+    print(f"🏦 {quotes} quotes, {SYMBOLS} spot pairs listed, mocked transport {latency_ms}ms per request\n")
+    print(f"{'mode':<9} | {'per quote':>10} | {'total':>8} | {'requests':>8}")
+    print("-" * 46)
+
+    def report(mode, fn, count):
+        stats['requests'] = 0
+        began = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - began
+        print(f"{mode:<9} | {elapsed / count * 1000:>8.1f}ms | {elapsed:>7.2f}s | {stats['requests']:>8}")
+
+    report('per-call', lambda: [per_call_exchange().fetch_ticker(s)['last'] for s in symbols], quotes)
+    session = ExchangeSession('bybit', api_key='', secret='', markets_file=markets_file)
+    report('session', lambda: [session.call('fetch_ticker', s)['last'] for s in symbols], quotes)
+    unique = sorted(set(symbols))
+    report('batch', lambda: session.fetch_tickers(unique), len(unique))
+    restarted = ExchangeSession('bybit', api_key='', secret='', markets_file=markets_file)
+    report('restart', lambda: restarted.exchange, 1)
+    print(f"\n   session start includes loading markets; batch is per symbol for {len(unique)} symbols")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 30,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 40)
@@ -0,0 +1,106 @@
+"""
+Outbound calls through bare requests.get/post (a new connection per call)
+against the pooled keep-alive sessions of services/http_client.py.
+
+A local HTTP/1.1 stand-in keeps connections alive and charges
+HANDSHAKE_MS on every new connection, standing in for the TCP+TLS setup
+to Bybit / vtu.ng, plus LATENCY_MS per request. It counts the connections
+it accepted. FLAKY of the GETs answer 503: the shared client retries those
+with backoff, bare requests hands them to the caller.
+
+Run from the project root:
+    python -m benchmarks.bench_http_client [calls] [latency_ms] [handshake_ms]
+"""
+import json
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+from services.http_client import HttpClient
+
+FLAKY = 0.02
+
+class StandIn:
+    def __init__(self, latency, handshake):
+        self.connections = 0
+        self._rng = random.Random(6)
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # Headers and body go out as separate writes; without this,
+                # Nagle + delayed ACK add ~40ms to every keep-alive response
+                self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                with stand_in._lock:
+                    stand_in.connections += 1
+                time.sleep(handshake)
+
+            def _answer(self):
+                length = int(self.headers.get('Content-Length', 0))
+                if length:
+                    self.rfile.read(length)
+                time.sleep(latency)
+                with stand_in._lock:
+                    flaky = self.command == 'GET' and stand_in._rng.random() < FLAKY
+                status = 503 if flaky else 200
+                body = json.dumps({'code': 'success' if status == 200 else 'unavailable'}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = _answer
+            do_POST = _answer
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+def workload(get, post, url, calls):
+    """Mostly price reads with some purchases, like the web workers make."""
+    failed = 0
+    for i in range(calls):
+        if i % 5 == 4:
+            response = post(f"{url}/wp-json/api/v2/airtime", json={'request_id': i})
+        else:
+            response = get(f"{url}/v5/market/tickers")
+        failed += response.status_code != 200
+    return failed
+
+def run(calls, latency_ms, handshake_ms):
+    stand_in = StandIn(latency_ms / 1000, handshake_ms / 1000)
+    client = HttpClient(backoff=0.01)
+    print(f"🌐 {calls} calls, {latency_ms}ms per request, {handshake_ms}ms per new connection\n")
+    print(f"{'mode':<12} | {'per call':>9} | {'connections':>11} | {'failed':>6} | {'retried':>7}")
+    print("-" * 58)
+    modes = [
+        ('bare', lambda url, **kw: requests.get(url, timeout=5, **kw), lambda url, **kw: requests.post(url, timeout=5, **kw)),
+        ('http_client', client.get, client.post),
+    ]
+    for mode, get, post in modes:
+        stand_in.connections = 0
+        began = time.perf_counter()
+        failed = workload(get, post, stand_in.url, calls)
+        elapsed = time.perf_counter() - began
+        retried = sum(h['retries'] for h in client.stats().values()) if mode == 'http_client' else 0
+        print(f"{mode:<12} | {elapsed / calls * 1000:>7.1f}ms | {stand_in.connections:>11} | {failed:>6} | {retried:>7}")
+    for host, h in client.stats().items():
+        print(f"\n   {host}: {h['requests']} requests, {h['errors']} errors, {h['connections']} pooled connection(s), "
+              f"p50/p99 {h['p50'] * 1000:.1f}/{h['p99'] * 1000:.1f}ms")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 60)
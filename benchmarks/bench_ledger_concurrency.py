@@ -0,0 +1,106 @@
+"""
+P2P transfers between a few hot wallets from several processes at once:
+the old read-modify-write pattern (Wallet.get, check in Python, save)
+against ledger.transfer (conditional UPDATE debit, relative credit).
+
+Reports lost updates (money created or destroyed: the wallet total no
+longer matches), overdrawn wallets and SQL statements per transfer
+(counted with sqlite3's trace callback, BEGIN/COMMIT included).
+
+Run from the project root:
+    python -m benchmarks.bench_ledger_concurrency [workers] [transfers_per_worker]
+"""
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import database
+from database import User, Wallet, Transaction, JournalEntry, Posting, atomic_write
+
+USERS = 10 # few wallets -> constant contention
+START_BALANCE = 50000
+MODELS = [User, Wallet, Transaction, JournalEntry, Posting]
+
+def seed(url):
+    seed_db = database.connect_url(url, max_connections=1)
+    with seed_db.bind_ctx(MODELS):
+        seed_db.create_tables(MODELS)
+        with seed_db.atomic():
+            for i in range(1, USERS + 1):
+                user = User.create(phone=f"+234{i:010d}")
+                Wallet.create(user=user, currency='NGN', balance=START_BALANCE)
+    seed_db.close_all()
+
+def read_modify_write(sender, recipient, amount):
+    # The pre-ledger flow: read both wallets, check, then save absolute values
+    sender_wallet = Wallet.get(Wallet.user == sender, Wallet.currency == 'NGN')
+    recipient_wallet = Wallet.get(Wallet.user == recipient, Wallet.currency == 'NGN')
+    if sender_wallet.balance < amount:
+        return
+    with atomic_write():
+        sender_wallet.balance -= amount
+        sender_wallet.save()
+        recipient_wallet.balance += amount
+        recipient_wallet.save()
+        Transaction.create(user=sender, type='TRANSFER', currency='NGN', amount=amount, status='completed', tx_hash=recipient.phone)
+        Transaction.create(user=recipient, type='RECEIVE', currency='NGN', amount=amount, status='completed', tx_hash=sender.phone)
+
+def conditional_update(sender, recipient, amount):
+    import ledger
+    try:
+        ledger.transfer(sender, recipient, 'NGN', amount)
+    except ledger.InsufficientFunds:
+        pass
+
+def worker(mode, transfers, seed_value, results):
+    rng = random.Random(seed_value)
+    transfer = database.retry_if_busy(read_modify_write if mode == 'read-modify-write' else conditional_update)
+    database.db.connect()
+    statements = [0]
+    database.db.connection().set_trace_callback(lambda sql: statements.__setitem__(0, statements[0] + 1))
+    users = list(User.select())
+    statements[0] = 0
+    began = time.perf_counter()
+    for _ in range(transfers):
+        sender, recipient = rng.sample(users, 2)
+        transfer(sender, recipient, rng.randint(1, 2000))
+    elapsed = time.perf_counter() - began
+    database.db.close()
+    results.put((statements[0], elapsed))
+
+def run_mode(mode, workers, transfers):
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'ledger.db')}"
+        seed(url)
+        os.environ['DATABASE_URL'] = url
+        ctx = multiprocessing.get_context('spawn')
+        results = ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(mode, transfers, i, results)) for i in range(workers)]
+        for p in procs:
+            p.start()
+        collected = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+        check_db = database.connect_url(url, max_connections=1)
+        total, overdrawn = check_db.execute_sql(
+            'SELECT SUM(balance), SUM(CASE WHEN balance < 0 THEN 1 ELSE 0 END) FROM wallet').fetchone()
+        check_db.close_all()
+
+    ops = workers * transfers
+    return (sum(c[0] for c in collected) / ops, ops / max(c[1] for c in collected),
+            total - USERS * START_BALANCE, overdrawn)
+
+def run(workers, transfers):
+    print(f"🔁 {workers} processes x {transfers} transfers across {USERS} wallets\n")
+    print(f"{'mode':<18} | {'stmts/transfer':>14} | {'transfers/s':>11} | {'total drift':>11} | overdrawn")
+    print("-" * 76)
+    for mode in ('read-modify-write', 'ledger'):
+        per_op, rate, drift, overdrawn = run_mode(mode, workers, transfers)
+        print(f"{mode:<18} | {per_op:>14.2f} | {rate:>11.0f} | {drift:>11} | {overdrawn}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 4,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
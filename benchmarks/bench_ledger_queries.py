@@ -0,0 +1,89 @@
+"""
+Hot ledger query latency before/after the composite indexes, on a seeded
+database with one million transactions.
+
+Run from the project root:
+    python -m benchmarks.bench_ledger_queries [num_transactions]
+"""
+import datetime
+import os
+import random
+import sys
+import tempfile
+import time
+from peewee import SqliteDatabase
+from database import User, Wallet, Transaction
+import migrate_add_indexes
+
+USERS = 20000
+REPEAT = 20
+TYPES = ['DEPOSIT', 'WITHDRAWAL', 'SWAP', 'TRANSFER', 'RECEIVE', 'VTU_AIRTIME', 'GIFTCARD', 'REFERRAL_BONUS']
+
+def seed(bench_db, num_transactions):
+    rng = random.Random(7)
+    start = datetime.datetime(2025, 1, 1)
+    with bench_db.atomic():
+        bench_db.cursor().executemany(
+            'INSERT INTO "user" (phone, name, onboarding_status, language, referral_bonus_paid, kyc_level, is_frozen, is_2fa_active, created_at) '
+            'VALUES (?, ?, ?, ?, 0, 1, 0, 0, ?)',
+            [(f"+234{i:010d}", f"User {i}", 'active', 'en', start) for i in range(1, USERS + 1)])
+        bench_db.cursor().executemany(
+            'INSERT INTO wallet (user_id, currency, balance, locked) VALUES (?, ?, ?, 0)',
+            [(u, c, 100000) for u in range(1, USERS + 1) for c in ('NGN', 'USDT')])
+        rows = []
+        for i in range(num_transactions):
+            status = 'pending' if rng.random() < 0.002 else 'completed'
+            rows.append((rng.randint(1, USERS), rng.choice(TYPES), 'NGN', rng.randint(100, 500000), status,
+                         start + datetime.timedelta(seconds=i * 3)))
+            if len(rows) == 100000:
+                bench_db.cursor().executemany(
+                    'INSERT INTO "transaction" (user_id, type, currency, amount, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)', rows)
+                rows = []
+        if rows:
+            bench_db.cursor().executemany(
+                'INSERT INTO "transaction" (user_id, type, currency, amount, status, timestamp) VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+def drop_composite_indexes(bench_db):
+    # Baseline: what existing databases have (foreign-key indexes only)
+    for model in (Wallet, Transaction):
+        for index in model._meta.fields_to_index():
+            if len(index._expressions) > 1:
+                bench_db.execute_sql(f'DROP INDEX IF EXISTS "{index._name}"')
+    bench_db.execute_sql('ANALYZE;')
+
+def time_queries():
+    timings = {}
+    for name, build in migrate_add_indexes.HOT_QUERIES.items():
+        start = time.perf_counter()
+        for i in range(REPEAT):
+            list(build(1 + (i * 997) % USERS).tuples())
+        timings[name] = (time.perf_counter() - start) / REPEAT * 1000
+    return timings
+
+def run(num_transactions):
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = SqliteDatabase(os.path.join(tmp, 'ledger.db'), pragmas={'journal_mode': 'wal'})
+        models = [User, Wallet, Transaction]
+        with bench_db.bind_ctx(models):
+            bench_db.create_tables(models)
+            print(f"🌱 Seeding {num_transactions:,} transactions...")
+            seed(bench_db, num_transactions)
+
+            drop_composite_indexes(bench_db)
+            before = time_queries()
+            plans_before = migrate_add_indexes.check_query_plans()
+
+            migrate_add_indexes.build_indexes()
+            after = time_queries()
+            plans_after = migrate_add_indexes.check_query_plans()
+
+        print(f"\n{'query':<34} | {'before (ms)':>11} | {'after (ms)':>10} | index")
+        print("-" * 72)
+        for name in before:
+            uses_index = "yes" if plans_after[name][0] else "NO"
+            scanned = "" if plans_before[name][0] else " (was full scan)"
+            print(f"{name:<34} | {before[name]:>11.2f} | {after[name]:>10.2f} | {uses_index}{scanned}")
+        bench_db.close()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000)
@@ -0,0 +1,80 @@
+"""
+ledger.take_snapshots / rebuild_balance on a journal with a long history,
+and the out-of-order commit they must survive.
+
+On Postgres posting ids come from a sequence, so a transaction can take a
+lower id and commit after a higher one: a snapshot run in between does not
+see it yet. Simulated here by inserting a posting into an id gap after the
+snapshot; then the wallet moves again and is snapshotted past the gap.
+Every balance rebuilt from its snapshot, and ledger.verify(), must still
+agree with Wallet.balance.
+
+Run from the project root:
+    python -m benchmarks.bench_ledger_snapshots [entries]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+WALLETS = 2000
+MOVED = 50 # wallets with postings after the first snapshot
+GAP = 10 # ids left free for the late commit
+
+def run(entries):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'snapshots.db')}"
+    import database
+    import ledger
+    from database import db, User, Wallet, JournalEntry, Posting
+
+    database.init_db()
+    rng = random.Random(7)
+    users = [User.create(phone=f"+234{i:010d}") for i in range(WALLETS)]
+    began = time.perf_counter()
+    with db.atomic():
+        for _ in range(entries):
+            ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -100_00), (rng.choice(users), 'NGN', 100_00)])
+    print(f"📒 {entries} entries over {WALLETS} wallets seeded in {time.perf_counter() - began:.1f}s\n")
+
+    began = time.perf_counter()
+    count = ledger.take_snapshots()
+    print(f"📸 first snapshot: {count} wallets in {(time.perf_counter() - began) * 1000:.0f}ms (whole history)")
+
+    for user in rng.sample(users, MOVED):
+        ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -50_00), (user, 'NGN', 50_00)])
+    began = time.perf_counter()
+    count = ledger.take_snapshots()
+    print(f"📸 next snapshot: {count} wallets in {(time.perf_counter() - began) * 1000:.0f}ms ({MOVED} moved)")
+
+    # --- LATE COMMIT ---
+    # A credit to `late` takes an id below `early`'s, and commits after the snapshot
+    late, early = users[0], users[1]
+    gap = Posting.select(Posting.id).order_by(Posting.id.desc()).scalar() + 1
+    ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -1), (early, 'NGN', 1)])
+    Posting.update(id=Posting.id + GAP).where(Posting.id >= gap).execute()
+    ledger.take_snapshots()
+    with db.atomic():
+        entry = JournalEntry.insert(kind='DEPOSIT', memo='late commit').execute()
+        Posting.insert_many([
+            {'id': gap, 'entry': entry, 'wallet': None, 'account': ledger.DEPOSITS, 'currency': 'NGN', 'amount': -7_00},
+            {'id': gap + 1, 'entry': entry, 'wallet': Wallet.get(Wallet.user == late, Wallet.currency == 'NGN').id,
+             'account': 'wallet', 'currency': 'NGN', 'amount': 7_00},
+        ]).execute()
+        Wallet.update(balance=Wallet.balance + 7_00).where(Wallet.user == late, Wallet.currency == 'NGN').execute()
+
+    # ...and `late` moves again, so the next run snapshots it past the gap
+    ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -1), (late, 'NGN', 1)])
+    ledger.take_snapshots()
+
+    wallets = list(Wallet.select(Wallet.id, Wallet.balance).tuples())
+    wrong = [wallet_id for wallet_id, balance in wallets if ledger.rebuild_balance(wallet_id) != balance]
+    problems = ledger.verify()
+    print(f"\n⏳ posting #{gap + 1} committed after the snapshot that covered #{gap + GAP}, then snapshotted again:")
+    print(f"   rebuild_balance: {'✅ every wallet matches' if not wrong else f'❌ {len(wrong)} wallet(s) off'}")
+    print(f"   verify: {'✅ consistent' if not problems else '❌ ' + '; '.join(problems[:3])}")
+    return not wrong and not problems
+
+if __name__ == "__main__":
+    sys.exit(0 if run(int(sys.argv[1]) if len(sys.argv) > 1 else 50000) else 1)
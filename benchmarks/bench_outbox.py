@@ -0,0 +1,130 @@
+"""
+Webhook latency with notifications sent straight to Twilio (the old
+send_push / notify_admins bodies) against the outbox (services/outbox.py):
+the handler only INSERTs the messages and outbox_worker.py sends them.
+
+WEBHOOK_WORKERS threads stand in for the gunicorn workers, each request
+doing what a VTU purchase does: one database write, then a message to the
+user and one to the admin. Run at two Twilio latencies, the outbox column
+should not move.
+
+Then the OutboxWorker drains everything queued, through the Twilio
+stand-in of bench_alert_fanout (RATE messages/s before it answers 429, 1% of
+requests fail with a 500), with BAD of the recipients answered 400
+(invalid number): delivered rate against RATE, retries, dead letters. And
+a transactional message queued behind a broadcast: how long it waited.
+
+Run from the project root:
+    python -m benchmarks.bench_outbox [requests] [rate]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+WEBHOOK_WORKERS = 4
+LATENCIES_MS = (50, 300)
+BAD = 0.02
+
+def run(requests, rate):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'outbox.db')}"
+    os.environ['TWILIO_ACCOUNT_SID'] = 'AC' + '0' * 32
+    os.environ['TWILIO_AUTH_TOKEN'] = 'bench'
+    os.environ['TWILIO_PHONE'] = '+15550000000'
+    import config
+    import database
+    from database import User, Transaction, OutboxMessage
+    from benchmarks.bench_alert_fanout import TwilioStandIn
+    from modules import notifications
+    from services import outbox
+
+    database.init_db()
+    config.OWNER_PHONE = "+2349990000000"
+    users = [User.create(phone=f"+234{i:010d}") for i in range(requests)]
+    bad = {user.phone for user in users[::int(1 / BAD)]}
+    stand_in = TwilioStandIn(LATENCIES_MS[0] / 1000, rate, bad_numbers=bad)
+    outbox.get_client().api.base_url = stand_in.url
+
+    def direct(user):
+        # The old bodies: two blocking Twilio calls inside the request
+        client, sender = outbox.get_client(), outbox.sender()
+        for phone in (user.phone, config.OWNER_PHONE):
+            try:
+                client.messages.create(from_=sender, body="📱 Airtime Purchase Successful", to=f"whatsapp:{phone}")
+            except Exception:
+                pass
+
+    def queued(user):
+        notifications.send_push(user, "📱 Airtime Purchase Successful")
+        notifications.notify_admins("📱 VTU SUCCESS")
+
+    def webhooks(notify, subset):
+        timings, lock = [], threading.Lock()
+        def worker(n):
+            database.db.connect(reuse_if_open=True)
+            for user in subset[n::WEBHOOK_WORKERS]:
+                began = time.perf_counter()
+                Transaction.create(user=user, type='VTU_AIRTIME', currency='NGN', amount=100_00, status='completed')
+                notify(user)
+                with lock:
+                    timings.append(time.perf_counter() - began)
+            database.db.close()
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(WEBHOOK_WORKERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        timings.sort()
+        return timings[len(timings) // 2] * 1000, timings[min(len(timings) - 1, int(len(timings) * 0.99))] * 1000
+
+    print(f"📨 {requests} webhook requests x 2 messages, {WEBHOOK_WORKERS} webhook workers, Twilio stand-in {rate} msg/s\n")
+    print(f"{'twilio':>7} | {'mode':<7} | {'webhook p50':>11} | {'webhook p99':>11}")
+    print("-" * 46)
+    for latency_ms in LATENCIES_MS:
+        stand_in.latency = latency_ms / 1000
+        for mode, notify in (('direct', direct), ('outbox', queued)):
+            # A quarter of the requests for the slow direct run; it takes long enough
+            slow = mode == 'direct' and latency_ms != LATENCIES_MS[0]
+            p50, p99 = webhooks(notify, users[:requests // 4] if slow else users)
+            print(f"{latency_ms:>5}ms | {mode:<7} | {p50:>9.1f}ms | {p99:>9.1f}ms")
+
+    # --- DRAIN ---
+    stand_in.latency = LATENCIES_MS[0] / 1000
+    stand_in.accepted = stand_in.throttled = stand_in.errors = stand_in.rejected = 0
+    backlog = OutboxMessage.select().where(OutboxMessage.status == 'queued').count()
+    worker = outbox.OutboxWorker(workers=8, rate=rate, retry_delay=0.2, poll_interval=0.05)
+    stop = threading.Event()
+    thread = threading.Thread(target=worker.run, args=(stop,))
+    began = time.perf_counter()
+    thread.start()
+    while OutboxMessage.select().where(OutboxMessage.status.in_(['queued', 'sending'])).exists():
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - began
+    stats = worker.stats()
+    print(f"\n📤 drain: {backlog} messages in {elapsed:.1f}s = {stats['sent'] / elapsed:.1f} sent/s (limit {rate}/s)")
+    print(f"   Twilio: {stand_in.accepted} accepted, {stand_in.throttled} 429s, {stand_in.errors} 500s, "
+          f"{stand_in.rejected} invalid numbers")
+    print(f"   outbox: {stats['sent']} sent, {stats['retried']} retried, {stats['dead']} dead-lettered "
+          f"(messages to {len(bad)} invalid numbers) | {dict(sorted(outbox.counts().items()))}")
+
+    # --- PRIORITY ---
+    notifications.broadcast_all("Weekend promo: zero fees on swaps!")
+    time.sleep(0.5)
+    began = time.time()
+    urgent = outbox.enqueue(users[1].phone, "🔐 Your withdrawal PIN was changed")
+    while OutboxMessage.get_by_id(urgent).status != 'sent':
+        time.sleep(0.01)
+    waited = time.time() - began
+    left = OutboxMessage.select().where(OutboxMessage.priority == outbox.BULK, OutboxMessage.status == 'queued').count()
+    print(f"\n⚡ transactional message queued behind a {len(users)}-user broadcast: sent after {waited * 1000:.0f}ms "
+          f"({left} broadcast messages still queued)")
+    stop.set()
+    thread.join()
+    worker.drain()
+    print("\n" + outbox.format_status(limit=3))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50)
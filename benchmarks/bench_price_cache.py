@@ -0,0 +1,97 @@
+"""
+Reader latency of PriceCache.get() while a refresh is running.
+
+- locked:   the old _update_loop: self.lock held across one blocking
+            CoinGecko request per symbol, get() takes the same lock
+- snapshot: PriceCache: one batched request outside any lock, then an
+            atomic swap of an immutable snapshot
+
+READERS threads call get() in a loop for the whole refresh; the table
+shows how many reads stalled (>10ms), their p99/max latency and how long
+the refresh took. CoinGecko
+is the local stand-in from bench_coingecko with LATENCY_MS per request.
+
+Run from the project root:
+    python -m benchmarks.bench_price_cache [symbols] [latency_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from benchmarks.bench_coingecko import start_server, client
+from services.coingecko_price import CoinGeckoPriceService, CoinIndex
+from services.price_cache import PriceCache
+
+READERS = 8
+
+class LockedPriceCache:
+    """The pre-snapshot PriceCache refresh, one step of its loop."""
+    def __init__(self, symbols, service):
+        self.symbols = symbols
+        self.service = service
+        self.cache = {}
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        with self.lock:
+            for symbol in self.symbols:
+                price = self.service.get_price(symbol, 'usdt')
+                if price:
+                    self.cache[symbol.lower()] = price
+            self.service.clear_cache()
+
+    def get(self, symbol):
+        with self.lock:
+            return self.cache.get(symbol.lower())
+
+def measure(cache, symbols, hits):
+    cache.refresh() # warm: readers find prices
+    hits[0] = 0
+    latencies, done = [], threading.Event()
+
+    def reader(offset):
+        samples, i = [], offset
+        while not done.is_set():
+            symbol = symbols[i % len(symbols)]
+            started = time.perf_counter()
+            cache.get(symbol)
+            samples.append(time.perf_counter() - started)
+            i += 1
+            time.sleep(0.0005)
+        latencies.extend(samples)
+
+    readers = [threading.Thread(target=reader, args=(n,)) for n in range(READERS)]
+    for t in readers:
+        t.start()
+    time.sleep(0.05)
+    began = time.perf_counter()
+    cache.refresh()
+    refresh = time.perf_counter() - began
+    time.sleep(0.05)
+    done.set()
+    for t in readers:
+        t.join()
+    latencies.sort()
+    pct = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] * 1000
+    stalled = sum(1 for latency in latencies if latency > 0.01)
+    return refresh, len(latencies), stalled, pct(0.99), latencies[-1] * 1000
+
+def run(count, latency_ms):
+    url, hits = start_server(latency_ms / 1000)
+    index = CoinIndex(os.path.join(tempfile.mkdtemp(), 'coins.json'))
+    symbols = [f"c{i}" for i in range(count)]
+    print(f"🗄️  {count} symbols, {READERS} reader threads, CoinGecko stand-in {latency_ms}ms per request\n")
+    print(f"{'mode':<9} | {'refresh':>8} | {'reads':>6} | {'>10ms':>6} | {'p99 (ms)':>8} | {'max (ms)':>8} | {'requests':>8}")
+    print("-" * 75)
+    caches = [
+        ('locked', LockedPriceCache(symbols, CoinGeckoPriceService(cg=client(url), index=index))),
+        ('snapshot', PriceCache(symbols, service=CoinGeckoPriceService(cg=client(url), index=index), start=False)),
+    ]
+    for mode, cache in caches:
+        refresh, reads, stalled, p99, worst = measure(cache, symbols, hits)
+        print(f"{mode:<9} | {refresh * 1000:>6.0f}ms | {reads:>6} | {stalled:>6} | {p99:>8.3f} | {worst:>8.1f} | {hits[0]:>8}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50)
@@ -0,0 +1,88 @@
+"""
+Price lookups the way market, swap, alerts and monitor used to do them
+(one Bybit tickers request per symbol) against the shared price engine
+(one bulk request per refresh, lookups from the in-memory snapshot).
+
+A local HTTP stand-in serves a Bybit-shaped /v5/market/tickers response
+for SYMBOLS spot pairs with LATENCY_MS of simulated network delay, so the
+numbers do not depend on the real exchange.
+
+Run from the project root:
+    python -m benchmarks.bench_price_engine [lookups] [latency_ms]
+"""
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import requests
+from services.price_engine import PriceEngine
+
+SYMBOLS = 600
+HOT_SYMBOLS = 40 # what users actually ask for
+
+def make_tickers():
+    rng = random.Random(1)
+    return [{'symbol': f"C{i:03d}USDT", 'lastPrice': f"{rng.uniform(0.01, 60000):.4f}",
+             'price24hPcnt': f"{rng.uniform(-0.2, 0.2):.4f}", 'highPrice24h': '0', 'lowPrice24h': '0'}
+            for i in range(SYMBOLS)]
+
+def start_server(latency):
+    tickers = make_tickers()
+    by_symbol = {t['symbol']: t for t in tickers}
+    hits = [0]
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            hits[0] += 1
+            time.sleep(latency)
+            symbol = parse_qs(urlparse(self.path).query).get('symbol', [None])[0]
+            rows = [by_symbol[symbol]] if symbol in by_symbol else ([] if symbol else tickers)
+            body = json.dumps({'retCode': 0, 'retMsg': 'OK', 'result': {'list': rows}}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v5/market/tickers", hits
+
+def per_symbol(url, symbol):
+    # The old market.fetch_raw_price: a fresh request per lookup
+    data = requests.get(f"{url}?category=spot&symbol={symbol}", timeout=5).json()
+    return float(data['result']['list'][0]['lastPrice'])
+
+def run(lookups, latency_ms):
+    server, url, hits = start_server(latency_ms / 1000)
+    rng = random.Random(2)
+    symbols = [f"C{rng.randrange(HOT_SYMBOLS):03d}" for _ in range(lookups)]
+    print(f"💹 {lookups} lookups over {HOT_SYMBOLS} symbols, {SYMBOLS} pairs listed, {latency_ms}ms per request\n")
+    print(f"{'mode':<11} | {'lookups/s':>10} | {'p99 (ms)':>8} | {'http requests':>13}")
+    print("-" * 52)
+
+    engine = PriceEngine(refresh_interval=5, max_age=30, url=url)
+    modes = [('per-symbol', lambda s: per_symbol(url, s + 'USDT')), ('engine', engine.price)]
+    for mode, lookup in modes:
+        hits[0] = 0
+        latencies = []
+        began = time.perf_counter()
+        for symbol in symbols:
+            start = time.perf_counter()
+            assert lookup(symbol) is not None
+            latencies.append((time.perf_counter() - start) * 1000)
+        elapsed = time.perf_counter() - began
+        latencies.sort()
+        print(f"{mode:<11} | {lookups / elapsed:>10.0f} | {latencies[int(len(latencies) * 0.99)]:>8.3f} | {hits[0]:>13}")
+    engine.stop()
+    server.shutdown()
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 20)
@@ -0,0 +1,66 @@
+"""
+Micro-benchmark: per-message routing overhead vs. number of registered flows.
+
+Run from the project root:
+    python -m benchmarks.bench_router
+
+The router should stay flat as flows are added, while the legacy linear
+probe (one session lookup per flow name) grows with the flow count.
+"""
+import time
+import router
+import state_manager
+
+MESSAGES_PER_ROUND = 20000
+
+class FakeUser:
+    name = "Bench"
+
+def _echo_flow(user, msg, session):
+    session['step'] = session.get('step', 1) + 1
+    return "ok", session, False
+
+def _legacy_route(sender, msg, flows):
+    # What main.bot() used to do before any real work started
+    for flow in flows:
+        if state_manager.get_session(sender, flow) or msg == flow:
+            return flow
+    return None
+
+def _time_per_message(fn):
+    start = time.perf_counter()
+    for i in range(MESSAGES_PER_ROUND):
+        fn(i)
+    return (time.perf_counter() - start) / MESSAGES_PER_ROUND * 1e6
+
+def run():
+    user = FakeUser()
+    router.register_command(['menu'], lambda user, msg: "menu")
+    flow_names = []
+    print(f"{'flows':>6} | {'router (µs/msg)':>16} | {'legacy (µs/msg)':>16}")
+    print("-" * 45)
+    for target in [10, 100, 1000, 5000]:
+        while len(flow_names) < target:
+            name = f"flow{len(flow_names)}"
+            router.register_flow(name, _echo_flow)
+            flow_names.append(name)
+
+        # Mixed traffic: a sender mid-flow, a flow trigger and a static command
+        last = flow_names[-1]
+        state_manager.set_session("+2340000000001", last, {'step': 1})
+        messages = [("+2340000000001", "42"), ("+2340000000002", last), ("+2340000000003", "menu")]
+
+        def routed(i):
+            sender, msg = messages[i % 3]
+            router.dispatch(user, sender, msg)
+
+        def legacy(i):
+            sender, msg = messages[i % 3]
+            _legacy_route(sender, msg, flow_names)
+
+        print(f"{target:>6} | {_time_per_message(routed):>16.2f} | {_time_per_message(legacy):>16.2f}")
+        state_manager.clear_all_sessions("+2340000000001")
+        state_manager.clear_all_sessions("+2340000000002")
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,114 @@
+"""
+Session backend latency: p50/p99 of the get+set pair done per message.
+
+Run from the project root:
+    python -m benchmarks.bench_sessions              # memory, sqlite, redis stand-in
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_sessions
+
+Without REDIS_URL the redis backend is measured against a small in-process
+Redis-protocol stand-in (GET/SET EX/DEL) listening on localhost.
+"""
+import os
+import socketserver
+import statistics
+import tempfile
+import threading
+import time
+from services import session_store
+
+ROUNDS = 5000
+SENDERS = 500
+TTL = 1800
+
+# --- REDIS-PROTOCOL STAND-IN ---
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:])
+        args = []
+        for _ in range(count):
+            size = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        data = self.server.data
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            cmd = args[0].upper()
+            if cmd == b'GET':
+                value = data.get(args[1])
+                if value is None or value[1] < time.time():
+                    self.wfile.write(b'$-1\r\n')
+                else:
+                    self.wfile.write(b'$%d\r\n%s\r\n' % (len(value[0]), value[0]))
+            elif cmd == b'SET':
+                ttl = int(args[4]) if len(args) > 4 and args[3].upper() == b'EX' else 10 ** 9
+                data[args[1]] = (args[2], time.time() + ttl)
+                self.wfile.write(b'+OK\r\n')
+            elif cmd == b'DEL':
+                removed = sum(1 for key in args[1:] if data.pop(key, None) is not None)
+                self.wfile.write(b':%d\r\n' % removed)
+            else:
+                # HELLO / CLIENT SETINFO / PING handshakes
+                self.wfile.write(b'+OK\r\n')
+
+class _RespStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _RespHandler)
+        self.data = {}
+
+def start_redis_stand_in():
+    server = _RespStandIn()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    return server, f"redis://{host}:{port}/0"
+
+# --- BENCHMARK ---
+
+def _measure(store):
+    session = {'step': 4, 'from': 'USDT', 'to': 'BTC', 'amt': 250.0, 'rate': 0.0000154}
+    samples = []
+    for i in range(ROUNDS):
+        phone = f"+234800{i % SENDERS:07d}"
+        start = time.perf_counter()
+        store.get(phone)
+        store.set(phone, 'swap', session)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99)]
+
+def run():
+    results = []
+    results.append(('memory', _measure(session_store.MemorySessionStore(TTL))))
+
+    from peewee import SqliteDatabase
+    from database import ChatSession
+    with tempfile.TemporaryDirectory() as tmp:
+        bench_db = SqliteDatabase(os.path.join(tmp, 'sessions.db'), pragmas={'journal_mode': 'wal', 'synchronous': 'normal'})
+        with bench_db.bind_ctx([ChatSession]):
+            results.append(('sqlite', _measure(session_store.SQLiteSessionStore(TTL))))
+        bench_db.close()
+
+    url = os.getenv("REDIS_URL")
+    label = 'redis'
+    if not url:
+        _, url = start_redis_stand_in()
+        label = 'redis (stand-in)'
+    results.append((label, _measure(session_store.RedisSessionStore(TTL, url=url))))
+
+    print(f"{'backend':<18} | {'p50 get+set (ms)':>16} | {'p99 get+set (ms)':>16}")
+    print("-" * 56)
+    for name, (p50, p99) in results:
+        print(f"{name:<18} | {p50:>16.3f} | {p99:>16.3f}")
+
+if __name__ == "__main__":
+    run()
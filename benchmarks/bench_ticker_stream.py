@@ -0,0 +1,318 @@
+"""
+Tick-to-notification latency of the streaming alert path, against the
+old 10-second REST poll replayed over the same ticks.
+
+A local WebSocket stand-in speaks the Bybit public spot protocol
+(subscribe/unsubscribe/ping) and replays a recording of ticker messages
+at SPEED x real time, only for subscribed topics, stamping `ts` at send.
+Halfway through it drops every connection once, so the run also covers
+reconnect and resubscribe. The recording is a seeded random walk with
+short wicks, or a JSONL file of captured stream messages (one per line).
+
+The client is the whole monitor pipeline (monitor.Monitor with a
+TickerStream) on a temporary SQLite database, up to the outbox (delivery
+itself is bench_outbox's job). Latency is from a tick's arrival to its
+notification being queued in the outbox. The poll column replays
+the recording with a 10s scan at a random phase: detection delay, and
+alerts whose crossing reverted before any scan saw it (missed wicks).
+
+Ends with two connection checks. A stand-in goes quiet for QUIET seconds
+after the subscription: the connection must survive it (one connection,
+the tick that finally comes is received). Another sends a tick and drops
+the connection, DROPS times: each reconnect must come after the first
+backoff step (~1s), since every connection delivered data.
+
+Run from the project root:
+    python -m benchmarks.bench_ticker_stream [seconds_of_recording] [speed] [recording.jsonl]
+    python -m benchmarks.bench_ticker_stream --quiet   (the connection checks alone)
+"""
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from websockets.exceptions import ConnectionClosed
+from websockets.sync.server import serve
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT', 'DOGEUSDT', 'TONUSDT', 'BNBUSDT', 'ADAUSDT']
+TICKS_PER_SECOND = 4 # per symbol
+ALERTS_PER_SYMBOL = 25
+POLL_INTERVAL = 10
+QUIET = 2.5 # seconds the quiet stand-in sends nothing
+DROPS = 4 # connections the dropping stand-in closes after a tick
+
+def make_recording(seconds):
+    rng = random.Random(7)
+    messages = []
+    for symbol in SYMBOLS:
+        price, wick_left, wick = 100.0, 0, 0.0
+        for i in range(seconds * TICKS_PER_SECOND):
+            price *= 1 + rng.gauss(0, 0.0008)
+            if wick_left == 0 and rng.random() < 0.004:
+                # 1-3s spike that reverts: the moves polling misses
+                wick_left, wick = rng.randint(4, 12), rng.choice((-1, 1)) * rng.uniform(0.01, 0.03)
+            shown = price * (1 + wick) if wick_left else price
+            wick_left = max(0, wick_left - 1)
+            messages.append({'topic': f"tickers.{symbol}", 'ts': i * 1000 // TICKS_PER_SECOND, 'type': 'snapshot',
+                             'data': {'symbol': symbol, 'lastPrice': f"{shown:.6f}", 'price24hPcnt': '0'}})
+    messages.sort(key=lambda m: m['ts'])
+    return messages
+
+def load_recording(path):
+    with open(path) as f:
+        messages = [json.loads(line) for line in f if line.strip()]
+    messages = [m for m in messages if m.get('topic', '').startswith('tickers.')]
+    base = messages[0]['ts']
+    for m in messages:
+        m['ts'] -= base
+    return messages
+
+def answer_ops(ws, subscribed):
+    """Answers the client's subscribe/unsubscribe/ping messages, keeping `subscribed` current."""
+    try:
+        for raw in ws:
+            op = json.loads(raw)
+            if op['op'] == 'ping':
+                ws.send(json.dumps({'op': 'pong', 'success': True, 'ret_msg': 'pong'}))
+                continue
+            topics = set(op['args'])
+            if op['op'] == 'subscribe':
+                subscribed.update(topics)
+            else:
+                subscribed.difference_update(topics)
+            ws.send(json.dumps({'op': op['op'], 'success': True, 'ret_msg': ''}))
+    except ConnectionClosed:
+        pass
+
+class ReplayServer:
+    def __init__(self, messages, speed):
+        self.messages = messages
+        self.speed = speed
+        self.cursor = 0
+        self.started = None
+        self.dropped = False
+        self.connections = 0
+        self.done = threading.Event()
+        self.closing = threading.Event()
+        self.server = serve(self.handler, '127.0.0.1', 0)
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handler(self, ws):
+        self.connections += 1
+        subscribed = set()
+        threading.Thread(target=answer_ops, args=(ws, subscribed), daemon=True).start()
+        if self.started is None:
+            self.started = time.monotonic()
+        try:
+            while self.cursor < len(self.messages):
+                message = self.messages[self.cursor]
+                delay = self.started + message['ts'] / 1000 / self.speed - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.cursor += 1
+                if not self.dropped and self.cursor > len(self.messages) // 2:
+                    self.dropped = True
+                    ws.close()
+                    return
+                if message['topic'] in subscribed:
+                    ws.send(json.dumps(dict(message, ts=int(time.time() * 1000))))
+        except Exception:
+            return
+        self.done.set()
+        # Keep the connection open until the client has stopped
+        self.closing.wait()
+
+class QuietServer:
+    """Answers the subscription, then sends nothing for `quiet` seconds before one tick."""
+    def __init__(self, quiet):
+        self.quiet = quiet
+        self.connections = 0
+        self.closing = threading.Event()
+        self.server = serve(self.handler, '127.0.0.1', 0)
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handler(self, ws):
+        self.connections += 1
+        subscribed = set()
+        threading.Thread(target=answer_ops, args=(ws, subscribed), daemon=True).start()
+        try:
+            while not subscribed:
+                time.sleep(0.01)
+            time.sleep(self.quiet)
+            ws.send(json.dumps({'topic': 'tickers.BTCUSDT', 'ts': int(time.time() * 1000), 'type': 'snapshot',
+                                'data': {'symbol': 'BTCUSDT', 'lastPrice': '100', 'price24hPcnt': '0'}}))
+        except Exception:
+            return
+        self.closing.wait()
+
+class DroppingServer:
+    """Sends one tick on every connection, then drops it; records when each connection came."""
+    def __init__(self):
+        self.connected_at = []
+        self.server = serve(self.handler, '127.0.0.1', 0)
+        self.url = f"ws://127.0.0.1:{self.server.socket.getsockname()[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handler(self, ws):
+        self.connected_at.append(time.monotonic())
+        subscribed = set()
+        threading.Thread(target=answer_ops, args=(ws, subscribed), daemon=True).start()
+        try:
+            while not subscribed:
+                time.sleep(0.01)
+            ws.send(json.dumps({'topic': 'tickers.BTCUSDT', 'ts': int(time.time() * 1000), 'type': 'snapshot',
+                                'data': {'symbol': 'BTCUSDT', 'lastPrice': '100', 'price24hPcnt': '0'}}))
+            time.sleep(0.1)
+            ws.close()
+        except Exception:
+            return
+
+def backoff_check(drops=DROPS):
+    """A connection that delivered data before it dropped reconnects after ~1s, however many drops came before."""
+    from services.ticker_stream import TickerStream
+    server = DroppingServer()
+    stream = TickerStream(url=server.url)
+    stream.set_symbols(['BTC'])
+
+    async def listen():
+        task = asyncio.create_task(stream.run(asyncio.Queue()))
+        began = time.monotonic()
+        while len(server.connected_at) <= drops and time.monotonic() - began < 2 ** drops + 5:
+            await asyncio.sleep(0.05)
+        task.cancel()
+
+    asyncio.run(listen())
+    server.server.shutdown()
+    gaps = [b - a for a, b in zip(server.connected_at, server.connected_at[1:])]
+    ok = len(gaps) >= drops and max(gaps) < 1.5
+    print(f"🔁 {len(gaps)} drops after streaming: {'✅' if ok else '❌'} reconnected after "
+          f"{', '.join(f'{gap:.1f}s' for gap in gaps)}")
+    return ok
+
+def quiet_check(quiet=QUIET):
+    """A feed with no frame for longer than the client's 1s receive timeout must keep its connection."""
+    from services.ticker_stream import TickerStream
+    server = QuietServer(quiet)
+    stream = TickerStream(url=server.url)
+    stream.set_symbols(['BTC'])
+
+    async def listen():
+        ticks = asyncio.Queue()
+        task = asyncio.create_task(stream.run(ticks))
+        try:
+            return await asyncio.wait_for(ticks.get(), quiet + 5)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            task.cancel()
+
+    quote = asyncio.run(listen())
+    server.closing.set()
+    server.server.shutdown()
+    ok = quote is not None and server.connections == 1 and stream.reconnects == 0
+    print(f"🤫 {quiet:g}s without a frame: {'✅' if ok else '❌'} {server.connections} connection(s), "
+          f"{stream.reconnects} reconnect(s), tick {'received' if quote else 'lost'}")
+    return ok
+
+def poll_replay(messages, targets, rng):
+    """Detection delays (recording seconds) and missed alerts for a POLL_INTERVAL scan."""
+    phase = rng.uniform(0, POLL_INTERVAL)
+    delays, missed = [], 0
+    by_symbol = {}
+    for m in messages:
+        by_symbol.setdefault(m['data']['symbol'], []).append((m['ts'] / 1000, float(m['data']['lastPrice'])))
+    for symbol, condition, target in targets:
+        ticks = by_symbol.get(symbol, [])
+        crossed = lambda p: p >= target if condition == 'above' else p <= target
+        first = next((t for t, p in ticks if crossed(p)), None)
+        if first is None:
+            continue
+        seen, i, last = None, 0, None
+        poll_at = phase
+        while poll_at <= ticks[-1][0]:
+            while i < len(ticks) and ticks[i][0] <= poll_at:
+                last = ticks[i][1]
+                i += 1
+            if last is not None and crossed(last):
+                seen = poll_at
+                break
+            poll_at += POLL_INTERVAL
+        if seen is None:
+            missed += 1
+        else:
+            delays.append(seen - first)
+    return delays, missed
+
+def pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float('nan')
+
+def run(seconds, speed, path=None):
+    messages = load_recording(path) if path else make_recording(seconds)
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'alerts.db')}"
+    import database
+    import monitor
+    from services.ticker_stream import TickerStream
+
+    database.init_db()
+    rng = random.Random(3)
+    opening = {}
+    for m in messages:
+        opening.setdefault(m['data']['symbol'], float(m['data']['lastPrice']))
+    targets = []
+    with database.atomic_write():
+        for i, (symbol, first_price) in enumerate(opening.items()):
+            user = database.User.create(phone=f"+234{i:010d}")
+            for _ in range(ALERTS_PER_SYMBOL):
+                condition = rng.choice(('above', 'below'))
+                target = first_price * (1 + (1 if condition == 'above' else -1) * rng.uniform(0.005, 0.04))
+                database.Alert.create(user=user, symbol=symbol.replace('USDT', ''), target_price=target,
+                                      condition=condition, is_active=True)
+                targets.append((symbol, condition, target))
+
+    # No REST fallback in a replay: prices come only from the stand-in
+    monitor.get_batch_quotes = lambda symbols: {}
+    server = ReplayServer(messages, speed)
+    stream = TickerStream(url=server.url)
+    pipeline = monitor.Monitor(stream)
+    print(f"📼 Replaying {len(messages)} ticks ({messages[-1]['ts'] / 1000:.0f}s of {len(opening)} symbols) at {speed}x, "
+          f"{len(targets)} alerts\n")
+
+    async def replay():
+        task = asyncio.create_task(pipeline.run())
+        while not server.done.is_set():
+            await asyncio.sleep(0.2)
+        await asyncio.sleep(0.5)
+        status = pipeline.status()
+        task.cancel()
+        return status
+
+    status = asyncio.run(replay())
+    server.closing.set()
+    server.server.shutdown()
+    latencies = [l * 1000 for l in pipeline.queue_latencies]
+
+    delays, missed = poll_replay(messages, targets, rng)
+    fired = database.Alert.select().where(database.Alert.is_active == False).count()
+    print(f"{'feed':<12} | {'fired':>5} | {'missed':>6} | {'p50 latency':>11} | {'p99 latency':>11}")
+    print("-" * 60)
+    print(f"{'stream':<12} | {fired:>5} | {len(delays) + missed - fired:>6} | "
+          f"{pct(latencies, 0.5):>9.2f}ms | {pct(latencies, 0.99):>9.2f}ms")
+    print(f"{'poll (10s)':<12} | {len(delays):>5} | {missed:>6} | "
+          f"{pct(delays, 0.5) * 1000:>9.0f}ms | {pct(delays, 0.99) * 1000:>9.0f}ms")
+    print(f"\n🔌 connections: {server.connections}, ticks received: {stream.ticks}")
+    print(f"💓 {status}\n")
+    return all([quiet_check(), backoff_check()])
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ['--quiet']:
+        sys.exit(0 if quiet_check() and backoff_check() else 1)
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 300,
+        float(sys.argv[2]) if len(sys.argv) > 2 else 10,
+        sys.argv[3] if len(sys.argv) > 3 else None)
@@ -0,0 +1,155 @@
+"""
+Bulk airtime: sending to a list of numbers one recipient at a time (what
+walking the vtu chat flow per recipient amounts to: a debit, then the
+purchase, before the next one) against services/vtu_bulk.py (validate the
+list, one debit, rows sent by the vtu_worker.py WorkerPool).
+
+The vtu.ng stand-in (benchmarks/vtu_standin.py) answers after latency_ms,
+leaves PENDING of the orders 'processing' (settled by the reconciler's
+requery) and fails FAILED of them.
+
+Reports rows/s until every row is settled, the most concurrent calls
+vtu.ng saw, how long a single user's purchase queued behind the batch
+waited, the per-row report, and checks the books: one journal entry for
+the batch debit plus one refund per failed row, and a consistent ledger.
+
+Run from the project root:
+    python -m benchmarks.bench_vtu_bulk [rows] [latency_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+PROVIDERS = ['MTN', 'Airtel', 'Glo', '9mobile']
+POOL_WORKERS = 16
+PROVIDER_LIMIT = 4
+BULK_LIMIT = 8
+PENDING = 0.1
+FAILED = 0.05
+START_BALANCE = 100_000_000 # kobo
+
+def run(rows, latency_ms):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bulk.db')}"
+    os.environ['VTU_TOKEN_FILE'] = os.path.join(tmp, 'vtu_token.json')
+    import database
+    import ledger
+    from database import User, JournalEntry, Transaction, VtuJob, atomic_write
+    from benchmarks.vtu_standin import VtuStandIn
+    from modules import notifications
+    from services import vtu_bulk, vtu_jobs, vtu_service
+
+    database.init_db()
+    admin = User.create(phone="+2340000000001")
+    ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -START_BALANCE), (admin, 'NGN', START_BALANCE)])
+    customer = User.create(phone="+2340000000002")
+    ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -10_000_00), (customer, 'NGN', 10_000_00)])
+    stand_in = VtuStandIn(latency=latency_ms / 1000, pending_ratio=PENDING, fail_ratio=FAILED)
+    vtu_service.AUTH_URL, vtu_service.API_URL = stand_in.auth_url, stand_in.api_url
+    vtu_jobs.REQUERY_DELAY = 0.2 # requery soon, so the run ends
+    sent = []
+    notifications.send_push = lambda user, body, media_url=None: sent.append(body)
+    notifications.notify_admins = lambda body: None
+    quiet = lambda *args: None
+
+    lines = ["phone, network, amount"] + [f"080{i:08d}, {PROVIDERS[i % 4]}, {100 + i % 5 * 100}" for i in range(rows)]
+    lines += ["0803, MTN, 100", "08030000000, Smile, 100", "08030000001, MTN, 50"] # rejected
+    lines += [lines[1]] # kept, flagged as a repeat
+    text = "\n".join(lines)
+
+    print(f"📦 {rows} airtime rows, vtu.ng stand-in {latency_ms}ms, {PENDING:.0%} pending / {FAILED:.0%} failed\n")
+    began = time.perf_counter()
+    parsed, errors = vtu_bulk.validate('airtime', text)
+    print(f"🔎 validate: {len(parsed)} rows ({len(vtu_bulk.repeats(parsed))} repeated), {len(errors)} rejected "
+          f"({', '.join(reason for _, _, reason in errors)}) in {(time.perf_counter() - began) * 1000:.1f}ms")
+    print(f"\n{'mode':<14} | {'debit':>8} | {'rows/s':>7} | {'vtu.ng peak':>11} | {'completed':>9} | {'refunded':>8}")
+    print("-" * 72)
+
+    # --- ONE AT A TIME ---
+    sample = parsed[:min(len(parsed), 40)]
+    completed = refunded = 0
+    debit_time = 0
+    began = time.perf_counter()
+    for row in sample:
+        naira = row['amount'] // 100
+        started = time.perf_counter()
+        with atomic_write():
+            ledger.post('VTU', [(admin, 'NGN', -row['amount']), (ledger.VTU, 'NGN', row['amount'])], memo=row['target'])
+            tx = Transaction.create(user=admin, type='VTU_AIRTIME', currency='NGN', amount=row['amount'],
+                                    status='pending', tx_hash=row['target'])
+        debit_time += time.perf_counter() - started
+        request_id = f"req_{uuid.uuid4().hex[:12]}"
+        provider = vtu_service.PROVIDER_SERVICE_IDS[row['provider']]
+        resp = vtu_service.VTUApiClient().purchase_airtime(request_id, row['target'], provider, naira)
+        result = vtu_jobs.outcome(resp)
+        while result == 'processing':
+            time.sleep(vtu_jobs.REQUERY_DELAY)
+            resp = vtu_service.VTUApiClient().requery_order(request_id)
+            result = vtu_jobs.requery_outcome(resp, time.perf_counter() - started)
+        if result == 'completed':
+            tx.status = 'completed'
+            completed += 1
+        else:
+            ledger.post('VTU_REFUND', [(ledger.VTU, 'NGN', -row['amount']), (admin, 'NGN', row['amount'])], memo=row['target'])
+            tx.status = 'failed'
+            refunded += 1
+        tx.save()
+    elapsed = time.perf_counter() - began
+    print(f"{'one at a time':<14} | {debit_time * 1000:>6.0f}ms | {len(sample) / elapsed:>7.1f} | {stand_in.peak:>11} | "
+          f"{completed:>9} | {refunded:>8}   ({len(sample)} rows)")
+
+    # --- BULK ---
+    stand_in.peak = 0
+    entries_before = JournalEntry.select().count()
+    pool = vtu_jobs.WorkerPool(workers=POOL_WORKERS, limits={}, default_limit=PROVIDER_LIMIT, poll_interval=0.05,
+                               bulk_limit=BULK_LIMIT, notify=quiet)
+    reconciler = vtu_jobs.Reconciler(interval=0.1, notify=quiet)
+    stop = threading.Event()
+    threads = [threading.Thread(target=pool.run, args=(stop,)), threading.Thread(target=reconciler.run, args=(stop,))]
+    began = time.perf_counter()
+    batch = vtu_bulk.submit(admin, 'airtime', parsed)
+    debit_time = time.perf_counter() - began
+    for t in threads:
+        t.start()
+
+    # A customer's single purchase, queued while the batch is running
+    time.sleep(0.5)
+    with atomic_write():
+        ledger.post('VTU', [(customer, 'NGN', -500_00), (ledger.VTU, 'NGN', 500_00)], memo=customer.phone)
+        tx = Transaction.create(user=customer, type='VTU_AIRTIME', currency='NGN', amount=500_00, status='pending',
+                                tx_hash=customer.phone)
+        single = vtu_jobs.enqueue(tx, customer, f"req_{uuid.uuid4().hex[:12]}", 'Airtime', 'mtn', customer.phone, 500_00)
+    queued_at = time.perf_counter()
+    single_wait = None
+    while VtuJob.select().where(VtuJob.batch == batch, VtuJob.status.not_in(vtu_jobs.SETTLED)).exists():
+        if single_wait is None and VtuJob.get_by_id(single.id).status != 'queued':
+            single_wait = time.perf_counter() - queued_at
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - began
+    stop.set()
+    for t in threads:
+        t.join()
+    result = vtu_bulk.report(batch)
+    counts = result['counts']
+    print(f"{'bulk':<14} | {debit_time * 1000:>6.0f}ms | {len(parsed) / elapsed:>7.1f} | {stand_in.peak:>11} | "
+          f"{counts.get('completed', 0):>9} | {counts.get('refunded', 0):>8}   ({len(parsed)} rows)")
+
+    print(f"\n⏱️ single purchase queued behind the batch started after {(single_wait or 0) * 1000:.0f}ms")
+    print(f"🔄 {pool.results['processing']} rows answered 'processing', settled by {reconciler.requeries} requeries")
+
+    vtu_bulk.row_settled(VtuJob.select().where(VtuJob.batch == batch).first())
+    print(f"📨 owner notified {len(sent)} time(s); report CSV {len(vtu_bulk.report_csv(batch).splitlines()) - 1} rows")
+    print("   " + "\n   ".join(sent[0].splitlines()[:6]) if sent else "")
+
+    # --- BOOKS ---
+    entries = JournalEntry.select().count() - entries_before
+    problems = ledger.verify()
+    print(f"\n📒 bulk journal entries: {entries} (1 debit + {counts.get('refunded', 0)} refunds + 1 single purchase)")
+    print(f"   ledger {'✅ consistent' if not problems else '❌ ' + '; '.join(problems[:3])}")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 400,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100)
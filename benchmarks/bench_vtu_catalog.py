@@ -0,0 +1,101 @@
+"""
+Data-plan price lookups: downloading the provider's variation list on
+every lookup (the old vtu_service.get_data_plan_price) against the local
+catalog of services/vtu_catalog.py.
+
+Also shows what a catalog refresh costs: a full fetch, a revalidation
+where every list answers 304, a price change picked up by the next
+refresh, a second worker finding the lists fresh in the database, and
+the slowest lookup seen while a refresh is in flight.
+
+The vtu.ng stand-in (benchmarks/vtu_standin.py) answers after latency_ms.
+
+Run from the project root:
+    python -m benchmarks.bench_vtu_catalog [lookups] [latency_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+PLANS = [('MTN', '1GB'), ('Airtel', '500MB'), ('Glo', '2GB'), ('9mobile', '5GB')]
+
+def run(lookups, latency_ms):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'catalog.db')}"
+    os.environ['VTU_TOKEN_FILE'] = os.path.join(tmp, 'vtu_token.json')
+    import database
+    from benchmarks.vtu_standin import VtuStandIn
+    from services import vtu_catalog, vtu_service
+
+    database.init_db()
+    stand_in = VtuStandIn(latency=latency_ms / 1000)
+    vtu_service.AUTH_URL, vtu_service.API_URL = stand_in.auth_url, stand_in.api_url
+    print(f"📶 {lookups} data-plan lookups, vtu.ng stand-in {latency_ms}ms per request\n")
+    print(f"{'mode':<22} | {'per lookup':>12} | {'requests':>8}")
+    print("-" * 50)
+
+    def old_lookup(provider, plan):
+        variations = vtu_service.VTUApiClient().get_data_variations(vtu_service.PROVIDER_SERVICE_IDS[provider])
+        for v in variations.get('data', []):
+            if plan.lower() in v.get('data_plan', '').lower() and v.get('availability', '').lower() == 'available':
+                return int(float(v.get('price', 0))), str(v.get('variation_id'))
+        return None, None
+
+    def measure(mode, lookup):
+        stand_in.hits.clear()
+        began = time.perf_counter()
+        for i in range(lookups):
+            price, _ = lookup(*PLANS[i % len(PLANS)])
+            assert price is not None
+        elapsed = time.perf_counter() - began
+        per = elapsed / lookups
+        shown = f"{per * 1000:.1f}ms" if per >= 0.001 else f"{per * 1e6:.1f}µs"
+        print(f"{mode:<22} | {shown:>12} | {sum(stand_in.hits.values()):>8}")
+
+    measure('download per lookup', old_lookup)
+
+    catalog = vtu_catalog._catalog = vtu_catalog.VtuCatalog(start=False)
+    stand_in.hits.clear()
+    began = time.perf_counter()
+    catalog.refresh_all(force=True)
+    initial = (time.perf_counter() - began, sum(stand_in.hits.values()))
+    measure('catalog', vtu_service.get_data_plan_price)
+
+    print("\n🔄 Refreshes")
+    stand_in.hits.clear()
+    began = time.perf_counter()
+    catalog.refresh_all(force=True)
+    print(f"   first fetch:      {initial[0] * 1000:.0f}ms, {initial[1]} requests")
+    print(f"   unchanged lists:  {(time.perf_counter() - began) * 1000:.0f}ms, "
+          f"{sum(stand_in.hits.values())} requests, {catalog.not_modified} answered 304")
+
+    before, _ = vtu_service.get_data_plan_price('MTN', '1GB')
+    for v in stand_in.variations['data']:
+        if v['variation_id'] == 'mtn-1GB':
+            v['price'] = '350'
+    catalog.refresh_all(force=True)
+    after, _ = vtu_service.get_data_plan_price('MTN', '1GB')
+    print(f"   price change:     MTN 1GB ₦{before} -> ₦{after}")
+
+    stand_in.hits.clear()
+    other_worker = vtu_catalog.VtuCatalog(start=False)
+    fresh = other_worker.refresh_all()
+    print(f"   second worker:    {fresh} lists fresh from the database, {sum(stand_in.hits.values())} requests")
+
+    # Lookups keep reading the published snapshot while a slow refresh runs
+    stand_in.latency = 0.25
+    refresher = threading.Thread(target=catalog.refresh_all, kwargs={'force': True})
+    refresher.start()
+    slowest = 0
+    while refresher.is_alive():
+        began = time.perf_counter()
+        vtu_service.get_data_plan_price('Glo', '2GB')
+        slowest = max(slowest, time.perf_counter() - began)
+    refresher.join()
+    print(f"   during a refresh: slowest lookup {slowest * 1e6:.0f}µs")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 80)
@@ -0,0 +1,131 @@
+"""
+VTU purchases through the old per-function retry loop of
+modules/payment_methods.py (re-send on any network error, sleeping 2**n
+seconds) against services/vtu_executor.py.
+
+Three scenarios against the vtu.ng stand-in (benchmarks/vtu_standin.py):
+
+- lost answers: LOST of the purchases are placed but answered 502. The
+  old loop buys those again; the executor requeries first.
+- outage: every purchase answers 503. Shows how long each user action
+  blocks, and how many calls reach vtu.ng, before and after the breaker
+  opens; then recovery once vtu.ng is back and the breaker has reset.
+- replay: executing a request_id that already has an answer.
+
+Ends with the executor's per-product latency histograms.
+
+Run from the project root:
+    python -m benchmarks.bench_vtu_executor [purchases] [latency_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+LOST = 0.2
+USERS = 4 # concurrent user actions during the outage
+BREAKER_RESET = 1.0
+
+def run(purchases, latency_ms):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'executor.db')}"
+    os.environ['VTU_TOKEN_FILE'] = os.path.join(tmp, 'vtu_token.json')
+    import database
+    from benchmarks.vtu_standin import VtuStandIn
+    from services import http_client, vtu_executor, vtu_service
+
+    database.init_db()
+    stand_in = VtuStandIn(latency=latency_ms / 1000, lost_ratio=LOST)
+    vtu_service.AUTH_URL, vtu_service.API_URL = stand_in.auth_url, stand_in.api_url
+    executor = vtu_executor._executor = vtu_executor.VtuExecutor(breaker_reset=BREAKER_RESET)
+    new_id = lambda: f"req_{uuid.uuid4().hex[:12]}"
+
+    def old_loop(request_id, max_retries=3):
+        # The loop every payment_methods.py wrapper had
+        client = vtu_service.VTUApiClient()
+        for attempt in range(max_retries):
+            try:
+                return client.purchase_airtime(request_id, '08030000000', 'mtn', 100)
+            except http_client.RequestException:
+                time.sleep(2 ** attempt)
+        return {'code': 'network_error'}
+
+    def new_path(request_id):
+        try:
+            return executor.execute('airtime', request_id,
+                                    lambda client: client.purchase_airtime(request_id, '08030000000', 'mtn', 100))
+        except vtu_executor.CircuitOpen:
+            return {'code': 'service_unavailable'}
+        except http_client.RequestException:
+            return {'code': 'network_error'}
+
+    print(f"📱 vtu.ng stand-in {latency_ms}ms per request\n")
+    print(f"⚡ Lost answers: {purchases} purchases, {LOST:.0%} placed but answered 502")
+    print(f"   {'mode':<9} | {'per purchase':>12} | {'placed':>6} | {'bought twice+':>13} | {'requeries':>9}")
+    for mode, buy in (('old loop', old_loop), ('executor', new_path)):
+        stand_in.placed.clear()
+        stand_in.hits.clear()
+        began = time.perf_counter()
+        for _ in range(purchases):
+            buy(new_id())
+        per = (time.perf_counter() - began) / purchases
+        twice = sum(n > 1 for n in stand_in.placed.values())
+        print(f"   {mode:<9} | {per * 1000:>10.0f}ms | {sum(stand_in.placed.values()):>6} | {twice:>13} | "
+              f"{stand_in.count('/requery'):>9}")
+
+    print(f"\n🔥 Outage: every purchase answers 503, {USERS} users at a time")
+    print(f"   {'mode':<9} | {'calls':>5} | {'slowest':>8} | {'median':>8} | {'vtu.ng hits':>11}")
+    stand_in.outage, stand_in.lost_ratio = True, 0.0
+
+    def outage(mode, buy, calls):
+        stand_in.hits.clear()
+        timings, lock = [], threading.Lock()
+        def user(n):
+            for _ in range(n):
+                began = time.perf_counter()
+                buy(new_id())
+                with lock:
+                    timings.append(time.perf_counter() - began)
+        threads = [threading.Thread(target=user, args=(calls // USERS,)) for _ in range(USERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        timings.sort()
+        shown = lambda s: f"{s:.2f}s" if s >= 0.01 else f"{s * 1e6:.0f}µs"
+        print(f"   {mode:<9} | {len(timings):>5} | {shown(timings[-1]):>8} | {shown(timings[len(timings) // 2]):>8} | "
+              f"{stand_in.count('/airtime'):>11}")
+
+    outage('old loop', old_loop, USERS)
+    outage('executor', new_path, USERS * 25)
+    breaker = executor.breaker('airtime')
+    print(f"   breaker {breaker.state} after {breaker.trips} trip(s)")
+
+    stand_in.outage = False
+    time.sleep(BREAKER_RESET)
+    began = time.perf_counter()
+    answer = new_path(new_id())
+    print(f"   vtu.ng back: probe answered {answer.get('code')} in {(time.perf_counter() - began) * 1000:.0f}ms, "
+          f"breaker {breaker.state}")
+
+    print("\n🔁 Replay")
+    request_id = new_id()
+    first = new_path(request_id)
+    stand_in.hits.clear()
+    began = time.perf_counter()
+    again = new_path(request_id)
+    print(f"   same request_id again: {(time.perf_counter() - began) * 1000:.1f}ms, same answer: {again == first}, "
+          f"vtu.ng hits: {sum(stand_in.hits.values())}, placed {stand_in.placed[request_id]} time(s)")
+
+    print("\n📊 Executor latency")
+    for product, s in vtu_executor.stats().items():
+        outcomes = ", ".join(f"{k} {v}" for k, v in sorted(s['outcomes'].items()))
+        print(f"   {product}: {s['count']} calls, mean {s['mean'] * 1000:.0f}ms, p50 ≤{s['p50']}s, p99 ≤{s['p99']}s "
+              f"| {outcomes} | breaker {s['breaker']}, {s['trips']} trip(s)")
+        print("      " + "  ".join(f"≤{bound}s:{n}" for bound, n in s['buckets'].items() if n))
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 50)
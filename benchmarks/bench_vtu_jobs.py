@@ -0,0 +1,156 @@
+"""
+VTU purchase throughput: the old in-webhook flow (debit, call vtu.ng,
+record the answer, all inside the Twilio request) against the queued flow
+of services/vtu_jobs.py (the webhook debits and enqueues; a WorkerPool
+sends the purchases and a Reconciler requeries the ones left pending).
+
+WEBHOOK_WORKERS threads stand in for the gunicorn workers taking the
+purchase messages. The vtu.ng stand-in (benchmarks/vtu_standin.py)
+answers after latency_ms and leaves PENDING of the orders 'processing'
+(settled on requery) and fails FAILED of them.
+
+Reports how long the webhook held its worker per purchase, end-to-end
+throughput until every purchase is settled, the most concurrent calls
+vtu.ng saw, and checks the books: every job completed or refunded, and
+wallet balances match the completed purchases.
+
+Run from the project root:
+    python -m benchmarks.bench_vtu_jobs [purchases] [latency_ms]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+WEBHOOK_WORKERS = 4
+POOL_WORKERS = 16
+PROVIDER_LIMIT = 4
+PROVIDERS = ['mtn', 'airtel', 'glo', '9mobile']
+USERS = 20
+START_BALANCE = 10_000_000 # kobo
+PENDING = 0.1
+FAILED = 0.05
+
+def run(purchases, latency_ms):
+    tmp = tempfile.mkdtemp()
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'vtu.db')}"
+    os.environ['VTU_TOKEN_FILE'] = os.path.join(tmp, 'vtu_token.json')
+    import database
+    import ledger
+    from database import User, Wallet, Transaction, VtuJob, atomic_write
+    from benchmarks.vtu_standin import VtuStandIn
+    from services import vtu_jobs, vtu_service
+
+    database.init_db()
+    users = []
+    for i in range(USERS):
+        user = User.create(phone=f"+234{i:010d}")
+        ledger.post('DEPOSIT', [(ledger.DEPOSITS, 'NGN', -START_BALANCE), (user, 'NGN', START_BALANCE)])
+        users.append(user)
+    stand_in = VtuStandIn(latency=latency_ms / 1000, pending_ratio=PENDING, fail_ratio=FAILED)
+    vtu_service.AUTH_URL, vtu_service.API_URL = stand_in.auth_url, stand_in.api_url
+    vtu_jobs.REQUERY_DELAY = 0.2 # requery soon, so the run ends
+    quiet = lambda *args: None
+    orders = [(users[i % USERS], PROVIDERS[i % len(PROVIDERS)], 100 + i % 5 * 100) for i in range(purchases)]
+
+    print(f"📱 {purchases} airtime purchases, vtu.ng stand-in {latency_ms}ms, "
+          f"{PENDING:.0%} pending / {FAILED:.0%} failed, {WEBHOOK_WORKERS} webhook workers\n")
+    print(f"{'mode':<10} | {'webhook p50':>11} | {'webhook p99':>11} | {'settled/s':>9} | {'vtu.ng peak':>11} | {'completed':>9} | {'refunded':>8}")
+    print("-" * 90)
+
+    def debit(user, amount, service='Airtime'):
+        ledger.post('VTU', [(user, 'NGN', -amount), (ledger.VTU, 'NGN', amount)], memo=user.phone)
+        return Transaction.create(user=user, type=f'VTU_{service.upper()}', currency='NGN', amount=amount,
+                                  status='pending', tx_hash=user.phone)
+
+    def in_webhook(user, provider, naira):
+        # The old step 4: debit, then call vtu.ng and record its answer, all in the request
+        amount = naira * 100
+        with atomic_write():
+            tx = debit(user, amount)
+        try:
+            resp = vtu_service.VTUApiClient().purchase_airtime(f"req_{uuid.uuid4().hex[:12]}", user.phone, provider, naira)
+        except Exception:
+            return 'error'
+        if resp.get('code') == 'success':
+            tx.status = 'completed'
+            tx.save()
+            return 'completed'
+        with atomic_write():
+            ledger.post('VTU_REFUND', [(ledger.VTU, 'NGN', -amount), (user, 'NGN', amount)], memo=user.phone)
+            tx.status = 'failed'
+            tx.save()
+        return 'refunded'
+
+    def queued(user, provider, naira):
+        amount = naira * 100
+        with atomic_write():
+            tx = debit(user, amount)
+            vtu_jobs.enqueue(tx, user, f"req_{uuid.uuid4().hex[:12]}", 'Airtime', provider, user.phone, amount)
+
+    def webhooks(handle):
+        # WEBHOOK_WORKERS threads take the purchases in turn, like gunicorn -w
+        timings, results, lock = [], [], threading.Lock()
+        def worker(n):
+            database.db.connect(reuse_if_open=True)
+            for order in orders[n::WEBHOOK_WORKERS]:
+                began = time.perf_counter()
+                result = handle(*order)
+                with lock:
+                    timings.append(time.perf_counter() - began)
+                    results.append(result)
+            database.db.close()
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(WEBHOOK_WORKERS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return sorted(timings), results
+
+    def report(mode, timings, elapsed, completed, refunded):
+        pct = lambda q: timings[min(len(timings) - 1, int(len(timings) * q))] * 1000
+        print(f"{mode:<10} | {pct(0.5):>9.1f}ms | {pct(0.99):>9.1f}ms | {purchases / elapsed:>9.1f} | "
+              f"{stand_in.peak:>11} | {completed:>9} | {refunded:>8}")
+
+    began = time.perf_counter()
+    timings, results = webhooks(in_webhook)
+    report('webhook', timings, time.perf_counter() - began, results.count('completed'), results.count('refunded'))
+    baseline = Transaction.select().where(Transaction.type == 'VTU_AIRTIME').count()
+
+    stand_in.peak = 0
+    pool = vtu_jobs.WorkerPool(workers=POOL_WORKERS, limits={}, default_limit=PROVIDER_LIMIT, poll_interval=0.05, notify=quiet)
+    reconciler = vtu_jobs.Reconciler(interval=0.1, notify=quiet)
+    stop = threading.Event()
+    began = time.perf_counter()
+    threads = [threading.Thread(target=pool.run, args=(stop,)), threading.Thread(target=reconciler.run, args=(stop,))]
+    for t in threads:
+        t.start()
+    timings, _ = webhooks(queued)
+    while VtuJob.select().where(VtuJob.status.not_in(vtu_jobs.SETTLED)).exists():
+        time.sleep(0.02)
+    elapsed = time.perf_counter() - began
+    stop.set()
+    for t in threads:
+        t.join()
+    counts = vtu_jobs.counts()
+    report('queued', timings, elapsed, counts.get('completed', 0), counts.get('refunded', 0))
+
+    # --- BOOKS ---
+    jobs = list(VtuJob.select())
+    tx_status = dict(Transaction.select(Transaction.id, Transaction.status).tuples())
+    mismatched = sum(tx_status[j.tx_id] != {'completed': 'completed', 'refunded': 'failed'}[j.status] for j in jobs)
+    spent = sum(j.amount for j in jobs if j.status == 'completed')
+    old_spent = sum(t.amount for t in Transaction.select().where(Transaction.type == 'VTU_AIRTIME', Transaction.status == 'completed')
+                    if t.id not in {j.tx_id for j in jobs})
+    balances = sum(w.balance for w in Wallet.select())
+    print(f"\n📒 queued: {pool.results['processing']} answered 'processing', settled by {reconciler.requeries} requeries "
+          f"({reconciler.finalized} finalized, {reconciler.refunded} refunded)")
+    print(f"   {len(jobs)} jobs, {baseline} webhook purchases; transactions out of step with their job: {mismatched}")
+    print(f"   wallets {'✅ balance' if balances == USERS * START_BALANCE - spent - old_spent else '❌ do not balance'} "
+          f"against completed purchases")
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 200,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 300)
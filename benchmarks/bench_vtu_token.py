@@ -0,0 +1,87 @@
+"""
+vtu.ng round trips per purchase: authenticating before every purchase
+(the old VTUApiClient built per purchase) against the shared token in
+services/vtu_auth.py.
+
+- sequential: `purchases` airtime purchases one after another
+- burst:      THREADS purchases at once in one process, cold cache
+- workers:    WORKERS forked processes (gunicorn -w) purchasing at once,
+              cold cache; the token file is shared between them
+
+The vtu.ng stand-in (benchmarks/vtu_standin.py) answers after latency_ms.
+
+Run from the project root:
+    python -m benchmarks.bench_vtu_token [purchases] [latency_ms]
+"""
+import multiprocessing
+import os
+import sys
+import tempfile
+import threading
+import time
+
+THREADS = 30
+WORKERS = 4
+
+def run(purchases, latency_ms):
+    os.environ['VTU_TOKEN_FILE'] = os.path.join(tempfile.mkdtemp(), 'vtu_token.json')
+    from benchmarks.vtu_standin import VtuStandIn
+    from services import http_client, vtu_auth, vtu_service
+
+    stand_in = VtuStandIn(latency=latency_ms / 1000)
+    vtu_service.AUTH_URL, vtu_service.API_URL = stand_in.auth_url, stand_in.api_url
+    print(f"📱 vtu.ng stand-in {latency_ms}ms per request\n")
+    print(f"{'mode':<24} | {'per purchase':>12} | {'auth calls':>10} | {'requests':>8}")
+    print("-" * 64)
+
+    def report(mode, fn, count):
+        stand_in.hits.clear()
+        began = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - began
+        print(f"{mode:<24} | {elapsed / count * 1000:>10.1f}ms | {stand_in.count('/token'):>10} | "
+              f"{sum(stand_in.hits.values()):>8}")
+
+    def old_purchase(i):
+        # The old path: a fresh client authenticates, then purchases
+        client = vtu_service.VTUApiClient()
+        token = client._authenticate()
+        http_client.post(f"{vtu_service.API_URL}airtime", json={'request_id': f"old-{i}", 'phone': '08030000000',
+                                                                 'service_id': 'mtn', 'amount': 100},
+                         headers={'Authorization': f"Bearer {token}"}).raise_for_status()
+
+    def purchase(i):
+        vtu_service.VTUApiClient().purchase_airtime(f"new-{i}", '08030000000', 'mtn', 100)
+
+    def cold():
+        os.remove(vtu_auth.TOKEN_FILE)
+        vtu_auth._managers.clear()
+
+    def burst(fn):
+        threads = [threading.Thread(target=fn, args=(i,)) for i in range(THREADS)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    def workers():
+        def worker(n):
+            for i in range(purchases // WORKERS):
+                purchase(f"{n}-{i}")
+        processes = [multiprocessing.get_context('fork').Process(target=worker, args=(n,)) for n in range(WORKERS)]
+        for p in processes:
+            p.start()
+        for p in processes:
+            p.join()
+
+    report('sequential (auth each)', lambda: [old_purchase(i) for i in range(purchases)], purchases)
+    report('sequential (shared)', lambda: [purchase(i) for i in range(purchases)], purchases)
+    report(f'burst x{THREADS} (auth each)', lambda: burst(old_purchase), THREADS)
+    cold()
+    report(f'burst x{THREADS} (shared)', lambda: burst(purchase), THREADS)
+    cold()
+    report(f'{WORKERS} workers (shared)', workers, purchases // WORKERS * WORKERS)
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 40,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 80)
@@ -0,0 +1,145 @@
+"""
+Local stand-in for the vtu.ng API used by the VTU benchmarks.
+
+Serves the JWT endpoint (tokens expire after `token_ttl` seconds and are
+checked on every call), purchases (airtime, data), requery and the data/TV
+variation lists (public, with an ETag; edit `variations` to change them),
+each after `latency` seconds. Counts requests per path and purchases per
+request_id. Set `outage` to answer every purchase 503; `lost_ratio` of
+purchases are placed but answered 502, as when the reply is lost.
+
+    stand_in = VtuStandIn(latency=0.05)
+    vtu_service.AUTH_URL, vtu_service.API_URL = stand_in.auth_url, stand_in.api_url
+"""
+import base64
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+def make_jwt(expires_at):
+    encode = lambda part: base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b'=').decode()
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode({'exp': int(expires_at), 'nonce': random.random()})}.stand-in"
+
+class VtuStandIn:
+    def __init__(self, latency=0.05, token_ttl=3600, pending_ratio=0.0, fail_ratio=0.0, lost_ratio=0.0, seed=7):
+        self.latency = latency
+        self.token_ttl = token_ttl
+        self.pending_ratio = pending_ratio # purchases answered 'processing' (settled on requery)
+        self.fail_ratio = fail_ratio       # purchases answered with a provider error
+        self.lost_ratio = lost_ratio       # purchases placed but answered 502
+        self.outage = False
+        self.placed = {} # request_id -> times purchased
+        self.hits = {}
+        self.orders = {} # request_id -> 'completed' | 'processing' | 'failed'
+        self.tokens = set()
+        self.variations = {
+            'data': [{'variation_id': f"{p}-{size}", 'service_id': p, 'data_plan': f"{size} - 30 days", 'price': str(price),
+                      'availability': 'Available'}
+                     for p in ('mtn', 'airtel', 'glo', '9mobile')
+                     for size, price in (('500MB', 150), ('1GB', 300), ('2GB', 600), ('5GB', 1500))],
+            'tv': [{'variation_id': f"{p}-{i}", 'service_id': p, 'package_bouquet': f"{p.upper()} Package {i}",
+                    'price': str(1500 * i), 'availability': 'Available'}
+                   for p in ('dstv', 'gotv', 'startimes', 'showmax') for i in range(1, 6)],
+        }
+        self.active = 0
+        self.peak = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _reply(self, status, payload, etag=None):
+                body = json.dumps(payload).encode() if status != 304 else b''
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                if etag:
+                    self.send_header('ETag', etag)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length)) if length else {}
+                url = urlparse(self.path)
+                path = url.path
+                with stand_in._lock:
+                    stand_in.hits[path] = stand_in.hits.get(path, 0) + 1
+                    stand_in.active += 1
+                    stand_in.peak = max(stand_in.peak, stand_in.active)
+                try:
+                    time.sleep(stand_in.latency)
+                    status, answer = stand_in.answer(path, payload, self.headers.get('Authorization', ''),
+                                                     {k: v[0] for k, v in parse_qs(url.query).items()})
+                finally:
+                    with stand_in._lock:
+                        stand_in.active -= 1
+                etag = None
+                if '/variations/' in path and status == 200:
+                    etag = '"' + hashlib.md5(json.dumps(answer, sort_keys=True).encode()).hexdigest() + '"'
+                    if self.headers.get('If-None-Match') == etag:
+                        status = 304
+                self._reply(status, answer, etag)
+
+            do_GET = _handle
+            do_POST = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        base = f"http://127.0.0.1:{self.server.server_port}/wp-json/"
+        self.auth_url = base + "jwt-auth/v1/token"
+        self.api_url = base + "api/v2/"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def count(self, suffix):
+        return sum(n for path, n in self.hits.items() if path.endswith(suffix))
+
+    def answer(self, path, payload, authorization, query=None):
+        if path.endswith('/jwt-auth/v1/token'):
+            token = make_jwt(time.time() + self.token_ttl)
+            with self._lock:
+                self.tokens.add(token)
+            return 200, {'token': token}
+        if '/variations/' in path:
+            service_id = (query or {}).get('service_id')
+            items = [v for v in self.variations.get(path.rsplit('/', 1)[1], [])
+                     if service_id is None or v['service_id'] == service_id]
+            return 200, {'code': 'success', 'data': items}
+        token = authorization.replace('Bearer ', '')
+        if token not in self.tokens:
+            return 403, {'code': 'jwt_auth_invalid_token', 'message': 'Expired token'}
+        if path.endswith('/requery'):
+            with self._lock:
+                state = self.orders.get(payload.get('request_id'))
+                if state == 'processing':
+                    # Settles by the time anyone asks again
+                    state = self.orders[payload['request_id']] = 'completed'
+            if state is None:
+                return 200, {'code': 'failure', 'message': 'Order not found'}
+            return 200, {'code': 'success', 'data': {'status': state, 'request_id': payload['request_id']}}
+        if path.endswith(('/airtime', '/data')):
+            if self.outage:
+                return 503, {'code': 'service_unavailable', 'message': 'Service Unavailable'}
+            with self._lock:
+                roll = self._rng.random()
+                state = 'failed' if roll < self.fail_ratio else 'processing' if roll < self.fail_ratio + self.pending_ratio else 'completed'
+                self.orders[payload.get('request_id')] = state
+                self.placed[payload.get('request_id')] = self.placed.get(payload.get('request_id'), 0) + 1
+                lost = self._rng.random() < self.lost_ratio
+            if lost:
+                return 502, {'code': 'bad_gateway', 'message': 'Bad Gateway'}
+            if state == 'failed':
+                return 200, {'code': 'failure', 'message': 'Service temporarily unavailable'}
+            return 200, {'code': 'success', 'data': {'status': state, 'request_id': payload.get('request_id')}}
+        if path.endswith('/balance'):
+            return 200, {'code': 'success', 'data': {'balance': 1000000}}
+        return 404, {'code': 'not_found'}
@@ -0,0 +1,256 @@
+# ledger.py
+"""
+Double-entry ledger.
+
+Every balance movement is one JournalEntry whose Postings sum to zero per
+currency. A posting either hits a user wallet or a system account (the
+platform side of the movement, see ACCOUNTS). Wallet.balance is the
+materialized projection of the wallet's postings, kept current in the
+same transaction:
+
+- debit:  UPDATE wallet SET balance = balance - ? WHERE user_id = ? AND
+          currency = ? AND balance >= ?  (row count 0 -> InsufficientFunds)
+- credit: relative balance = balance + ?, upserting a missing wallet
+
+Both use RETURNING, so the wallet id for the posting and the new balance
+come back from the same statement. WalletSnapshot rows let a balance be
+rebuilt or audited from the latest snapshot plus the postings after it.
+
+Amounts are integer minor units (see money.py).
+"""
+import contextlib
+from collections import defaultdict
+from peewee import EXCLUDED, fn
+from database import db, Wallet, Transaction, JournalEntry, Posting, WalletSnapshot, atomic_write, IS_SQLITE
+import money
+
+# --- SYSTEM ACCOUNTS ---
+DEPOSITS = 'deposits'   # funds received from outside (deposit approvals, admin credits)
+PAYOUTS = 'payouts'     # withdrawals owed / paid out
+FEES = 'fees'           # platform fee income
+FX = 'fx'               # swap/trade desk position per currency
+REWARDS = 'rewards'     # referral bonuses
+VTU = 'vtu'             # airtime/data provider
+OPENING = 'opening'     # balances that existed before the journal
+ACCOUNTS = (DEPOSITS, PAYOUTS, FEES, FX, REWARDS, VTU, OPENING)
+
+class InsufficientFunds(Exception):
+    def __init__(self, currency, required, balance):
+        self.currency = currency
+        self.required = required
+        self.balance = balance
+        super().__init__(f"Insufficient {currency} balance: {money.fmt(balance, currency)} < {money.fmt(required, currency)}")
+
+class UnbalancedEntry(ValueError):
+    pass
+
+def _transaction():
+    # Inside a caller's transaction, join it: a failure propagates and rolls
+    # the whole thing back, without a SAVEPOINT/RELEASE round trip per call
+    return contextlib.nullcontext() if db.in_transaction() else atomic_write()
+
+def _wallet(user, currency):
+    return (Wallet.user == user) & (Wallet.currency == currency)
+
+def balance_of(user, currency):
+    """Current balance in minor units; raises Wallet.DoesNotExist."""
+    row = Wallet.select(Wallet.balance).where(_wallet(user, currency)).tuples().first()
+    if row is None:
+        raise Wallet.DoesNotExist(f"No {currency} wallet")
+    return row[0]
+
+# --- WALLET PROJECTION ---
+
+def debit(user, currency, amount):
+    """
+    Takes `amount` from the wallet only if it covers it. Returns
+    (wallet_id, new_balance). On failure a read tells a missing wallet
+    (Wallet.DoesNotExist) from a short balance (InsufficientFunds).
+    """
+    row = (Wallet
+           .update(balance=Wallet.balance - amount)
+           .where(_wallet(user, currency) & (Wallet.balance >= amount))
+           .returning(Wallet.id, Wallet.balance)
+           .tuples()
+           .execute())
+    row = list(row)
+    if not row:
+        raise InsufficientFunds(currency, amount, balance_of(user, currency))
+    return row[0]
+
+def credit(user, currency, amount, create=True):
+    """
+    Adds `amount` to the wallet and returns (wallet_id, new_balance). With
+    create=True a missing wallet is opened in the same statement (upsert on
+    the unique (user, currency) index); otherwise it raises Wallet.DoesNotExist.
+    """
+    if create:
+        query = (Wallet
+                 .insert(user=user, currency=currency, balance=amount, locked=0)
+                 .on_conflict(conflict_target=[Wallet.user, Wallet.currency],
+                              update={Wallet.balance: Wallet.balance + EXCLUDED.balance}))
+    else:
+        query = Wallet.update(balance=Wallet.balance + amount).where(_wallet(user, currency))
+    row = list(query.returning(Wallet.id, Wallet.balance).tuples().execute())
+    if not row:
+        raise Wallet.DoesNotExist(f"No {currency} wallet")
+    return row[0]
+
+# --- JOURNAL ---
+
+def post(kind, legs, memo=None, create_wallets=True):
+    """
+    Records one balanced movement. `legs` are (holder, currency, amount):
+    holder is a user (or user id) for wallet legs, or a system account
+    name; amount is signed (+ credit, - debit); zero legs are skipped.
+    Wallet legs update Wallet.balance in the same transaction. Returns
+    {holder: new_balance} for the wallet legs.
+    """
+    legs = [leg for leg in legs if leg[2]]
+    totals = defaultdict(int)
+    for _, currency, amount in legs:
+        totals[currency] += amount
+    if any(totals.values()):
+        raise UnbalancedEntry(f"{kind} entry does not balance: {dict(totals)}")
+
+    balances = {}
+    with _transaction():
+        rows = []
+        # Debits first: a short balance fails before anything is credited
+        for holder, currency, amount in sorted(legs, key=lambda leg: leg[2]):
+            if isinstance(holder, str):
+                rows.append({'wallet': None, 'account': holder, 'currency': currency, 'amount': amount})
+                continue
+            if amount < 0:
+                wallet_id, balance = debit(holder, currency, -amount)
+            else:
+                wallet_id, balance = credit(holder, currency, amount, create=create_wallets)
+            balances[holder] = balance
+            rows.append({'wallet': wallet_id, 'account': 'wallet', 'currency': currency, 'amount': amount})
+        entry_id = JournalEntry.insert(kind=kind, memo=memo).execute()
+        for row in rows:
+            row['entry'] = entry_id
+        Posting.insert_many(rows).execute()
+    return balances
+
+def transfer(sender, recipient, currency, amount):
+    """Internal P2P transfer plus both activity rows, in one transaction."""
+    with _transaction():
+        post('TRANSFER', [(sender, currency, -amount), (recipient, currency, amount)],
+             memo=f"{sender.phone}->{recipient.phone}", create_wallets=False)
+        Transaction.insert_many([
+            {'user': sender, 'type': 'TRANSFER', 'currency': currency, 'amount': amount,
+             'status': 'completed', 'tx_hash': recipient.phone},
+            {'user': recipient, 'type': 'RECEIVE', 'currency': currency, 'amount': amount,
+             'status': 'completed', 'tx_hash': sender.phone},
+        ]).execute()
+
+def exchange(user, from_currency, amount, to_currency, received, kind='SWAP'):
+    """Converts `amount` of from_currency into `received` of to_currency through the FX desk."""
+    return post(kind, [
+        (user, from_currency, -amount), (FX, from_currency, amount),
+        (FX, to_currency, -received), (user, to_currency, received),
+    ])
+
+def swap(user, from_currency, amount, to_currency, received):
+    with _transaction():
+        exchange(user, from_currency, amount, to_currency, received)
+        Transaction.insert_many([
+            {'user': user, 'type': 'SWAP', 'currency': from_currency, 'amount': -amount,
+             'status': 'completed', 'tx_hash': f"SWAP->{to_currency}"},
+            {'user': user, 'type': 'SWAP', 'currency': to_currency, 'amount': received,
+             'status': 'completed', 'tx_hash': f"SWAP<-{from_currency}"},
+        ]).execute()
+
+# --- SNAPSHOTS ---
+
+def _latest_snapshots():
+    latest = (WalletSnapshot
+              .select(WalletSnapshot.wallet, fn.MAX(WalletSnapshot.last_posting).alias('last_posting'))
+              .group_by(WalletSnapshot.wallet))
+    return (WalletSnapshot
+            .select(WalletSnapshot.wallet, WalletSnapshot.last_posting, WalletSnapshot.balance)
+            .join(latest, on=((WalletSnapshot.wallet == latest.c.wallet_id) &
+                              (WalletSnapshot.last_posting == latest.c.last_posting))))
+
+def take_snapshots():
+    """
+    Snapshots every wallet that has postings since its last snapshot, as of
+    that wallet's own newest posting. Ids from concurrent transactions can
+    commit out of order, but a posting holds its wallet's row lock until it
+    commits, so one wallet's postings do: a late commit on another wallet is
+    still after that wallet's snapshot. Work is bounded by the wallets and
+    the postings since their snapshots (the (wallet, id) index), not history.
+    """
+    previous = {wallet_id: balance for wallet_id, _, balance in _latest_snapshots().tuples()}
+    last_snapshot = (WalletSnapshot
+                     .select(fn.COALESCE(fn.MAX(WalletSnapshot.last_posting), 0))
+                     .where(WalletSnapshot.wallet == Wallet.id))
+    moved = (Wallet
+             .select(Wallet.id, fn.MAX(Posting.id), fn.SUM(Posting.amount))
+             .join(Posting, on=((Posting.wallet == Wallet.id) & (Posting.id > last_snapshot)))
+             .group_by(Wallet.id)
+             .tuples())
+    rows = [{'wallet': wallet_id, 'last_posting': last, 'balance': previous.get(wallet_id, 0) + delta}
+            for wallet_id, last, delta in moved]
+    with atomic_write():
+        for start in range(0, len(rows), 500):
+            WalletSnapshot.insert_many(rows[start:start + 500]).execute()
+    return len(rows)
+
+def rebuild_balance(wallet_id):
+    """Balance from the latest snapshot plus the postings after it (indexed on (wallet, id))."""
+    snapshot = (WalletSnapshot
+                .select(WalletSnapshot.last_posting, WalletSnapshot.balance)
+                .where(WalletSnapshot.wallet == wallet_id)
+                .order_by(WalletSnapshot.last_posting.desc())
+                .tuples()
+                .first())
+    last, balance = snapshot or (0, 0)
+    delta = (Posting
+             .select(fn.COALESCE(fn.SUM(Posting.amount), 0))
+             .where((Posting.wallet == wallet_id) & (Posting.id > last))
+             .scalar())
+    return balance + delta
+
+# --- VERIFICATION ---
+
+def verify():
+    """
+    Checks the whole ledger in one streaming pass over the postings, inside
+    one read transaction (a consistent snapshot while writers continue):
+    - every entry balances per currency
+    - every wallet balance equals the sum of its postings
+    - every latest snapshot equals the sum of its postings up to last_posting
+    Returns a list of problem strings (empty when the ledger is consistent).
+    """
+    problems = []
+    sums = defaultdict(int)
+    at_snapshot = defaultdict(int)
+    with (db.atomic() if IS_SQLITE else db.atomic(isolation_level='REPEATABLE READ')):
+        snapshots = {wallet_id: (last, balance) for wallet_id, last, balance in _latest_snapshots().tuples()}
+        current_entry, entry_totals = None, defaultdict(int)
+        query = (Posting
+                 .select(Posting.entry, Posting.id, Posting.wallet, Posting.currency, Posting.amount)
+                 .order_by(Posting.entry, Posting.id)
+                 .tuples())
+        for entry_id, posting_id, wallet_id, currency, amount in query.iterator():
+            if entry_id != current_entry:
+                if any(entry_totals.values()):
+                    problems.append(f"entry {current_entry} unbalanced: {dict(entry_totals)}")
+                current_entry, entry_totals = entry_id, defaultdict(int)
+            entry_totals[currency] += amount
+            if wallet_id is not None:
+                sums[wallet_id] += amount
+                if wallet_id in snapshots and posting_id <= snapshots[wallet_id][0]:
+                    at_snapshot[wallet_id] += amount
+        if any(entry_totals.values()):
+            problems.append(f"entry {current_entry} unbalanced: {dict(entry_totals)}")
+
+        for wallet_id, currency, balance in Wallet.select(Wallet.id, Wallet.currency, Wallet.balance).tuples().iterator():
+            if balance != sums.get(wallet_id, 0):
+                problems.append(f"wallet {wallet_id} ({currency}) balance {balance} != postings {sums.get(wallet_id, 0)}")
+        for wallet_id, (last, balance) in snapshots.items():
+            if balance != at_snapshot[wallet_id]:
+                problems.append(f"wallet {wallet_id} snapshot @{last} {balance} != postings {at_snapshot[wallet_id]}")
+    return problems
@@ -1,10 +1,15 @@
-import sqlite3
+from playhouse.migrate import SchemaMigrator, migrate
+from database import db
+import peewee
 
-conn = sqlite3.connect('cex_ledger.db')
 try:
-    conn.execute("ALTER TABLE user ADD COLUMN pin TEXT;")
+    db.connect(reuse_if_open=True)
+    migrator = SchemaMigrator.from_database(db)
+    migrate(
+        migrator.add_column('user', 'pin', peewee.CharField(null=True))
+    )
     print("Column 'pin' added to 'user' table.")
 except Exception as e:
     print(f"Migration error or column already exists: {e}")
 finally:
-    conn.close()
+    db.close()
@@ -0,0 +1,22 @@
+from playhouse.migrate import SchemaMigrator, migrate
+from database import db
+import peewee
+
+# Ensure connection is closed before migration
+if not db.is_closed():
+    db.close()
+
+try:
+    db.connect()
+    migrator = SchemaMigrator.from_database(db)
+    # Alert kinds: re-arming (hysteresis band), percent move, 24h breakout
+    migrate(
+        migrator.add_column('alert', 'kind', peewee.CharField(default='cross')),
+        migrator.add_column('alert', 'band', peewee.FloatField(null=True)),
+        migrator.add_column('alert', 'armed', peewee.BooleanField(default=True)),
+        migrator.add_column('alert', 'reference_price', peewee.FloatField(null=True)),
+    )
+    db.close()
+    print('Migration successful: alert kind, band, armed, reference_price added.')
+except Exception as e:
+    print(f'Migration failed: {e}')
@@ -0,0 +1,59 @@
+"""
+Converts wallet.balance, wallet.locked and transaction.amount from REAL
+(float major units) to INTEGER minor units (see money.py).
+
+Each column is rescaled in place with the currency's scale, then its
+declared type is changed to BIGINT (integer affinity on SQLite). Columns that
+are already INTEGER are skipped, so re-running is harmless.
+
+Usage: python migrate_fixed_point_amounts.py
+"""
+from playhouse.migrate import SchemaMigrator, migrate
+from database import db, MoneyField
+import money
+
+COLUMNS = [
+    ('wallet', 'balance', 0),
+    ('wallet', 'locked', 0),
+    ('transaction', 'amount', None),
+]
+
+def scale_case():
+    """SQL CASE giving 10**scale for the row's currency."""
+    whens = " ".join(f"WHEN '{code}' THEN {10 ** places}" for code, places in money.SCALES.items())
+    return f"CASE UPPER(currency) {whens} ELSE {10 ** money.DEFAULT_SCALE} END"
+
+def pending_columns():
+    pending = []
+    for table, column, default in COLUMNS:
+        types = {c.name: c.data_type.upper() for c in db.get_columns(table)}
+        if not types.get(column, '').startswith(('INT', 'BIGINT')):
+            pending.append((table, column, default))
+    return pending
+
+def run():
+    db.connect(reuse_if_open=True)
+    pending = pending_columns()
+    if not pending:
+        print("Nothing to do: amounts are already fixed-point.")
+        return
+
+    migrator = SchemaMigrator.from_database(db)
+    with db.atomic():
+        for table, column, default in pending:
+            print(f"🔧 Rescaling {table}.{column} to minor units...")
+            db.execute_sql(
+                f'UPDATE "{table}" SET "{column}" = CAST(ROUND("{column}" * {scale_case()}) AS BIGINT)')
+        migrate(*[
+            migrator.alter_column_type(table, column, MoneyField(default=default) if default is not None else MoneyField())
+            for table, column, default in pending
+        ])
+    print(f"Migration successful: {', '.join(f'{t}.{c}' for t, c, _ in pending)} now stored as integers.")
+
+if __name__ == "__main__":
+    try:
+        run()
+    except Exception as e:
+        print(f'Migration failed: {e}')
+    finally:
+        db.close()
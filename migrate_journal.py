@@ -0,0 +1,57 @@
+"""
+Adds the double-entry journal tables (JournalEntry, Posting, WalletSnapshot)
+to an existing database and opens the journal with the current balances.
+
+Wallets whose balance is not yet backed by postings get one OPENING entry
+(wallet postings balanced per currency by the 'opening' system account),
+then a first snapshot is taken. Re-running only covers wallets that still
+have no postings.
+
+Usage: python migrate_journal.py
+"""
+from collections import defaultdict
+from database import db, Wallet, JournalEntry, Posting, WalletSnapshot, atomic_write
+import ledger
+
+BATCH = 500
+
+def open_balances():
+    """One OPENING entry for every non-zero wallet without postings."""
+    journaled = Posting.select(Posting.wallet).where(Posting.wallet.is_null(False)).distinct()
+    wallets = (Wallet
+               .select(Wallet.id, Wallet.currency, Wallet.balance)
+               .where((Wallet.balance != 0) & Wallet.id.not_in(journaled))
+               .tuples())
+    rows, totals = [], defaultdict(int)
+    for wallet_id, currency, balance in wallets.iterator():
+        rows.append({'wallet': wallet_id, 'account': 'wallet', 'currency': currency, 'amount': balance})
+        totals[currency] += balance
+    if not rows:
+        return 0
+    rows += [{'wallet': None, 'account': ledger.OPENING, 'currency': currency, 'amount': -total}
+             for currency, total in totals.items()]
+    with atomic_write():
+        entry_id = JournalEntry.insert(kind='OPENING', memo='balances before the journal').execute()
+        for row in rows:
+            row['entry'] = entry_id
+        for start in range(0, len(rows), BATCH):
+            Posting.insert_many(rows[start:start + BATCH]).execute()
+    return len(rows) - len(totals)
+
+def run():
+    db.connect(reuse_if_open=True)
+    db.create_tables([JournalEntry, Posting, WalletSnapshot], safe=True)
+    print("🔧 Journal tables ready.")
+    opened = open_balances()
+    print(f"📒 Opening entry covers {opened} wallet(s).")
+    snapped = ledger.take_snapshots()
+    print(f"📸 Snapshotted {snapped} wallet(s).")
+    print("Migration successful: journal opened. Run verify_ledger.py to audit it.")
+
+if __name__ == "__main__":
+    try:
+        run()
+    except Exception as e:
+        print(f'Migration failed: {e}')
+    finally:
+        db.close()
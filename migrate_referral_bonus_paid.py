@@ -1,4 +1,4 @@
-from playhouse.migrate import SqliteMigrator, migrate
+from playhouse.migrate import SchemaMigrator, migrate
 from database import db
 import peewee
 
@@ -8,7 +8,7 @@ if not db.is_closed():
 
 try:
     db.connect()
-    migrator = SqliteMigrator(db)
+    migrator = SchemaMigrator.from_database(db)
     # Add referral_bonus_paid as BooleanField
     migrate(
         migrator.add_column('user', 'referral_bonus_paid', peewee.BooleanField(default=False))
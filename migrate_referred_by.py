@@ -1,4 +1,4 @@
-from playhouse.migrate import SqliteMigrator, migrate
+from playhouse.migrate import SchemaMigrator, migrate
 from database import db, User
 import peewee
 
@@ -8,7 +8,7 @@ if not db.is_closed():
 
 try:
     db.connect()
-    migrator = SqliteMigrator(db)
+    migrator = SchemaMigrator.from_database(db)
     # Add referred_by_id as IntegerField (foreign key columns are integer)
     migrate(
         migrator.add_column('user', 'referred_by_id', peewee.IntegerField(null=True))
@@ -0,0 +1,42 @@
+"""
+Bulk VTU: the vtubatch table, and the batch each queued vtujob row belongs
+to (vtujob.batch_id, indexed for the batch report and requery). Creates
+vtujob too on a database that predates the VTU queue. Safe to run again.
+
+Usage: python migrate_vtu_batches.py
+"""
+import sys
+from playhouse.migrate import SchemaMigrator, migrate
+from database import db, VtuBatch, VtuJob
+import peewee
+
+def run():
+    db.connect(reuse_if_open=True)
+    db.create_tables([VtuBatch], safe=True)
+    if not db.table_exists('vtujob'):
+        # Created with batch_id and its index already
+        db.create_tables([VtuJob])
+        print('Migration successful: vtubatch and vtujob tables created.')
+        return
+    migrator = SchemaMigrator.from_database(db)
+    operations = []
+    if 'batch_id' not in {c.name for c in db.get_columns('vtujob')}:
+        operations.append(migrator.add_column(
+            'vtujob', 'batch_id', peewee.ForeignKeyField(VtuBatch, null=True, field=VtuBatch.id, index=False)))
+    if not any(index.columns == ['batch_id'] for index in db.get_indexes('vtujob')):
+        operations.append(migrator.add_index('vtujob', ('batch_id',), False))
+    if not operations:
+        print("Nothing to do: vtubatch and vtujob.batch_id already exist.")
+        return
+    with db.atomic():
+        migrate(*operations)
+    print('Migration successful: vtubatch table, vtujob.batch_id and its index added.')
+
+if __name__ == "__main__":
+    try:
+        run()
+    except Exception as e:
+        print(f'Migration failed: {e}')
+        sys.exit(1)
+    finally:
+        db.close()
@@ -19,10 +19,16 @@ def admin_menu():
         "• gift: Pending giftcards\n"
         "• approve giftcard: Approve or reject giftcard\n"
         "\n"
+        "*VTU*\n"
+        "• bulk: Bulk airtime/data to a list of numbers\n"
+        "• bulk status [REF]: Bulk batch report\n"
+        "\n"
         "*Communication*\n"
         "• broadcast: Send broadcast\n"
         "• tickets: Open support tickets\n"
         "• reply: Reply to ticket\n"
+        "• outbox: Message queue and dead letters\n"
+        "• outbox retry [ID|all]: Requeue dead letters\n"
         "\n"
         "*Menu/Help*\n"
         "• admin: Show this menu\n"
@@ -69,7 +75,7 @@ def get_pending_deposits():
             method = 'Crypto'
             asset = tx.currency
         msg += f"ID {tx.id} | {tx.user.phone}\n"
-        msg += f"Amount: {tx.amount:,.2f} {asset} ({method})\n"
+        msg += f"Amount: {tx.amount_major:,.2f} {asset} ({method})\n"
         msg += f"Reference: {tx.tx_hash}\n\n"
     msg += "Approve: approve deposit [ID] [REF]"
     return msg
@@ -84,7 +90,7 @@ def get_pending_giftcards():
     msg = "*PENDING GIFTCARDS*\n━━━━━━━━━━━━━━━━\n"
     for tx in pending:
         msg += f"ID {tx.id} | {tx.user.phone}\n"
-        msg += f"Amount: {tx.amount:,.2f} {tx.currency}\n"
+        msg += f"Amount: {tx.amount_major:,.2f} {tx.currency}\n"
         msg += f"Reference: {tx.tx_hash}\n\n"
     msg += "Approve: approve giftcard [ID] [REF]"
     return msg
@@ -125,7 +131,7 @@ def handle_approve_giftcard_flow(user, msg, session):
                 return (f"❌ Error: Giftcard transaction ID not found. Type CANCEL to abort or enter a different ID:", session, False)
             if tx.status == 'completed':
                 return ("⚠️ Notice: This giftcard was already approved.", session, True)
-            with db.atomic():
+            with atomic_write():
                 tx.status = 'completed'
                 tx.tx_hash = ref
                 tx.save()
@@ -160,7 +166,7 @@ def handle_approve_giftcard_flow(user, msg, session):
             return (f"❌ Error: Giftcard transaction ID not found. Type CANCEL to abort or enter a different ID:", session, False)
         if tx.status == 'completed':
             return ("⚠️ Notice: This giftcard was already approved.", session, True)
-        with db.atomic():
+        with atomic_write():
             tx.status = 'rejected'
             tx.save()
         log_admin_action(admin_phone, f"Rejected giftcard ID {tx_id} | Reason: {reason}")
@@ -306,23 +312,25 @@ def handle_approve_flow(user, msg, session):
                     return (f"❌ Error: Transaction ID not found or not a withdrawal. Type CANCEL to abort or enter a different ID:", session, False)
             if tx.status == 'completed':
                 return (f"⚠️ Notice: This {approve_type} was already processed.", session, True)
-            with db.atomic():
-                tx.status = 'completed'
-                tx.tx_hash = ref
-                tx.save()
+            with atomic_write():
+                # Conditional flip: a second approval of the same ID updates nothing
+                flipped = (Transaction
+                           .update(status='completed', tx_hash=ref)
+                           .where((Transaction.id == tx.id) & (Transaction.status != 'completed'))
+                           .execute())
+                if flipped and approve_type == 'deposit':
+                    balances = ledger.post('DEPOSIT', [(ledger.DEPOSITS, tx.currency, -tx.amount), (tx.user_id, tx.currency, tx.amount)], memo=f"tx {tx.id}")
+                    new_balance = balances[tx.user_id]
+            if not flipped:
+                return (f"⚠️ Notice: This {approve_type} was already processed.", session, True)
             log_admin_action(admin_phone, f"Approved {approve_type} ID {tx_id} with Ref {ref if ref else 'N/A'}")
             if approve_type == 'withdrawal':
-                notifications.send_withdrawal_processed(tx.user, tx.amount, tx.currency, ref)
+                notifications.send_withdrawal_processed(tx.user, tx.amount_major, tx.currency, ref)
                 return (f"✅ Withdrawal {tx_id} successfully approved.", session, True)
             else:
-                # For deposit, update wallet balance automatically
-                from modules import wallet
-                # Find or create wallet
-                wallet_obj, _ = Wallet.get_or_create(user=tx.user, currency=tx.currency)
-                wallet_obj.balance += tx.amount
-                wallet_obj.save()
-                notifications.send_deposit_confirmation(tx.user, tx.amount, tx.currency)
-                return (f"✅ Deposit {tx_id} successfully approved and user credited. New Balance: {wallet_obj.balance:,.2f} {tx.currency}.", session, True)
+                # Deposit: wallet was credited in the same transaction as the approval
+                notifications.send_deposit_confirmation(tx.user, tx.amount_major, tx.currency)
+                return (f"✅ Deposit {tx_id} successfully approved and user credited. New Balance: {money.fmt(new_balance, tx.currency, 2)} {tx.currency}.", session, True)
         elif msg_clean == 'reject':
             session['step'] = 6
             return ("Please enter a reason for rejecting this deposit:", session, False)
@@ -339,7 +347,7 @@ def handle_approve_flow(user, msg, session):
             return (f"❌ Error: Transaction ID not found or not a deposit. Type CANCEL to abort or enter a different ID:", session, False)
         if tx.status == 'completed':
             return ("⚠️ Notice: This deposit was already approved.", session, True)
-        with db.atomic():
+        with atomic_write():
             tx.status = 'rejected'
             tx.save()
         log_admin_action(admin_phone, f"Rejected deposit ID {tx_id} | Reason: {reason}")
@@ -374,10 +382,10 @@ def handle_credit_flow(user, msg, session):
         return (f"Enter the amount to credit to {phone}:", session, False)
     elif step == 3:
         try:
-            amount = float(msg.strip())
-            if amount <= 0:
+            # Kept as text until the currency (and so the minor unit) is known
+            if money.to_minor(msg, None) <= 0:
                 return ("❌ Error: Amount must be positive. Enter a valid amount:", session, False)
-            session['amount'] = amount
+            session['amount'] = msg.strip().replace(',', '')
             session['step'] = 4
             return ("💱 Enter the currency (e.g., NGN, USDT):", session, False)
         except ValueError:
@@ -397,8 +405,8 @@ def handle_credit_flow(user, msg, session):
         if msg.strip().lower() == 'yes':
             # Perform credit with phone normalization
             phone = session['target_phone']
-            amount = session['amount']
             currency = session['currency']
+            amount = money.to_minor(session['amount'], currency)
             admin_phone = config.OWNER_PHONE.split(',')[0]
             def normalize_phone(phone):
                 phone = phone.strip()
@@ -411,10 +419,9 @@ def handle_credit_flow(user, msg, session):
             target_user = User.get_or_none((User.phone == phone) | (User.phone == norm_phone))
             if not target_user:
                 return (f"❌ User {phone} not found. Type CANCEL to abort or enter a different phone:", session, False)
-            with db.atomic():
-                wallet, _ = Wallet.get_or_create(user=target_user, currency=currency)
-                wallet.balance += amount
-                wallet.save()
+            with atomic_write():
+                balances = ledger.post('DEPOSIT', [(ledger.DEPOSITS, currency, -amount), (target_user, currency, amount)], memo=f'ADMIN_CREDIT_BY_{admin_phone}')
+                new_balance = balances[target_user]
                 tx = Transaction.create(
                     user=target_user,
                     type='DEPOSIT',
@@ -423,18 +430,21 @@ def handle_credit_flow(user, msg, session):
                     status='completed',
                     tx_hash=f'ADMIN_CREDIT_BY_{admin_phone}'
                 )
-            log_admin_action(admin_phone, f"Credited {amount} {currency} to {phone}")
-            notifications.send_deposit_confirmation(target_user, amount, currency)
-            return (f"✅ SUCCESS: {target_user.name} credited. New Balance: {wallet.balance:,.2f} {currency}.", session, True)
+            log_admin_action(admin_phone, f"Credited {money.fmt(amount, currency)} {currency} to {phone}")
+            notifications.send_deposit_confirmation(target_user, money.from_minor(amount, currency), currency)
+            return (f"✅ SUCCESS: {target_user.name} credited. New Balance: {money.fmt(new_balance, currency, 2)} {currency}.", session, True)
         else:
             return ("❌ Credit process cancelled.", session, True)
     else:
         return ("❓ Unknown step. Type CANCEL to abort.", session, False)
 import logging
 from peewee import fn
-from database import User, Wallet, Transaction, SupportTicket, db
+from database import User, Wallet, Transaction, SupportTicket, db, atomic_write
 from modules import notifications
 import config
+import router
+import money
+import ledger
 
 # Setup dedicated admin logging
 logger = logging.getLogger('admin_actions')
@@ -479,8 +489,8 @@ def credit_user(msg, admin_phone):
             return "⚠️ Usage: credit <PHONE> <AMOUNT> <CURRENCY>"
 
         target_phone = parts[1]
-        amount = float(parts[2])
         currency = parts[3].upper()
+        amount = money.to_minor(parts[2], currency)
 
         if amount <= 0:
             return "❌ Error: Credit amount must be positive."
@@ -489,10 +499,9 @@ def credit_user(msg, admin_phone):
         if not target_user:
             return f"❌ User {target_phone} not found."
 
-        with db.atomic():
-            wallet, _ = Wallet.get_or_create(user=target_user, currency=currency)
-            wallet.balance += amount
-            wallet.save()
+        with atomic_write():
+            balances = ledger.post('DEPOSIT', [(ledger.DEPOSITS, currency, -amount), (target_user, currency, amount)], memo=f'ADMIN_CREDIT_BY_{admin_phone}')
+            new_balance = balances[target_user]
 
             tx = Transaction.create(
                 user=target_user,
@@ -503,10 +512,10 @@ def credit_user(msg, admin_phone):
                 tx_hash=f'ADMIN_CREDIT_BY_{admin_phone}'
             )
 
-        log_admin_action(admin_phone, f"Credited {amount} {currency} to {target_phone}")
-        notifications.send_deposit_confirmation(target_user, amount, currency)
+        log_admin_action(admin_phone, f"Credited {money.fmt(amount, currency)} {currency} to {target_phone}")
+        notifications.send_deposit_confirmation(target_user, money.from_minor(amount, currency), currency)
 
-        return f"✅ SUCCESS: {target_user.name} credited. New Balance: {wallet.balance:,.2f} {currency}."
+        return f"✅ SUCCESS: {target_user.name} credited. New Balance: {money.fmt(new_balance, currency, 2)} {currency}."
 
     except ValueError:
         return "❌ Error: Amount must be a valid number."
@@ -544,7 +553,7 @@ def get_pending_withdrawals():
         msg += f"📦 *TICKET #{tx.id}* — ⏳ {time_display}\n"
         msg += f"━━━━━━━━━━━━━━━━\n"
         msg += f"👤 *USER:* {tx.user.phone}\n"
-        msg += f"💰 *AMT:* {c_emoji} {tx.amount:,.2f} {tx.currency}\n"
+        msg += f"💰 *AMT:* {c_emoji} {tx.amount_major:,.2f} {tx.currency}\n"
         msg += f"📍 *DEST:* {tx.tx_hash}\n"
         msg += f"────────────────\n\n" 
         
@@ -571,13 +580,13 @@ def approve_withdrawal(msg, admin_phone):
         if tx.status == 'completed':
             return "⚠️ Notice: This withdrawal was already processed."
 
-        with db.atomic():
+        with atomic_write():
             tx.status = 'completed'
             tx.tx_hash = ref
             tx.save()
 
         log_admin_action(admin_phone, f"Approved withdrawal ID {tx_id} with Ref {ref}")
-        notifications.send_withdrawal_processed(tx.user, tx.amount, tx.currency, ref)
+        notifications.send_withdrawal_processed(tx.user, tx.amount_major, tx.currency, ref)
         
         return f"✅ Withdrawal {tx_id} successfully approved."
     except Exception as e:
@@ -711,4 +720,32 @@ def handle_admin_commands(msg, user=None, session=None):
             session = {}
         return handle_unfreeze_flow(user, msg, session)
     else:
-        return "❓ Unknown admin command. Type 'menu' or 'help' to see all commands."
\ No newline at end of file
+        return "❓ Unknown admin command. Type 'menu' or 'help' to see all commands."
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('admin_credit', handle_credit_flow, triggers=['credit'], admin=True)
+router.register_flow('admin_approve', handle_approve_flow, triggers=['approve'], admin=True)
+router.register_flow('admin_reply', handle_reply_flow, triggers=['reply'], admin=True)
+router.register_flow('admin_broadcast', handle_broadcast_flow, triggers=['broadcast'], admin=True)
+router.register_flow('approve giftcard', handle_approve_giftcard_flow, triggers=['approve giftcard'], admin=True)
+router.register_flow('unfreeze', handle_unfreeze_flow, admin=True)
+
+def _admin_command(user, msg):
+    response = handle_admin_commands(msg, user=user)
+    return response[0] if isinstance(response, tuple) else response
+
+router.register_command(['admin', 'help', 'users', 'withdrawals', 'tickets', 'deposits', 'gift'], _admin_command, admin=True)
+
+def _outbox_command(user, msg):
+    from services import outbox
+    parts = msg.lower().split()
+    if len(parts) == 1:
+        return outbox.format_status()
+    if parts[1] != 'retry' or len(parts) != 3 or not (parts[2] == 'all' or parts[2].isdigit()):
+        return "⚠️ Usage: outbox | outbox retry [ID|all]"
+    count = outbox.retry(None if parts[2] == 'all' else int(parts[2]))
+    log_admin_action(config.OWNER_PHONE.split(',')[0], f"Requeued {count} outbox dead letter(s) ({parts[2]})")
+    return f"🔁 {count} dead letter(s) queued again."
+
+router.register_command(['outbox'], _outbox_command, admin=True)
+router.register_command(['outbox'], _outbox_command, admin=True, prefix=True)
@@ -1,26 +1,56 @@
 from modules import market
 import state_manager
+import router
 from database import Alert
 from modules import market
 
+# `repeat` alerts re-arm once price pulls back this far past the trigger
+DEFAULT_BAND = 0.01
+
+def parse_band(words):
+    """Band (fraction) from a trailing `repeat` / `repeat 2%`, or None for a one-shot alert."""
+    if not words or words[0].lower() != 'repeat':
+        return None
+    band = float(words[1].replace('%', '')) / 100 if len(words) > 1 else DEFAULT_BAND
+    if not 0 < band < 1:
+        raise ValueError("band out of range")
+    return band
+
+def parse_move(text):
+    """'+5%' / '-5%' / '5%' -> signed percent, or None if text is not a percentage."""
+    if not text.endswith('%'):
+        return None
+    move = float(text[:-1])
+    if move == 0 or move <= -100:
+        raise ValueError("invalid percentage")
+    return move
+
+def repeat_note(band):
+    return f"\n🔁 Repeats: re-arms after a {band * 100:g}% pullback." if band else ""
+
 def create_alert(user, msg):
     """
     Saves a strategic price alert.
     Auto-corrects 'SOL' to 'SOLUSDT'.
+
+    alert SOL 150          -> price crosses 150
+    alert SOL +5% / -5%    -> price moves 5% from now
+    alert SOL breakout     -> new 24h high (breakdown: new 24h low)
+    ... repeat [2%]        -> stays armed, re-arming after a pullback
     """
     try:
         # 1. Parse Input: "alert SOL 150"
         parts = msg.split()
         if len(parts) < 3:
-            return "⚠️ Usage: alert [Coin] [Price]\nEx: alert SOL 25.5"
+            return "⚠️ Usage: alert [Coin] [Price | +5% | breakout] [repeat]\nEx: alert SOL 25.5"
 
         # 2. Format Symbol (Auto-add USDT if missing)
         raw_symbol = parts[1].upper()
         symbol = raw_symbol if "USDT" in raw_symbol else f"{raw_symbol}USDT"
         
-        # 3. Clean Price
-        target_str = parts[2].replace('$', '').replace(',', '')
-        target_price = float(target_str)
+        # 3. Clean Target (price, % move or breakout) and repeat band
+        spec = parts[2].lower().replace('$', '').replace(',', '')
+        band = parse_band(parts[3:])
 
         # 4. Get Current Price (to decide if we are waiting for a PUMP or DUMP)
         current_price = market.fetch_raw_price(symbol)
@@ -28,34 +58,75 @@ def create_alert(user, msg):
         if not current_price:
              return f"⚠️ I can't find *{symbol}* on Bybit. Check the name."
 
-        # 5. Determine Strategic Direction
-        # If Target > Current, we are waiting for a CROSS UP (Bullish)
-        # If Target < Current, we are waiting for a CROSS DOWN (Bearish)
-        condition = 'above' if target_price > current_price else 'below'
-
-        # 6. Save to Database
-        Alert.create(
-            user=user,
-            symbol=symbol,
-            target_price=target_price,
-            condition=condition
-        )
+        if spec in ('breakout', 'breakdown'):
+            # Fires on a new 24h high (breakout) or low (breakdown)
+            condition = 'above' if spec == 'breakout' else 'below'
+            Alert.create(user=user, symbol=symbol, target_price=0, condition=condition, kind='breakout', band=band)
+            edge = "high" if condition == 'above' else "low"
+            return (
+                f"🔔 *Breakout Alert Set*\n"
+                "━━━━━━━━━━━━━━━━\n"
+                f"💎 *{symbol}*\n"
+                f"⚡ Current: {current_price}\n\n"
+                f"🚀 I will notify you when price sets a *new 24h {edge}*."
+                f"{repeat_note(band)}"
+            )
+
+        move = parse_move(spec)
+        if move is not None:
+            # Percent move from today's price: the target is fixed now
+            condition = 'above' if move > 0 else 'below'
+            target_price = current_price * (1 + move / 100)
+            Alert.create(user=user, symbol=symbol, target_price=target_price, condition=condition,
+                         kind='pct', reference_price=current_price, band=band)
+        else:
+            target_price = float(spec)
+
+            # 5. Determine Strategic Direction
+            # If Target > Current, we are waiting for a CROSS UP (Bullish)
+            # If Target < Current, we are waiting for a CROSS DOWN (Bearish)
+            condition = 'above' if target_price > current_price else 'below'
+
+            # 6. Save to Database
+            Alert.create(
+                user=user,
+                symbol=symbol,
+                target_price=target_price,
+                condition=condition,
+                band=band
+            )
 
         emoji = "📈" if condition == 'above' else "📉"
+        move_line = f"📊 Move: {move:+g}%\n" if move is not None else ""
         return (
             f"🔔 *Strategic Alert Set*\n"
             "━━━━━━━━━━━━━━━━\n"
             f"💎 *{symbol}*\n"
-            f"🎯 Target: {target_price}\n"
+            f"{move_line}"
+            f"🎯 Target: {target_price:,.6g}\n"
             f"⚡ Current: {current_price}\n\n"
             f"{emoji} I will notify you when price *crosses {condition}* this level."
+            f"{repeat_note(band)}"
         )
 
     except ValueError:
-        return "⚠️ Invalid price. Usage: alert SOL 20.5"
+        return "⚠️ Invalid price. Usage: alert SOL 20.5 | alert SOL +5% | alert SOL breakout [repeat 2%]"
     except Exception as e:
         return f"⚠️ System Error: {str(e)}"
 
+def describe_alert(a):
+    """One-line description of an alert for the listing."""
+    if a.kind == 'breakout':
+        text = "New 24h High" if a.condition == 'above' else "New 24h Low"
+    elif a.kind == 'pct' and a.reference_price:
+        text = f"{(a.target_price / a.reference_price - 1) * 100:+.1f}% move (${a.target_price:,.2f})"
+    else:
+        direction = "Upper Limit" if a.condition == 'above' else "Lower Limit"
+        text = f"{direction} ${a.target_price:,.2f}"
+    if a.band:
+        text += " 🔁" if a.armed else " 🔁 (waiting for pullback)"
+    return text
+
 def get_my_alerts(user):
     """List active alerts"""
     alerts = Alert.select().where(Alert.user == user, Alert.is_active == True)
@@ -65,8 +136,7 @@ def get_my_alerts(user):
     
     msg = "🔔 *Active Strategy Alerts*\n━━━━━━━━━━━━━━━━\n"
     for a in alerts:
-        direction = "Upper Limit" if a.condition == 'above' else "Lower Limit"
-        msg += f"• *{a.symbol}*: {direction} ${a.target_price:,.2f}\n"
+        msg += f"• *{a.symbol}*: {describe_alert(a)}\n"
     
     return msg
 
@@ -96,17 +166,24 @@ def handle_alert_flow(user, msg, session):
         session['step'] = 3
         return (
             f"📈 *Current {coin}:* ${current_price:,.2f}\n\n"
-            "At what price should I notify you? (Enter the numeric value):"
+            "At what price should I notify you? (Enter the numeric value, or a move like +5% / -5%):"
         ), session, False
 
     # STEP 3: Confirm Logic
     elif step == 3:
         try:
-            target = float(msg.strip().replace(",", ""))
+            entry = msg.strip().replace(",", "").replace("$", "")
+            move = parse_move(entry)
+            if move is not None:
+                # Percent move from the price shown in step 2
+                target = session['current'] * (1 + move / 100)
+                direction = "above" if move > 0 else "below"
+            else:
+                target = float(entry)
+                # Auto-detect direction
+                direction = "above" if target > session['current'] else "below"
             session['target'] = target
-            
-            # Auto-detect direction
-            direction = "above" if target > session['current'] else "below"
+            session['move'] = move
             session['direction'] = direction
             session['step'] = 4
             
@@ -115,7 +192,7 @@ def handle_alert_flow(user, msg, session):
                 f"━━━━━━━━━━━━━━━━\n"
                 f"Coin: {session['coin']}\n"
                 f"Notify when: *{direction}* ${target:,.2f}\n\n"
-                "Type *YES* to activate."
+                "Type *YES* to activate once, or *REPEAT* to keep it armed."
             )
             return summary, session, False
         except ValueError:
@@ -123,8 +200,17 @@ def handle_alert_flow(user, msg, session):
 
     # STEP 4: Save and Close
     elif step == 4:
-        if 'yes' in msg.lower():
-            # DB Logic: Alert.create(user=user, symbol=session['coin'], target_price=session['target'], condition=session['direction'])
-            Alert.create(user=user, symbol=session['coin'], target_price=session['target'], condition=session['direction'], is_active=True)
-            return f"✅ Alert activated! I'll ping you when {session['coin']} hits ${session['target']:,.2f}.", session, True
-        return "❌ Alert cancelled.", session, True
\ No newline at end of file
+        answer = msg.lower()
+        if 'yes' in answer or 'repeat' in answer:
+            band = DEFAULT_BAND if 'repeat' in answer else None
+            kind = 'pct' if session.get('move') is not None else 'cross'
+            reference = session['current'] if kind == 'pct' else None
+            Alert.create(user=user, symbol=session['coin'], target_price=session['target'], condition=session['direction'],
+                         kind=kind, reference_price=reference, band=band, is_active=True)
+            return f"✅ Alert activated! I'll ping you when {session['coin']} hits ${session['target']:,.2f}.{repeat_note(band)}", session, True
+        return "❌ Alert cancelled.", session, True
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('alert', handle_alert_flow)
+# One-line form: `alert SOL 150`, `alert SOL +5% repeat`, `alert SOL breakout`
+router.register_command(['alert'], create_alert, prefix=True)
@@ -1,6 +1,8 @@
 import config
+import money
+import router
 import uuid
-from database import Transaction, db
+from database import Transaction, db, atomic_write
 from modules import notifications
 from static_deposit_addresses import STATIC_DEPOSIT_ADDRESSES
 
@@ -130,12 +132,12 @@ def handle_flow(user, msg, session):
         val = session.get('input_val', '0')
 
         try:
-            with db.atomic():
+            with atomic_write():
                 Transaction.create(
                     user=user,
                     type='DEPOSIT',
                     currency='NGN' if mode == 'fiat_bank' else ('USD' if 'fiat' in mode else session.get('coin')),
-                    amount=float(val) if 'fiat' in mode else float(val),
+                    amount=money.to_minor(val, 'NGN' if mode == 'fiat_bank' else ('USD' if 'fiat' in mode else session.get('coin'))),
                     status='pending',
                     tx_hash=f"Mode: {mode} | Net: {session.get('network', 'N/A')} | Sender: {session['sender_info']}"
                 )
@@ -216,4 +218,7 @@ def show_fiat_details(session):
         f"{details}\n\n"
         "⚠️ *Action Required:*\n"
         "Make the transfer now, then reply *PAID* to provide your verification name."
-    ), session, False
\ No newline at end of file
+    ), session, False
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('deposit', handle_flow)
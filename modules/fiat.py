@@ -1,5 +1,6 @@
 import os
 import config
+import router
 from modules import market as market_service
 
 def get_fiat_dashboard(user):
@@ -46,4 +47,7 @@ def get_rates(from_asset, to_asset):
         sell_rate = float(os.getenv("OTC_SELL_RATE_USDT_NGN", 1600.00))
         return 1 / sell_rate if sell_rate > 0 else 0
         
-    return None
\ No newline at end of file
+    return None
+
+# --- ROUTER REGISTRATION ---
+router.register_command(['otc', 'p2p', 'fiat'], lambda user, msg: get_fiat_dashboard(user))
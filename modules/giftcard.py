@@ -2,6 +2,8 @@ import os
 import datetime
 import csv
 import config
+import money
+import router
 from modules import notifications
 
 def handle_flow(user, msg, session):
@@ -97,14 +99,14 @@ def handle_flow(user, msg, session):
                 ])
 
             # Create Transaction record for admin tracking
-            from database import Transaction, db
+            from database import Transaction, db, atomic_write
             try:
-                with db.atomic():
+                with atomic_write():
                     Transaction.create(
                         user=user,
                         type='GIFTCARD',
                         currency=session.get('country', 'N/A'),
-                        amount=float(session.get('amount', 0)),
+                        amount=money.to_minor(session.get('amount', 0), session.get('country')),
                         status='pending',
                         tx_hash=session.get('code', '')
                     )
@@ -146,4 +148,7 @@ def giftcard_review_summary(session):
         f"Image: {'Attached' if session.get('image') else 'None'}\n\n"
         "Is this correct? Type *YES* to submit or *CANCEL*."
     )
-    return summary
\ No newline at end of file
+    return summary
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('redeem', handle_flow, triggers=['redeem', 'giftcard'])
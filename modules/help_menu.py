@@ -1,3 +1,5 @@
+import router
+
 def get_main_menu(user_name=None):
     """
     Personalized entry point for the bot.
@@ -47,6 +49,9 @@ def get_help_text():
         "🔔 *MARKET DATA*\n"
         "• price [COIN]: Live market rates\n"
         "• alert [COIN] [PRICE]: Set price alarm\n"
+        "• alert [COIN] +5% / -5%: Alarm on a % move\n"
+        "• alert [COIN] breakout: Alarm on a new 24h high\n"
+        "• add *repeat* to any alert to keep it armed\n"
         "\n"
         "💡 *TIP:* Type cancel at any time to stop a process."
     )
@@ -65,4 +70,7 @@ def get_admin_help():
         "• approve [ID] [HASH]: Complete a withdrawal\n"
         "• credit [PHONE] [AMT] [COIN]: Manual credit\n"
         "• broadcast [MSG]: Message all users"
-    )
\ No newline at end of file
+    )
+
+# --- ROUTER REGISTRATION ---
+router.register_command(['hi', 'menu', 'start'], lambda user, msg: get_main_menu(user.name))
@@ -1,10 +1,10 @@
-import requests
 import os
-from services.coingecko_price import CoinGeckoPriceService
+import router
+from services import coingecko_price
+from services import price_engine
 
 # 1. Config & Initialization
-BASE_URL = "https://api.bybit.com/v5/market"
-cg_service = CoinGeckoPriceService()
+cg_service = coingecko_price.get_service()
 
 # Toggle this for high-level price lookups
 # Bybit is better for trading pairs; CoinGecko is better for global averages.
@@ -45,20 +45,11 @@ def get_price(symbol):
 def fetch_raw_price(symbol):
     """
     Internal Helper: Used for Swaps, Alerts, and Math.
-    Returns a clean float or None.
+    Returns a clean float or None. Served from the shared price engine's
+    in-memory snapshot (one bulk Bybit request per refresh, not per call).
     """
     try:
-        # Normalize for Bybit (e.g., BTC -> BTCUSDT)
-        clean = symbol.upper().replace("/", "")
-        if not clean.endswith("USDT") and clean not in ['USDT', 'USDC']:
-            clean += "USDT"
-            
-        url = f"{BASE_URL}/tickers?category=spot&symbol={clean}"
-        response = requests.get(url, timeout=5).json()
-        
-        if response.get('retCode') == 0 and response['result']['list']:
-            return float(response['result']['list'][0]['lastPrice'])
-        return None
+        return price_engine.get_price(symbol)
     except Exception as e:
         print(f"❌ Bybit Fetch Error: {e}")
         return None
@@ -68,27 +59,24 @@ def get_top_gainers():
     Market Insight: Returns top 5 movers in the last 24h.
     """
     try:
-        url = f"{BASE_URL}/tickers?category=spot"
-        response = requests.get(url, timeout=5).json()
-        
-        if response.get('retCode') != 0:
+        tickers = price_engine.get_engine().tickers()
+        if not tickers:
             return "⚠️ Market data temporarily unavailable."
 
-        tickers = response['result']['list']
         # Filter for USDT pairs to avoid confusing users with BTC/ETH pairs
-        usdt_pairs = [t for t in tickers if t['symbol'].endswith('USDT')]
+        usdt_pairs = [q for q in tickers.values() if q.symbol.endswith('USDT')]
         
         # Sort by 24h Percentage Change
-        usdt_pairs.sort(key=lambda x: float(x['price24hPcnt']), reverse=True)
+        usdt_pairs.sort(key=lambda q: q.change_24h, reverse=True)
         
         msg = "🚀 *PPAY Top Gainers (24h)*\n"
         msg += "━━━━━━━━━━━━━━━━\n"
         for i in range(min(5, len(usdt_pairs))):
-            t = usdt_pairs[i]
+            q = usdt_pairs[i]
             # Bybit pcnt is a decimal, e.g., 0.05 for 5%
-            change = float(t['price24hPcnt']) * 100
-            price = float(t['lastPrice'])
-            msg += f"{i+1}. *{t['symbol'].replace('USDT', '')}*: +{change:.1f}% (${price:,.2f})\n"
+            change = q.change_24h * 100
+            price = q.price
+            msg += f"{i+1}. *{q.symbol.replace('USDT', '')}*: +{change:.1f}% (${price:,.2f})\n"
             
         return msg
     except Exception as e:
@@ -99,4 +87,8 @@ def get_last_update_time():
     """Helper for UI timestamping"""
     import datetime
     now = datetime.datetime.now()
-    return now.strftime("%Y-%m-%d %H:%M:%S UTC")
\ No newline at end of file
+    return now.strftime("%Y-%m-%d %H:%M:%S UTC")
+
+# --- ROUTER REGISTRATION ---
+router.register_command(['price'], lambda user, msg: get_price(msg.split(' ', 1)[1].strip()), prefix=True)
+router.register_command(['top gainers', 'gainers'], lambda user, msg: get_top_gainers())
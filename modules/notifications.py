@@ -1,115 +1,56 @@
 def send_ticket_reply(user, reply_msg):
-    """Sends a support ticket reply to the user via WhatsApp."""
-    sender = get_sender()
-    if not sender:
-        print("❌ Twilio Phone not configured in .env")
-        return False
-    try:
-        client.messages.create(
-            from_=sender,
-            body=f"📝 *Support Reply*\n━━━━━━━━━━━━━━━━\n{reply_msg}",
-            to=f"whatsapp:{user.phone}"
-        )
-        return True
-    except Exception as e:
-        print(f"❌ Failed to send ticket reply to {user.phone}: {e}")
-        return False
-import os
-import time
-import threading
-import random
-from twilio.rest import Client
+    """Queues a support ticket reply to the user via WhatsApp."""
+    return send_push(user, f"📝 *Support Reply*\n━━━━━━━━━━━━━━━━\n{reply_msg}")
 from database import User
+from services import outbox
 
-# Load Config
-account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-twilio_phone = os.getenv("TWILIO_PHONE")
-client = Client(account_sid, auth_token)
+# Every message goes through the outbox (services/outbox.py): queued here in
+# one INSERT, delivered by outbox_worker.py at the rate Twilio allows.
 
 def get_sender():
     """Ensures the sender number has the 'whatsapp:' prefix"""
-    if not twilio_phone:
-        return None
-    if twilio_phone.startswith('whatsapp:'):
-        return twilio_phone
-    return f"whatsapp:{twilio_phone}"
+    return outbox.sender()
 
 def send_push(user, message_body, media_url=None):
     """
-    Sends a proactive message to a specific user. Supports optional media (image).
+    Queues a proactive message to a specific user. Supports optional media (image).
     """
-    sender = get_sender()
-    if not sender:
-        print("❌ Twilio Phone not configured in .env")
-        return False
     try:
-        msg_kwargs = {
-            'from_': sender,
-            'body': message_body,
-            'to': f"whatsapp:{user.phone}"
-        }
-        if media_url:
-            # Twilio expects a list of URLs
-            msg_kwargs['media_url'] = [media_url] if isinstance(media_url, str) else media_url
-        client.messages.create(**msg_kwargs)
+        outbox.enqueue(user.phone, message_body, media_url)
         return True
     except Exception as e:
-        print(f"❌ Failed to push to {user.phone}: {e}")
+        print(f"❌ Failed to queue message to {user.phone}: {e}")
         return False
 
-# --- ASYNC BROADCAST LOGIC ---
+# --- BROADCAST ---
 
-def broadcast_worker(message_body, admin_phone):
+def broadcast_all(message_body, admin_phone=None):
     """
-    Background worker that iterates through users and sends announcements.
+    Queues the announcement for every user at bulk priority: the outbox
+    sends it after any transactional messages, at the Twilio rate.
     """
-    users = User.select()
-    total = len(users)
-    count = 0
-    sender = get_sender()
-    
-    print(f"📢 Starting Broadcast to {total} users...")
-    
-    for user in users:
-        try:
-            client.messages.create(
-                from_=sender,
-                body="📢 *PPAY ANNOUNCEMENT*\n━━━━━━━━━━━━━━━━\n\n" + message_body,
-                to=f"whatsapp:{user.phone}"
-            )
-            count += 1
-            # Rate limit to 2 messages per second to keep Twilio happy
-            time.sleep(0.5) 
-        except Exception as e:
-            print(f"⚠️ Skip {user.phone}: {e}")
-            continue
-            
-    # Final report to Admin
-    report = f"✅ *Broadcast Complete*\nSent to {count}/{total} active users."
-    send_single_direct(admin_phone, report)
-
-def broadcast_all(message_body, admin_phone):
-    """
-    Triggers the background thread so the admin doesn't wait.
-    """
-    thread = threading.Thread(target=broadcast_worker, args=(message_body, admin_phone))
-    thread.daemon = True
-    thread.start()
-    return f"🚀 *Broadcast Started*\nSending to all users in the background. I will alert you when finished."
+    body = "📢 *PPAY ANNOUNCEMENT*\n━━━━━━━━━━━━━━━━\n\n" + message_body
+    phones = [phone for (phone,) in User.select(User.phone).tuples()]
+    count = outbox.enqueue_many([(phone, body) for phone in phones], priority=outbox.BULK)
+    print(f"📢 Broadcast queued for {count} users")
+    return (f"🚀 *Broadcast Queued*\nQueued for {count} users; they are sent in the background.\n"
+            "Type `outbox` to follow delivery.")
 
 def send_single_direct(phone, text):
     """Helper for sending messages to a raw phone number (like admin reports)"""
     try:
-        client.messages.create(from_=get_sender(), body=text, to=f"whatsapp:{phone}")
-    except: pass
+        outbox.enqueue(phone, text)
+    except Exception as e:
+        print(f"❌ Failed to queue message to {phone}: {e}")
 
 def notify_admins(message_body):
     """Sends a notification to ALL admin phones configured in OWNER_PHONE."""
     import config
     admin_phones = [p.strip() for p in config.OWNER_PHONE.split(',') if p.strip()]
-    for phone in admin_phones:
-        send_single_direct(phone, message_body)
+    try:
+        outbox.enqueue_many([(phone, message_body) for phone in admin_phones])
+    except Exception as e:
+        print(f"❌ Failed to queue admin notification: {e}")
 
 # --- TRANSACTIONAL NOTIFICATIONS ---
 
@@ -1,5 +1,5 @@
 import config
-from database import User, Wallet, db
+from database import User, Wallet, db, atomic_write
 
 def handle_flow(user, msg):
     """
@@ -87,11 +87,11 @@ def handle_flow(user, msg):
         user.onboarding_status = 'active'
         
         try:
-            with db.atomic():
+            with atomic_write():
                 user.save()
                 # Initialize Default Wallets (NGN and USDT)
-                Wallet.get_or_create(user=user, currency='NGN', defaults={'balance': 0.0})
-                Wallet.get_or_create(user=user, currency='USDT', defaults={'balance': 0.0})
+                Wallet.get_or_create(user=user, currency='NGN', defaults={'balance': 0})
+                Wallet.get_or_create(user=user, currency='USDT', defaults={'balance': 0})
             
             welcome_msg = (
                 f"✅ *Onboarding Complete, {user.name}!*\n"
@@ -1,9 +1,8 @@
 import logging
 import re
-import time
+import uuid
 from datetime import datetime
-import requests
-from services.vtu_service import VTUApiClient
+from services import http_client, vtu_executor
 
 # --- VTU.ng API Betting Account Funding Wrapper (Production Ready) ---
 def is_valid_betting_service_id(service_id):
@@ -19,7 +18,7 @@ def is_valid_betting_amount(amount):
     except Exception:
         return False
 
-def fund_betting_account(user_id, customer_id, service_id, amount, max_retries=3):
+def fund_betting_account(user_id, customer_id, service_id, amount, max_retries=3, request_id=None):
     """
     Fund a betting account for a user using VTU.ng API (production ready).
     Args:
@@ -27,7 +26,8 @@ def fund_betting_account(user_id, customer_id, service_id, amount, max_retries=3
         customer_id: Betting account ID
         service_id: Betting provider
         amount: Amount in NGN
-        max_retries: Number of retries for transient errors
+        max_retries: Attempts for transient errors (backoff, requery before re-sending)
+        request_id: Pass the one from an earlier network_error to retry without buying twice
     Returns:
         dict: API response (success or error)
     """
@@ -41,22 +41,9 @@ def fund_betting_account(user_id, customer_id, service_id, amount, max_retries=3
         logger.warning(f"Invalid amount: {amount} (user_id={user_id})")
         return {"code": "invalid_amount", "message": "Amount must be between 100 and 100000 NGN."}
 
-    vtu_client = VTUApiClient()
-    request_id = f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}"
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = vtu_client.fund_betting_account(request_id, str(customer_id), service_id, int(amount))
-            logger.info(f"Betting funding: user_id={user_id}, customer_id={customer_id}, service_id={service_id}, amount={amount}, response={response}")
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error (attempt {attempt+1}): {e}")
-            time.sleep(2 ** attempt)
-            attempt += 1
-        except Exception as e:
-            logger.error(f"Betting funding failed: user_id={user_id}, customer_id={customer_id}, service_id={service_id}, amount={amount}, error={e}")
-            return {"code": "error", "message": str(e)}
-    return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts."}
+    request_id = request_id or new_request_id(user_id)
+    return _execute('betting', user_id, request_id, lambda client: client.fund_betting_account(request_id, str(customer_id), service_id, int(amount)),
+                    max_retries, f"customer_id={customer_id}, service_id={service_id}, amount={amount}")
 # --- VTU.ng API ePINs Wrapper (Production Ready) ---
 def is_valid_epins_service_id(service_id):
     return service_id in {"mtn", "airtel", "glo", "9mobile"}
@@ -71,7 +58,7 @@ def is_valid_epins_quantity(quantity):
     except Exception:
         return False
 
-def buy_epins(user_id, service_id, value, quantity, max_retries=3):
+def buy_epins(user_id, service_id, value, quantity, max_retries=3, request_id=None):
     """
     Buy ePINs for a user using VTU.ng API (production ready).
     Args:
@@ -79,7 +66,8 @@ def buy_epins(user_id, service_id, value, quantity, max_retries=3):
         service_id: Network provider (mtn, airtel, glo, 9mobile)
         value: PIN denomination (100, 200, 500)
         quantity: Number of PINs (1-40)
-        max_retries: Number of retries for transient errors
+        max_retries: Attempts for transient errors (backoff, requery before re-sending)
+        request_id: Pass the one from an earlier network_error to retry without buying twice
     Returns:
         dict: API response (success or error)
     """
@@ -93,22 +81,9 @@ def buy_epins(user_id, service_id, value, quantity, max_retries=3):
         logger.warning(f"Invalid quantity: {quantity} (user_id={user_id})")
         return {"code": "invalid_quantity", "message": "Quantity must be between 1 and 40."}
 
-    vtu_client = VTUApiClient()
-    request_id = f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}"
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = vtu_client.purchase_epins(request_id, service_id, int(value), int(quantity))
-            logger.info(f"ePINs purchase: user_id={user_id}, service_id={service_id}, value={value}, quantity={quantity}, response={response}")
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error (attempt {attempt+1}): {e}")
-            time.sleep(2 ** attempt)
-            attempt += 1
-        except Exception as e:
-            logger.error(f"ePINs purchase failed: user_id={user_id}, service_id={service_id}, value={value}, quantity={quantity}, error={e}")
-            return {"code": "error", "message": str(e)}
-    return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts."}
+    request_id = request_id or new_request_id(user_id)
+    return _execute('epins', user_id, request_id, lambda client: client.purchase_epins(request_id, service_id, int(value), int(quantity)),
+                    max_retries, f"service_id={service_id}, value={value}, quantity={quantity}")
 # --- VTU.ng API TV Subscription Wrapper (Production Ready) ---
 def is_valid_tv_service_id(service_id):
     return service_id in {"dstv", "gotv", "startimes", "showmax"}
@@ -116,7 +91,7 @@ def is_valid_tv_service_id(service_id):
 def is_valid_tv_variation_id(variation_id):
     return str(variation_id).isdigit() and int(variation_id) > 0
 
-def buy_tv_subscription(user_id, customer_id, service_id, variation_id, subscription_type=None, amount=None, max_retries=3):
+def buy_tv_subscription(user_id, customer_id, service_id, variation_id, subscription_type=None, amount=None, max_retries=3, request_id=None):
     """
     Buy TV subscription for a user using VTU.ng API (production ready).
     Args:
@@ -126,7 +101,8 @@ def buy_tv_subscription(user_id, customer_id, service_id, variation_id, subscrip
         variation_id: Package/bouquet variation ID (from VTU API)
         subscription_type: 'change' or 'renew' (optional)
         amount: Amount in NGN (optional, for renewals)
-        max_retries: Number of retries for transient errors
+        max_retries: Attempts for transient errors (backoff, requery before re-sending)
+        request_id: Pass the one from an earlier network_error to retry without buying twice
     Returns:
         dict: API response (success or error)
     """
@@ -151,24 +127,10 @@ def buy_tv_subscription(user_id, customer_id, service_id, variation_id, subscrip
             logger.warning(f"Invalid amount: {amount} (user_id={user_id})")
             return {"code": "invalid_amount", "message": "Invalid amount for TV subscription."}
 
-    vtu_client = VTUApiClient()
-    request_id = f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}"
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = vtu_client.purchase_tv_subscription(
-                request_id, str(customer_id), service_id, str(variation_id), subscription_type, amount
-            )
-            logger.info(f"TV subscription: user_id={user_id}, customer_id={customer_id}, service_id={service_id}, variation_id={variation_id}, subscription_type={subscription_type}, amount={amount}, response={response}")
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error (attempt {attempt+1}): {e}")
-            time.sleep(2 ** attempt)
-            attempt += 1
-        except Exception as e:
-            logger.error(f"TV subscription failed: user_id={user_id}, customer_id={customer_id}, service_id={service_id}, variation_id={variation_id}, subscription_type={subscription_type}, amount={amount}, error={e}")
-            return {"code": "error", "message": str(e)}
-    return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts."}
+    request_id = request_id or new_request_id(user_id)
+    return _execute('tv', user_id, request_id, lambda client: client.purchase_tv_subscription(
+            request_id, str(customer_id), service_id, str(variation_id), subscription_type, amount),
+                    max_retries, f"customer_id={customer_id}, service_id={service_id}, variation_id={variation_id}, subscription_type={subscription_type}, amount={amount}")
 # --- VTU.ng API Electricity Wrapper (Production Ready) ---
 def is_valid_electricity_service_id(service_id):
     return service_id in {
@@ -187,7 +149,7 @@ def is_valid_electricity_amount(amount):
     except Exception:
         return False
 
-def buy_electricity(user_id, customer_id, service_id, variation_id, amount, max_retries=3):
+def buy_electricity(user_id, customer_id, service_id, variation_id, amount, max_retries=3, request_id=None):
     """
     Buy electricity for a user using VTU.ng API (production ready).
     Args:
@@ -196,7 +158,8 @@ def buy_electricity(user_id, customer_id, service_id, variation_id, amount, max_
         service_id: Electricity provider
         variation_id: Meter type ('prepaid' or 'postpaid')
         amount: Amount in NGN
-        max_retries: Number of retries for transient errors
+        max_retries: Attempts for transient errors (backoff, requery before re-sending)
+        request_id: Pass the one from an earlier network_error to retry without buying twice
     Returns:
         dict: API response (success or error)
     """
@@ -213,27 +176,14 @@ def buy_electricity(user_id, customer_id, service_id, variation_id, amount, max_
         logger.warning(f"Invalid amount: {amount} (user_id={user_id})")
         return {"code": "invalid_amount", "message": "Amount must be between 100 and 100000 NGN."}
 
-    vtu_client = VTUApiClient()
-    request_id = f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}"
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = vtu_client.purchase_electricity(request_id, str(customer_id), service_id, variation_id, int(amount))
-            logger.info(f"Electricity purchase: user_id={user_id}, customer_id={customer_id}, service_id={service_id}, variation_id={variation_id}, amount={amount}, response={response}")
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error (attempt {attempt+1}): {e}")
-            time.sleep(2 ** attempt)
-            attempt += 1
-        except Exception as e:
-            logger.error(f"Electricity purchase failed: user_id={user_id}, customer_id={customer_id}, service_id={service_id}, variation_id={variation_id}, amount={amount}, error={e}")
-            return {"code": "error", "message": str(e)}
-    return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts."}
+    request_id = request_id or new_request_id(user_id)
+    return _execute('electricity', user_id, request_id, lambda client: client.purchase_electricity(request_id, str(customer_id), service_id, variation_id, int(amount)),
+                    max_retries, f"customer_id={customer_id}, service_id={service_id}, variation_id={variation_id}, amount={amount}")
 # --- VTU.ng API Data Wrapper (Production Ready) ---
 def is_valid_variation_id(variation_id):
     return str(variation_id).isdigit() and int(variation_id) > 0
 
-def buy_data(user_id, phone, service_id, variation_id, max_retries=3):
+def buy_data(user_id, phone, service_id, variation_id, max_retries=3, request_id=None):
     """
     Buy data for a user using VTU.ng API (production ready).
     Args:
@@ -241,7 +191,8 @@ def buy_data(user_id, phone, service_id, variation_id, max_retries=3):
         phone: Phone number to recharge
         service_id: Network provider (e.g., 'mtn', 'airtel', 'glo', '9mobile', 'smile')
         variation_id: Data plan variation ID (from VTU API)
-        max_retries: Number of retries for transient errors
+        max_retries: Attempts for transient errors (backoff, requery before re-sending)
+        request_id: Pass the one from an earlier network_error to retry without buying twice
     Returns:
         dict: API response (success or error)
     """
@@ -255,22 +206,9 @@ def buy_data(user_id, phone, service_id, variation_id, max_retries=3):
         logger.warning(f"Invalid variation_id: {variation_id} (user_id={user_id})")
         return {"code": "invalid_variation_id", "message": "Invalid data plan variation ID."}
 
-    vtu_client = VTUApiClient()
-    request_id = f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}"
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = vtu_client.purchase_data(request_id, phone, service_id, str(variation_id))
-            logger.info(f"Data purchase: user_id={user_id}, phone={phone}, service_id={service_id}, variation_id={variation_id}, response={response}")
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error (attempt {attempt+1}): {e}")
-            time.sleep(2 ** attempt)
-            attempt += 1
-        except Exception as e:
-            logger.error(f"Data purchase failed: user_id={user_id}, phone={phone}, service_id={service_id}, variation_id={variation_id}, error={e}")
-            return {"code": "error", "message": str(e)}
-    return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts."}
+    request_id = request_id or new_request_id(user_id)
+    return _execute('data', user_id, request_id, lambda client: client.purchase_data(request_id, phone, service_id, str(variation_id)),
+                    max_retries, f"phone={phone}, service_id={service_id}, variation_id={variation_id}")
 # payment_methods.py
 # Store all off-chain payment method details here for easy management.
 
@@ -315,6 +253,33 @@ handler.setFormatter(formatter)
 if not logger.hasHandlers():
     logger.addHandler(handler)
 
+PRODUCT_LABELS = {
+    'airtime': "Airtime purchase", 'data': "Data purchase", 'tv': "TV subscription",
+    'electricity': "Electricity purchase", 'epins': "ePINs purchase", 'betting': "Betting funding",
+}
+
+def new_request_id(user_id):
+    # The random suffix keeps two purchases by one user in the same second apart
+    return f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}_{uuid.uuid4().hex[:6]}"
+
+def _execute(product, user_id, request_id, send, max_retries, details):
+    """Runs one purchase through the shared VTU executor (services/vtu_executor.py) and logs it."""
+    label = PRODUCT_LABELS[product]
+    try:
+        response = vtu_executor.execute(product, request_id, send, attempts=max_retries)
+        logger.info(f"{label}: user_id={user_id}, {details}, request_id={request_id}, response={response}")
+        return response
+    except vtu_executor.CircuitOpen as e:
+        logger.warning(f"{label} rejected, circuit open: user_id={user_id}, {details}, error={e}")
+        return {"code": "service_unavailable", "message": "VTU service is temporarily unavailable. Please try again shortly."}
+    except http_client.RequestException as e:
+        logger.error(f"{label} network error: user_id={user_id}, {details}, request_id={request_id}, error={e}")
+        return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts.",
+                "request_id": request_id}
+    except Exception as e:
+        logger.error(f"{label} failed: user_id={user_id}, {details}, error={e}")
+        return {"code": "error", "message": str(e)}
+
 def is_valid_phone(phone):
     # Accepts 11-16 digits, with or without +234
     return bool(re.match(r"^(\+234|0)?[789][01]\d{8,13}$", phone))
@@ -329,7 +294,7 @@ def is_valid_amount(amount):
     except Exception:
         return False
 
-def buy_airtime(user_id, phone, service_id, amount, max_retries=3):
+def buy_airtime(user_id, phone, service_id, amount, max_retries=3, request_id=None):
     """
     Buy airtime for a user using VTU.ng API (production ready).
     Args:
@@ -337,7 +302,8 @@ def buy_airtime(user_id, phone, service_id, amount, max_retries=3):
         phone: Phone number to recharge
         service_id: Network provider (e.g., 'mtn', 'airtel', 'glo', '9mobile')
         amount: Amount in NGN
-        max_retries: Number of retries for transient errors
+        max_retries: Attempts for transient errors (backoff, requery before re-sending)
+        request_id: Pass the one from an earlier network_error to retry without buying twice
     Returns:
         dict: API response (success or error)
     """
@@ -352,20 +318,6 @@ def buy_airtime(user_id, phone, service_id, amount, max_retries=3):
         logger.warning(f"Invalid amount: {amount} (user_id={user_id})")
         return {"code": "invalid_amount", "message": "Amount must be between 10 and 50000 NGN."}
 
-    vtu_client = VTUApiClient()
-    request_id = f"req_{datetime.now().strftime('%Y%m%d%H%M%S')}_{user_id}"
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            response = vtu_client.purchase_airtime(request_id, phone, service_id, int(amount))
-            logger.info(f"Airtime purchase: user_id={user_id}, phone={phone}, service_id={service_id}, amount={amount}, response={response}")
-            # TODO: Save transaction to DB here if needed
-            return response
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Network error (attempt {attempt+1}): {e}")
-            time.sleep(2 ** attempt)  # Exponential backoff
-            attempt += 1
-        except Exception as e:
-            logger.error(f"Airtime purchase failed: user_id={user_id}, phone={phone}, service_id={service_id}, amount={amount}, error={e}")
-            return {"code": "error", "message": str(e)}
-    return {"code": "network_error", "message": "Failed to connect to VTU service after multiple attempts."}
+    request_id = request_id or new_request_id(user_id)
+    return _execute('airtime', user_id, request_id, lambda client: client.purchase_airtime(request_id, phone, service_id, int(amount)),
+                    max_retries, f"phone={phone}, service_id={service_id}, amount={amount}")
@@ -1,5 +1,7 @@
 from database import User, Transaction, Wallet
 import os
+import money
+import router
 
 def get_referral_dashboard(user):
     """
@@ -27,7 +29,8 @@ def get_referral_dashboard(user):
                    .select(fn.SUM(Transaction.amount))
                    .where(Transaction.user == user, 
                           Transaction.type == 'REFERRAL_BONUS')
-                   .scalar() or 0.0)
+                   .scalar() or 0)
+    total_bonus = money.from_minor(total_bonus, 'NGN')
 
     # 4. Fetch the current Reward Amount from config/env
     reward_amt = float(os.getenv("REFERRAL_REWARD_NGN", 500.00))
@@ -43,4 +46,7 @@ def get_referral_dashboard(user):
         f"Earn *₦{reward_amt:,.0f}* for every active user you bring to the platform.\n\n"
         "💡 *Tip:* Copy and paste your code to your WhatsApp Status to start earning!"
     )
-    return msg
\ No newline at end of file
+    return msg
+
+# --- ROUTER REGISTRATION ---
+router.register_command(['referral', 'myreferral'], lambda user, msg: get_referral_dashboard(user))
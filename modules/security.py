@@ -1,5 +1,6 @@
 import datetime
 from database import db
+import router
 
 def handle_flow(user, msg, session):
     step = session.get('step', 1)
@@ -120,4 +121,7 @@ def handle_flow(user, msg, session):
             print(f"[SECURITY] Failed to notify admin: {e}")
         return "✅ Report submitted. Our security team will investigate and contact you shortly.", session, True
 
-    return "❓ Unknown step. Type `security` to restart.", session, True
\ No newline at end of file
+    return "❓ Unknown step. Type `security` to restart.", session, True
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('security', handle_flow, triggers=['security', 'freeze', '2fa', 'report'])
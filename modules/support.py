@@ -2,6 +2,7 @@ import datetime
 import random
 import string
 import config
+import router
 from database import db, Transaction # Assuming you store tickets in a similar table or a dedicated Ticket table
 from modules import notifications
 
@@ -116,4 +117,7 @@ def handle_flow(user, msg, session):
         else:
             return "❌ Submission aborted.", session, True
 
-    return "❓ Unknown step. Type `menu`.", session, True
\ No newline at end of file
+    return "❓ Unknown step. Type `menu`.", session, True
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('support', handle_flow)
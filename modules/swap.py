@@ -1,5 +1,9 @@
-from services.exchange import get_price
-from database import Wallet, Transaction, db
+from decimal import Decimal
+from services import price_engine
+import money
+import ledger
+from database import Wallet
+import router
 
 # modules/swap.py
 def handle_flow(user, msg, session):
@@ -34,7 +38,7 @@ def handle_flow(user, msg, session):
 
     if step == 4:
         try:
-            amt = float(msg)
+            amt = money.to_minor(msg, session['from'])
             if amt <= 0:
                 return ("❌ Amount must be positive.", session, False)
         except ValueError:
@@ -43,16 +47,19 @@ def handle_flow(user, msg, session):
         to_asset = session['to']
         # Use admin-set rates for NGN swaps, hybrid for other assets
         from config import ADMIN_SWAP_RATE_BUY, ADMIN_SWAP_RATE_SELL
-        # CoinGecko fallback
-        from services.coingecko_price import CoinGeckoPriceService
-        cg = CoinGeckoPriceService()
+        # CoinGecko fallback (shared TTL cache; the usd quote comes with the usdt one)
+        from services import coingecko_price
+        cg = coingecko_price.get_service()
         import time
         def get_price_with_fallback(from_asset, to_asset, timeout=60):
             import time
             start = time.time()
             pair = f"{to_asset}/USDT" if from_asset == 'USDT' else f"{from_asset}/USDT"
             try:
-                return get_price(pair)
+                price = price_engine.get_price(pair)
+                if price is None:
+                    raise LookupError(f"{pair} not in price snapshot")
+                return price
             except Exception:
                 # Try CoinGecko
                 base = to_asset if from_asset == 'USDT' else from_asset
@@ -74,46 +81,48 @@ def handle_flow(user, msg, session):
                     raise Exception('No price found for this pair')
                 return price
 
+        D = lambda x: Decimal(str(x))
         try:
+            # per_unit: how much to_asset one from_asset buys
             if from_asset == 'NGN' and to_asset == 'USDT':
-                rate = 1 / ADMIN_SWAP_RATE_BUY
-                estimate = amt * rate
+                per_unit = 1 / D(ADMIN_SWAP_RATE_BUY)
+                rate = per_unit
             elif from_asset == 'USDT' and to_asset == 'NGN':
-                rate = ADMIN_SWAP_RATE_SELL
-                estimate = amt * rate
+                per_unit = D(ADMIN_SWAP_RATE_SELL)
+                rate = per_unit
             elif from_asset == 'NGN' and to_asset in SUPPORTED_ASSETS and to_asset != 'USDT':
                 # NGN to other asset: NGN->USDT (admin rate), then USDT->asset (live rate)
-                rate_ngn_usdt = 1 / ADMIN_SWAP_RATE_BUY
-                amt_usdt = amt * rate_ngn_usdt
+                rate_ngn_usdt = 1 / D(ADMIN_SWAP_RATE_BUY)
                 rate_usdt_asset = get_price_with_fallback('USDT', to_asset)
                 if rate_usdt_asset is None or rate_usdt_asset == 0:
                     return (f"❌ Unable to fetch rate for USDT to {to_asset}.", session, True)
-                estimate = amt_usdt / rate_usdt_asset
-                rate = rate_ngn_usdt / rate_usdt_asset
+                per_unit = rate_ngn_usdt / D(rate_usdt_asset)
+                rate = per_unit
             elif to_asset == 'NGN' and from_asset in SUPPORTED_ASSETS and from_asset != 'USDT':
                 asset_to_usdt = get_price_with_fallback(from_asset, 'USDT')
-                rate = ADMIN_SWAP_RATE_SELL * asset_to_usdt
-                estimate = amt * rate
+                per_unit = D(ADMIN_SWAP_RATE_SELL) * D(asset_to_usdt)
+                rate = per_unit
             elif from_asset == 'USDT':
-                rate = get_price_with_fallback('USDT', to_asset)
-                estimate = amt / rate
+                rate = D(get_price_with_fallback('USDT', to_asset))
+                per_unit = 1 / rate
             elif to_asset == 'USDT':
-                rate = get_price_with_fallback(from_asset, 'USDT')
-                estimate = amt * rate
+                per_unit = D(get_price_with_fallback(from_asset, 'USDT'))
+                rate = per_unit
             else:
                 # For asset-to-asset swaps (e.g., BTC to ETH):
                 rate_from = get_price_with_fallback(from_asset, 'USDT')
                 rate_to = get_price_with_fallback(to_asset, 'USDT')
-                usdt_amt = amt * rate_from
-                estimate = usdt_amt / rate_to
-                rate = rate_from / rate_to
+                per_unit = D(rate_from) / D(rate_to)
+                rate = per_unit
+            estimate = money.convert(amt, from_asset, to_asset, per_unit)
         except Exception:
             return ("❌ Live rate unavailable for this pair.", session, True)
+        # Integer minor units in the session; the rate only for display
         session['est'] = estimate
         session['amt'] = amt
-        session['rate'] = rate
+        session['rate'] = float(rate)
         session['step'] = 5
-        return f"📊 *Estimate*\n{amt} {from_asset} ≈ {estimate:.8f} {to_asset}\nRate: {rate:.4f}\n\nConfirm? (Yes/No)", session, False
+        return f"📊 *Estimate*\n{money.fmt(amt, from_asset)} {from_asset} ≈ {money.fmt(estimate, to_asset)} {to_asset}\nRate: {rate:.4f}\n\nConfirm? (Yes/No)", session, False
 
     if step == 5:
         if msg.strip().lower() == 'yes':
@@ -123,23 +132,15 @@ def handle_flow(user, msg, session):
             estimate = session['est']
             rate = session['rate']
             try:
-                with db.atomic():
-                    from_wallet = Wallet.get(Wallet.user == user, Wallet.currency == from_asset)
-                    to_wallet, _ = Wallet.get_or_create(user=user, currency=to_asset, defaults={'balance': 0.0})
-                    if from_wallet.balance < amt:
-                        return (f"❌ Insufficient {from_asset} balance.", session, True)
-                    from_wallet.balance -= amt
-                    to_wallet.balance += estimate
-                    from_wallet.save()
-                    to_wallet.save()
-                    Transaction.create(user=user, type='SWAP', currency=from_asset, amount=-amt, status='completed', tx_hash=f"SWAP->{to_asset}")
-                    Transaction.create(user=user, type='SWAP', currency=to_asset, amount=estimate, status='completed', tx_hash=f"SWAP<-{from_asset}")
+                ledger.swap(user, from_asset, amt, to_asset, estimate)
                 # Notify Admin
                 from modules import notifications
                 import config
-                admin_msg = f"🔄 *Swap Completed*\nUser: {user.phone}\n{amt} {from_asset} → {estimate:.2f} {to_asset}\nRate: {rate:.4f}"
+                admin_msg = f"🔄 *Swap Completed*\nUser: {user.phone}\n{money.fmt(amt, from_asset)} {from_asset} → {money.fmt(estimate, to_asset)} {to_asset}\nRate: {rate:.4f}"
                 notifications.notify_admins(admin_msg)
-                return (f"✅ Swap Complete!\n{amt} {from_asset} → {estimate:.2f} {to_asset}\nRate: {rate:.4f}", session, True)
+                return (f"✅ Swap Complete!\n{money.fmt(amt, from_asset)} {from_asset} → {money.fmt(estimate, to_asset)} {to_asset}\nRate: {rate:.4f}", session, True)
+            except ledger.InsufficientFunds:
+                return (f"❌ Insufficient {from_asset} balance.", session, True)
             except Wallet.DoesNotExist:
                 return (f"❌ You do not have a {from_asset} wallet.", session, True)
             except Exception as e:
@@ -147,4 +148,7 @@ def handle_flow(user, msg, session):
         elif msg.strip().lower() == 'no':
             return ("❌ Swap cancelled.", session, True)
         else:
-            return ("❓ Please reply with 'Yes' to confirm or 'No' to cancel.", session, False)
\ No newline at end of file
+            return ("❓ Please reply with 'Yes' to confirm or 'No' to cancel.", session, False)
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('swap', handle_flow)
@@ -1,42 +1,40 @@
 import database
-from database import db, User, Wallet, Transaction
-import services.exchange as cex # Your wrapper for price checking
+from decimal import Decimal
+import money
+import ledger
+from database import db, User, Wallet, Transaction, atomic_write
+import services.exchange as cex # Your wrapper for hedging on the exchange
+from services import price_engine
 
 def execute_buy(user, symbol, amount_usdt):
+    amount_units = money.to_minor(amount_usdt, 'USDT')
+
     # 1. Get Price
     # symbol = "BTC/USDT"
-    current_price = cex.get_price(symbol)
-    
-    # 2. Check Balance (Internal DB)
-    usdt_wallet = Wallet.get_or_create(user=user, currency='USDT')[0]
+    current_price = price_engine.get_price(symbol)
+    if current_price is None:
+        return f"❌ No live price for {symbol}."
     
-    if usdt_wallet.balance < amount_usdt:
-        return "❌ Insufficient USDT Balance."
-
-    # 3. Calculate Asset Amount
+    # 2. Calculate Asset Amount
     # We can add a "Spread" fee here (Your profit!)
     # Real price: 90000. User price: 90500 (You make the difference)
-    spread = 1.01 # 1% fee
-    execution_price = current_price * spread
-    asset_amount = amount_usdt / execution_price
+    spread = Decimal('1.01') # 1% fee
+    execution_price = Decimal(str(current_price)) * spread
     asset_coin = symbol.split('/')[0] # BTC
+    asset_amount = money.convert(amount_units, 'USDT', asset_coin, 1 / execution_price)
 
-    # 4. EXECUTE (Update DB Ledger)
-    with db.atomic(): # Transaction safety
-        # Deduct USDT
-        usdt_wallet.balance -= amount_usdt
-        usdt_wallet.save()
-        
-        # Add BTC
-        btc_wallet = Wallet.get_or_create(user=user, currency=asset_coin)[0]
-        btc_wallet.balance += asset_amount
-        btc_wallet.save()
-        
-        # Record Transaction
-        Transaction.create(user=user, type='BUY', currency=asset_coin, amount=asset_amount, status='completed')
+    # 3. EXECUTE (Update DB Ledger)
+    try:
+        with atomic_write(): # Transaction safety
+            # Deduct USDT (only if the balance covers it) and add BTC via the FX desk
+            ledger.exchange(user, 'USDT', amount_units, asset_coin, asset_amount, kind='BUY')
+            # Record Transaction
+            Transaction.create(user=user, type='BUY', currency=asset_coin, amount=asset_amount, status='completed')
+    except (ledger.InsufficientFunds, Wallet.DoesNotExist):
+        return "❌ Insufficient USDT Balance."
 
-    # 5. (Optional) HEDGE
+    # 4. (Optional) HEDGE
     # Automatically buy on real Bybit so you are not "short" on Bitcoin
     # cex.execute_market_buy(symbol, amount_usdt)
 
-    return f"✅ SUCCESS!\nBought {asset_amount:.6f} {asset_coin}\nPrice: ${execution_price:.2f}"
\ No newline at end of file
+    return f"✅ SUCCESS!\nBought {money.fmt(asset_amount, asset_coin, 6)} {asset_coin}\nPrice: ${execution_price:.2f}"
\ No newline at end of file
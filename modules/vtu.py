@@ -1,8 +1,12 @@
 import uuid
 import threading
 import config
-from database import Wallet, db, Transaction
+import money
+import ledger
+import router
+from database import Wallet, db, Transaction, atomic_write
 from modules import notifications
+from services import vtu_bulk, vtu_jobs
 
 def handle_flow(user, msg, session):
     # Block if account is frozen
@@ -64,7 +68,7 @@ def handle_flow(user, msg, session):
             return "❓ Invalid provider. Select MTN, Airtel, Glo, or 9mobile.", session, False
         session['provider'] = provider
         session['step'] = 23
-        return f"Select Data Plan for {provider}:\n1. 500MB\n2. 1GB\n3. 2GB\n4. 5GB", session, False
+        return _data_plan_menu(provider), session, False
 
     # Step 23: Data Plan Price Lookup
     if step == 23:
@@ -117,60 +121,149 @@ def handle_flow(user, msg, session):
 
         service = session.get('service')
         amount = int(session.get('amount') if service == 'Airtime' else session.get('plan_price', 0))
+        amount_kobo = money.to_minor(amount, 'NGN')
+        request_id = f"req_{uuid.uuid4().hex[:12]}"
 
-        # Send processing message to user
-        notifications.send_push(user, f"⏳ Processing your {service} purchase... Please wait.")
-
-        # 1. Wallet Check
+        # Debit the wallet and queue the purchase together; vtu_worker.py sends it
         try:
-            user_wallet = Wallet.get(Wallet.user == user, Wallet.currency == 'NGN')
-            if user_wallet.balance < amount:
-                return f"❌ Insufficient NGN balance (₦{user_wallet.balance:,.2f}).", session, True
+            with atomic_write():
+                ledger.post('VTU', [(user, 'NGN', -amount_kobo), (ledger.VTU, 'NGN', amount_kobo)], memo=session['target'])
+                tx = Transaction.create(user=user, type=f'VTU_{service.upper()}', currency='NGN', amount=amount_kobo, status='pending', tx_hash=session['target'])
+                vtu_jobs.enqueue(tx, user, request_id, service, session.get('provider').lower(), session['target'],
+                                 amount_kobo, session.get('variation_id') if service == 'Data' else None)
+        except ledger.InsufficientFunds as e:
+            return f"❌ Insufficient NGN balance (₦{money.fmt(e.balance, 'NGN', 2)}).", session, True
         except Wallet.DoesNotExist:
             return "❌ NGN Wallet not found.", session, True
 
-        # 2. Execute Transaction
-        try:
-            from services.vtu_service import VTUApiClient
-            vtu_client = VTUApiClient()
-            request_id = f"req_{uuid.uuid4().hex[:12]}"
-            provider_id = session.get('provider').lower()
-
-            with db.atomic():
-                user_wallet.balance -= amount
-                user_wallet.save()
-                tx = Transaction.create(user=user, type=f'VTU_{service.upper()}', currency='NGN', amount=amount, status='pending', tx_hash=session['target'])
-
-            if service == 'Airtime':
-                resp = vtu_client.purchase_airtime(request_id, session['target'], provider_id, amount)
-            else:
-                resp = vtu_client.purchase_data(request_id, session['target'], provider_id, session['variation_id'])
-
-            if resp.get('code') == 'success' or resp.get('status') == 'success':
-                tx.status = 'completed'
-                tx.save()
-                # Notify Buyer
-                buyer_msg = (
-                    f"📱 *{service} Purchase Successful*\n"
-                    "━━━━━━━━━━━━━━━━\n"
-                    f"Amount: ₦{amount:,.2f}\n"
-                    f"Recipient: {session['target']}\n\n"
-                    "Thank you for using PPAY!"
-                )
-                notifications.send_push(user, buyer_msg)
-                # Admin Notification
-                notifications.notify_admins(f"📱 VTU SUCCESS: {user.phone} bought {service} for {session['target']}")
-                return f"✅ {service} successful! ₦{amount} has been sent to {session['target']}.", session, True
-            else:
-                # Refund logic if API fails
-                with db.atomic():
-                    user_wallet.balance += amount
-                    user_wallet.save()
-                    tx.status = 'failed'
-                    tx.save()
-                return f"❌ VTU Provider Error: {resp.get('message', 'Unknown error')}. Balance refunded.", session, True
+        return (f"⏳ *{service} Purchase Queued*\n"
+                f"₦{amount:,} for {session['target']}\n"
+                f"Reference: {request_id}\n\n"
+                "You'll get a message here once it's delivered. If it fails, your balance is refunded automatically."), session, True
+
+    return "❓ Unknown step. Type 'menu' to restart.", session, True
+
+DATA_PLANS = ['500MB', '1GB', '2GB', '5GB']
+
+def _data_plan_menu(provider):
+    """Plan list with current prices from the catalog (in memory, no API call)."""
+    from services import vtu_service
+    lines = [f"Select Data Plan for {provider}:"]
+    for i, plan in enumerate(DATA_PLANS, 1):
+        price, _ = vtu_service.get_data_plan_price(provider, plan)
+        lines.append(f"{i}. {plan} - ₦{price:,}" if price is not None else f"{i}. {plan}")
+    return "\n".join(lines)
+
+# --- BULK VTU ---
+BULK_USAGE = (
+    "📦 *Bulk {service}*\n"
+    "Paste the list, one recipient per line:\n"
+    "`phone, network, {column}`\n"
+    "e.g. `08031234567, MTN, {example}`\n\n"
+    "Or upload a CSV file with those columns (up to {max_rows} rows)."
+)
+
+def handle_bulk_flow(user, msg, session):
+    if not vtu_bulk.allowed(user):
+        return "⛔ Bulk VTU is available to admin and corporate accounts only.", session, True
+    if getattr(user, 'is_frozen', False):
+        return "❄️ Your account is currently frozen. VTU services are disabled. Contact support to unfreeze.", session, True
+
+    step = session.get('step')
+    msg_clean = msg.strip().lower()
+    if msg_clean in ['exit', 'cancel', 'stop']:
+        return "❌ Bulk VTU cancelled.", session, True
+
+    # Step 1: Service Selection
+    if step == 1:
+        session['step'] = 2
+        return "📦 *Bulk VTU*\nSend to many numbers at once:\n1. Airtime\n2. Data\n\nReply with number or name.", session, False
 
+    # Step 2: List format for the chosen service
+    if step == 2:
+        service = {'1': 'Airtime', 'airtime': 'Airtime', '2': 'Data', 'data': 'Data'}.get(msg_clean)
+        if not service:
+            return "❓ Please select '1' for Airtime or '2' for Data.", session, False
+        session['service'] = service
+        session['step'] = 3
+        column, example = ('amount', '500') if service == 'Airtime' else ('plan', '1GB')
+        return BULK_USAGE.format(service=service, column=column, example=example, max_rows=vtu_bulk.MAX_ROWS), session, False
+
+    # Step 3: Validate the pasted or uploaded list
+    if step == 3:
+        media_url = session.pop('media_url', None)
+        try:
+            text = vtu_bulk.fetch_list(media_url) if media_url else msg
         except Exception as e:
-            return f"❌ System Error: {e}", session, True
+            return f"⚠️ Could not read the uploaded file ({e}). Paste the list instead.", session, False
+        rows, errors = vtu_bulk.validate(session['service'], text)
+        problems = "".join(f"\nLine {line_no}: {reason}" for line_no, _, reason in errors[:10])
+        if len(errors) > 10:
+            problems += f"\n...and {len(errors) - 10} more"
+        if not rows:
+            return f"❌ No valid rows found.{problems}\n\nFix the list and send it again, or type CANCEL.", session, False
+        session['rows'] = rows
+        session['step'] = 4
+        rejected = f"\n\n⚠️ {len(errors)} line(s) skipped:{problems}" if errors else ""
+        prompt = "Reply YES to debit your NGN wallet and send, or CANCEL."
+        repeated = vtu_bulk.repeats(rows)
+        if repeated:
+            # Same top-up twice may be intended (two payouts): the submitter decides
+            unique = vtu_bulk.dedupe(rows)
+            listed = "".join(f"\nLine {row['line']} repeats line {row['repeat_of']}" for row in repeated[:10])
+            if len(repeated) > 10:
+                listed += f"\n...and {len(repeated) - 10} more"
+            rejected += f"\n\n🔁 {len(repeated)} repeated row(s), same number, network and amount:{listed}"
+            prompt = (f"Reply YES to send all {len(rows)} rows, DEDUPE to send each recipient once "
+                      f"({len(unique)} rows, ₦{money.fmt(vtu_bulk.total(unique), 'NGN', 2)}), or CANCEL.")
+        return (f"📋 *Bulk {session['service']} Ready*\n"
+                f"Recipients: {len(rows)}\n"
+                f"Total: ₦{money.fmt(vtu_bulk.total(rows), 'NGN', 2)}{rejected}\n\n"
+                f"{prompt}"), session, False
+
+    # Step 4: One debit, then the rows are queued for vtu_worker.py
+    if step == 4:
+        if msg_clean == 'dedupe':
+            session['rows'] = vtu_bulk.dedupe(session['rows'])
+        elif msg_clean != 'yes':
+            return "❌ Bulk VTU cancelled.", session, True
+        try:
+            batch = vtu_bulk.submit(user, session['service'], session['rows'])
+        except ledger.InsufficientFunds as e:
+            return (f"❌ Insufficient NGN balance: ₦{money.fmt(e.balance, 'NGN', 2)} available, "
+                    f"₦{money.fmt(e.required, 'NGN', 2)} needed."), session, True
+        except Wallet.DoesNotExist:
+            return "❌ NGN Wallet not found.", session, True
+        return (f"⏳ *Bulk {session['service']} Queued*\n"
+                f"{batch.rows} recipients, ₦{money.fmt(batch.total, 'NGN', 2)}\n"
+                f"Reference: {batch.reference}\n\n"
+                f"You'll get a report here when every row is settled; failed rows are refunded automatically.\n"
+                f"Progress: `bulk status {batch.reference}`"), session, True
+
+    return "❓ Unknown step. Type 'bulk' to restart.", session, True
+
+def bulk_command(user, msg):
+    """`bulk status REF` (report), `bulk requery REF` (requery unsettled rows now)."""
+    if not vtu_bulk.allowed(user):
+        return None
+    parts = msg.strip().split()
+    if len(parts) != 3 or parts[1].lower() not in ('status', 'report', 'requery'):
+        return "Usage: `bulk status [REF]` or `bulk requery [REF]`"
+    batch = vtu_bulk.get_batch(parts[2], user)
+    if batch is None:
+        return f"❌ No bulk batch {parts[2]}."
+    if parts[1].lower() == 'requery':
+        return f"🔄 {vtu_bulk.requery(batch)} unsettled row(s) of {batch.reference} will be requeried now."
+    return vtu_bulk.format_report(batch)
+
+# --- ROUTER REGISTRATION ---
+def _start_session(msg):
+    # 'airtime' or 'data' jump straight to network selection
+    session = {'step': 1}
+    if msg in ['airtime', 'data']:
+        session['preselected_service'] = msg
+    return session
 
-    return "❓ Unknown step. Type 'menu' to restart.", session, True
\ No newline at end of file
+router.register_flow('vtu', handle_flow, triggers=['vtu', 'airtime', 'data'], start=_start_session)
+router.register_flow('vtu_bulk', handle_bulk_flow, triggers=['bulk', 'bulk vtu'])
+router.register_command(['bulk'], bulk_command, prefix=True)
@@ -1,7 +1,10 @@
 import os
-from database import Wallet, Transaction, db, User
+import money
+import ledger
+from database import Wallet, Transaction, db, User, atomic_write
 from modules import notifications
 import config
+import router
 
 # --- SESSION HELPERS ---
 
@@ -59,7 +62,7 @@ def handle_withdraw_flow(user, msg, session):
 
     elif session['step'] == 3 and session.get('mode') == 'crypto':
         try:
-            amount = float(msg.strip())
+            amount = money.to_minor(msg.strip(), session['asset'])
             if amount <= 0: return ("❌ Amount must be positive.", session, False)
             session['amount'] = amount
             session['step'] = 4
@@ -84,15 +87,11 @@ def handle_withdraw_flow(user, msg, session):
         amount = session['amount']
         dest = session['destination']
         # Calculate Fees
-        fee = 1.0 if coin == "USDT" else (0.0005 if coin == "BTC" else 0.0)
+        fee = money.to_minor("1.0" if coin == "USDT" else ("0.0005" if coin == "BTC" else "0"), coin)
         total_deduction = amount + fee
         try:
-            user_wallet = Wallet.get(Wallet.user == user, Wallet.currency == coin)
-            if user_wallet.balance < total_deduction:
-                return (f"❌ *Insufficient Funds*\nBalance: `{user_wallet.balance:,.2f}` {coin}\nRequired: `{total_deduction:,.2f}`", session, True)
-            with db.atomic():
-                user_wallet.balance -= total_deduction
-                user_wallet.save()
+            with atomic_write():
+                ledger.post('WITHDRAWAL', [(user, coin, -total_deduction), (ledger.PAYOUTS, coin, amount), (ledger.FEES, coin, fee)], memo=dest)
                 tx = Transaction.create(
                     user=user, type='WITHDRAWAL', currency=coin, 
                     amount=amount, status='pending', tx_hash=dest
@@ -101,16 +100,18 @@ def handle_withdraw_flow(user, msg, session):
             from database import trigger_referral_payout
             trigger_referral_payout(user)
             # Notify Admin
-            admin_msg = f"🚨 *NEW WITHDRAWAL*\nUser: {user.phone}\nAmt: {amount} {coin}\nNetwork: {network}\nDest: {dest}"
+            admin_msg = f"🚨 *NEW WITHDRAWAL*\nUser: {user.phone}\nAmt: {money.fmt(amount, coin)} {coin}\nNetwork: {network}\nDest: {dest}"
             notifications.notify_admins(admin_msg)
-            return (f"⏳ *Withdrawal Requested*\nID: `{tx.id}`\nAmount: `{amount} {coin}`\nNetwork: {network}\nStatus: *Pending Review*", session, True)
+            return (f"⏳ *Withdrawal Requested*\nID: `{tx.id}`\nAmount: `{money.fmt(amount, coin)} {coin}`\nNetwork: {network}\nStatus: *Pending Review*", session, True)
+        except ledger.InsufficientFunds as e:
+            return (f"❌ *Insufficient Funds*\nBalance: `{money.fmt(e.balance, coin, 2)}` {coin}\nRequired: `{money.fmt(total_deduction, coin, 2)}`", session, True)
         except Wallet.DoesNotExist:
             return (f"⚠️ You don't have a {coin} wallet.", session, True)
 
     # --- Fiat Withdraw Flow ---
     elif session['step'] == 10 and session.get('mode') == 'fiat':
         try:
-            amount = float(msg.strip())
+            amount = money.to_minor(msg.strip(), 'NGN')
             if amount <= 0: return ("❌ Amount must be positive.", session, False)
             session['amount'] = amount
             session['step'] = 11
@@ -152,15 +153,11 @@ def handle_withdraw_flow(user, msg, session):
             return ("❌ Incorrect PIN. Please try again:", session, False)
         coin = 'NGN'
         amount = session['amount']
-        fee = 0.0
+        fee = 0
         total_deduction = amount + fee
         try:
-            user_wallet = Wallet.get(Wallet.user == user, Wallet.currency == coin)
-            if user_wallet.balance < total_deduction:
-                return (f"❌ *Insufficient Funds*\nBalance: `{user_wallet.balance:,.2f}` {coin}\nRequired: `{total_deduction:,.2f}`", session, True)
-            with db.atomic():
-                user_wallet.balance -= total_deduction
-                user_wallet.save()
+            with atomic_write():
+                ledger.post('WITHDRAWAL', [(user, coin, -total_deduction), (ledger.PAYOUTS, coin, amount), (ledger.FEES, coin, fee)], memo=session['destination'])
                 tx = Transaction.create(
                     user=user, type='WITHDRAWAL', currency=coin, 
                     amount=amount, status='pending', tx_hash=session['destination']
@@ -169,9 +166,11 @@ def handle_withdraw_flow(user, msg, session):
             from database import trigger_referral_payout
             trigger_referral_payout(user)
             # Notify Admin
-            admin_msg = f"🚨 *NEW FIAT WITHDRAWAL*\nUser: {user.phone}\nAmt: {amount} {coin}\nBank: {session['bank_name']}\nAcct No: {session['account_number']}\nAcct Name: {session['account_name']}"
+            admin_msg = f"🚨 *NEW FIAT WITHDRAWAL*\nUser: {user.phone}\nAmt: {money.fmt(amount, coin)} {coin}\nBank: {session['bank_name']}\nAcct No: {session['account_number']}\nAcct Name: {session['account_name']}"
             notifications.notify_admins(admin_msg)
-            return (f"⏳ *Fiat Withdrawal Requested*\nID: `{tx.id}`\nAmount: `{amount} {coin}`\nBank: {session['bank_name']}\nAcct No: {session['account_number']}\nAcct Name: {session['account_name']}\nStatus: *Pending Review*", session, True)
+            return (f"⏳ *Fiat Withdrawal Requested*\nID: `{tx.id}`\nAmount: `{money.fmt(amount, coin)} {coin}`\nBank: {session['bank_name']}\nAcct No: {session['account_number']}\nAcct Name: {session['account_name']}\nStatus: *Pending Review*", session, True)
+        except ledger.InsufficientFunds as e:
+            return (f"❌ *Insufficient Funds*\nBalance: `{money.fmt(e.balance, coin, 2)}` {coin}\nRequired: `{money.fmt(total_deduction, coin, 2)}`", session, True)
         except Wallet.DoesNotExist:
             return (f"⚠️ You don't have a {coin} wallet.", session, True)
 
@@ -183,7 +182,7 @@ def handle_withdraw_flow(user, msg, session):
         return f"How much {session['asset']} do you want to transfer?", session, False
     elif session['step'] == 15:
         try:
-            amount = float(msg.strip())
+            amount = money.to_minor(msg.strip(), session['asset'])
             if amount <= 0:
                 return "❌ Amount must be positive.", session, False
             session['amount'] = amount
@@ -197,7 +196,6 @@ def handle_withdraw_flow(user, msg, session):
             amount = session['amount']
             recipient_phone = session['recipient']
             try:
-                sender_wallet = Wallet.get(Wallet.user == user, Wallet.currency == asset)
                 # Normalize phone number to support both formats
                 def normalize_phone(phone):
                     phone = phone.strip()
@@ -211,26 +209,17 @@ def handle_withdraw_flow(user, msg, session):
                     recipient_user = User.get((User.phone == recipient_phone) | (User.phone == norm_phone))
                 except User.DoesNotExist:
                     return "⚠️ Recipient not found. Please check the phone number or invite them to register.", session, True
-                recipient_wallet = Wallet.get(Wallet.user == recipient_user, Wallet.currency == asset)
-                if sender_wallet.balance < amount:
-                    return f"❌ Insufficient funds. Balance: {sender_wallet.balance:,.4f} {asset}", session, True
-                # ...existing code...
-                # ...existing code...
-                with db.atomic():
-                    sender_wallet.balance -= amount
-                    sender_wallet.save()
-                    recipient_wallet.balance += amount
-                    recipient_wallet.save()
-                    Transaction.create(user=user, type='TRANSFER', currency=asset, amount=amount, status='completed', tx_hash=recipient_phone)
-                    Transaction.create(user=recipient_user, type='RECEIVE', currency=asset, amount=amount, status='completed', tx_hash=user.phone)
+                ledger.transfer(user, recipient_user, asset, amount)
                 # Trigger referral bonus payout if eligible
                 from database import trigger_referral_payout
                 trigger_referral_payout(user)
                 # Notify recipient of incoming transfer
-                notifications.send_internal_transfer_notification(recipient_user, amount, asset, 'received', user.phone)
-                admin_msg = f"🔁 *Internal Transfer*\nSender: {user.phone}\nRecipient: {recipient_user.phone}\nAsset: {asset}\nAmount: {amount}"
+                notifications.send_internal_transfer_notification(recipient_user, money.fmt(amount, asset), asset, 'received', user.phone)
+                admin_msg = f"🔁 *Internal Transfer*\nSender: {user.phone}\nRecipient: {recipient_user.phone}\nAsset: {asset}\nAmount: {money.fmt(amount, asset)}"
                 notifications.notify_admins(admin_msg)
-                return f"✅ Transfer of {amount} {asset} to {recipient_phone} completed.", session, True
+                return f"✅ Transfer of {money.fmt(amount, asset)} {asset} to {recipient_phone} completed.", session, True
+            except ledger.InsufficientFunds as e:
+                return f"❌ Insufficient funds. Balance: {money.fmt(e.balance, asset, 4)} {asset}", session, True
             except Wallet.DoesNotExist:
                 return f"❌ Wallet not found for asset {asset} or recipient.", session, True
         else:
@@ -249,7 +238,7 @@ def handle_balance(user):
         "━━━━━━━━━━━━━━"
     ]
     for w in wallets:
-        lines.append(f"• {w.currency}: {w.balance:,.4f}")
+        lines.append(f"• {w.currency}: {w.balance_major:,.4f}")
     lines.append("\n━━━━━━━━━━━━━━")
     lines.append("Tip: Use 'swap', 'deposit', or 'withdraw' to manage your funds.")
     return "\n".join(lines)
@@ -280,7 +269,7 @@ def get_tx_history(user):
 
         # 4. Entry UI Construction
         lines.append(f"{status_icon} *{tx_type}* — {dt}")
-        lines.append(f"┗ {asset_emoji} {tx.amount:,.2f} {tx.currency}")
+        lines.append(f"┗ {asset_emoji} {tx.amount_major:,.2f} {tx.currency}")
         
         # 5. Add Reference/Hash if it exists
         if tx.tx_hash and len(tx.tx_hash) > 2:
@@ -319,7 +308,7 @@ def handle_transfer_flow(user, msg, session):
         return f"How much {session['asset']} do you want to transfer?", session, False
     elif step == 4:
         try:
-            amount = float(msg.strip())
+            amount = money.to_minor(msg.strip(), session['asset'])
             if amount <= 0:
                 return "❌ Amount must be positive.", session, False
             session['amount'] = amount
@@ -333,7 +322,6 @@ def handle_transfer_flow(user, msg, session):
             amount = session['amount']
             recipient_phone = session['recipient']
             try:
-                sender_wallet = Wallet.get(Wallet.user == user, Wallet.currency == asset)
                 # Normalize phone number to support both formats
                 def normalize_phone(phone):
                     phone = phone.strip()
@@ -347,26 +335,25 @@ def handle_transfer_flow(user, msg, session):
                     recipient_user = User.get((User.phone == recipient_phone) | (User.phone == norm_phone))
                 except User.DoesNotExist:
                     return "⚠️ Recipient not found. Please check the phone number or invite them to register.", session, True
-                recipient_wallet = Wallet.get(Wallet.user == recipient_user, Wallet.currency == asset)
-                if sender_wallet.balance < amount:
-                    return f"❌ Insufficient funds. Balance: {sender_wallet.balance:,.4f} {asset}", session, True
-                with db.atomic():
-                    sender_wallet.balance -= amount
-                    sender_wallet.save()
-                    recipient_wallet.balance += amount
-                    recipient_wallet.save()
-                    Transaction.create(user=user, type='TRANSFER', currency=asset, amount=amount, status='completed', tx_hash=recipient_phone)
-                    Transaction.create(user=recipient_user, type='RECEIVE', currency=asset, amount=amount, status='completed', tx_hash=user.phone)
+                ledger.transfer(user, recipient_user, asset, amount)
                 # Trigger referral bonus payout if eligible
                 from database import trigger_referral_payout
                 trigger_referral_payout(user)
                 # Notify recipient of incoming transfer
-                notifications.send_internal_transfer_notification(recipient_user, amount, asset, 'received', user.phone)
-                admin_msg = f"🔁 *Internal Transfer*\nSender: {user.phone}\nRecipient: {recipient_user.phone}\nAsset: {asset}\nAmount: {amount}"
+                notifications.send_internal_transfer_notification(recipient_user, money.fmt(amount, asset), asset, 'received', user.phone)
+                admin_msg = f"🔁 *Internal Transfer*\nSender: {user.phone}\nRecipient: {recipient_user.phone}\nAsset: {asset}\nAmount: {money.fmt(amount, asset)}"
                 notifications.notify_admins(admin_msg)
-                return f"✅ Transfer of {amount} {asset} to {recipient_phone} completed.", session, True
+                return f"✅ Transfer of {money.fmt(amount, asset)} {asset} to {recipient_phone} completed.", session, True
+            except ledger.InsufficientFunds as e:
+                return f"❌ Insufficient funds. Balance: {money.fmt(e.balance, asset, 4)} {asset}", session, True
             except Wallet.DoesNotExist:
                 return f"❌ Wallet not found for asset {asset} or recipient.", session, True
         else:
             return "❌ Transfer aborted.", session, True
-    return "❓ Unknown step. Type `menu`.", session, True
\ No newline at end of file
+    return "❓ Unknown step. Type `menu`.", session, True
+
+# --- ROUTER REGISTRATION ---
+router.register_flow('withdraw', handle_withdraw_flow)
+router.register_flow('transfer', handle_transfer_flow)
+router.register_command(['balance', 'wallet'], lambda user, msg: handle_balance(user))
+router.register_command(['history', 'transactions'], lambda user, msg: get_tx_history(user))
@@ -0,0 +1,64 @@
+# money.py
+"""
+Fixed-point money helpers.
+
+Ledger amounts (Wallet.balance, Wallet.locked, Transaction.amount) are
+stored as integers in each currency's minor unit: kobo for NGN, 1e-6 for
+USDT, 1e-8 (satoshi) for BTC. Balance checks and SUM() aggregates are then
+exact integer arithmetic; Decimal is only used at the edges (parsing user
+input, applying a rate, formatting for display).
+"""
+from decimal import Decimal, InvalidOperation, ROUND_DOWN, ROUND_HALF_UP
+
+# Decimal places of the minor unit per currency
+SCALES = {
+    'NGN': 2,
+    'USD': 2,
+    'USDT': 6,
+    'USDC': 6,
+    'TRX': 6,
+    'BTC': 8,
+    'ETH': 8,
+    'SOL': 8,
+    'BNB': 8,
+}
+DEFAULT_SCALE = 8
+
+def scale(currency):
+    return SCALES.get((currency or '').upper(), DEFAULT_SCALE)
+
+def to_minor(amount, currency, rounding=ROUND_HALF_UP):
+    """
+    Major-unit amount (str, int, float or Decimal) -> integer minor units.
+    Raises ValueError for anything that is not a finite number.
+    """
+    try:
+        value = amount if isinstance(amount, Decimal) else Decimal(str(amount).replace(',', '').strip())
+        if not value.is_finite():
+            raise ValueError(f"Invalid amount: {amount}")
+        return int(value.scaleb(scale(currency)).to_integral_value(rounding=rounding))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount: {amount}")
+
+def from_minor(units, currency):
+    """Integer minor units -> exact Decimal in major units."""
+    return Decimal(int(units or 0)).scaleb(-scale(currency))
+
+def convert(units, from_currency, to_currency, rate):
+    """
+    Converts minor units of `from_currency` at `rate` (to per from) into
+    minor units of `to_currency`. Rounds down so the ledger never credits
+    more than the quote.
+    """
+    value = from_minor(units, from_currency) * Decimal(str(rate))
+    return to_minor(value, to_currency, rounding=ROUND_DOWN)
+
+def fmt(units, currency, places=None):
+    """
+    Display helper: fmt(150050, 'NGN', 2) -> '1,500.50'. Without `places`
+    the exact value is shown with trailing zeros trimmed: fmt(50000000, 'BTC') -> '0.5'.
+    """
+    value = from_minor(units, currency)
+    if places is None:
+        return f"{value.normalize():f}"
+    return f"{value:,.{places}f}"
@@ -1,29 +1,36 @@
+import asyncio
 import time
 import os
 import random
-import requests
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from twilio.rest import Client
 
 # Load Database Models
 from database import Alert, User, db
+import ledger
+from services import price_engine, http_client, outbox
+from services.ticker_stream import TickerStream
+from services.alert_index import AlertIndex
 
 # Load Environment Config
 load_dotenv(override=True)
 
-# --- TWILIO SETUP ---
-account_sid = os.getenv("TWILIO_ACCOUNT_SID")
-auth_token = os.getenv("TWILIO_AUTH_TOKEN")
-twilio_phone = os.getenv("TWILIO_PHONE")
-client = Client(account_sid, auth_token)
-
 # --- STRATEGIC NOTIFICATIONS ---
 
-def get_strategic_phrase(symbol, condition, price):
+def get_strategic_phrase(symbol, condition, price, kind='cross', reference=None):
     """
     Returns a high-impact notification phrase.
     """
     clean_sym = symbol.replace("USDT", "")
+    if kind == 'breakout':
+        edge = "high" if condition == 'above' else "low"
+        emoji = "🚀" if condition == 'above' else "🔻"
+        return f"{emoji} *{clean_sym} 24h Breakout!* Price just set a new 24h {edge} at ${price:,.2f}"
+    if kind == 'pct' and reference:
+        move = (price / reference - 1) * 100
+        emoji = "📈" if condition == 'above' else "📉"
+        return f"{emoji} *{clean_sym} moved {move:+.1f}%* from ${reference:,.2f} to ${price:,.2f}"
     if condition == 'above':
         phrases = [
             f"🚀 *{clean_sym} Surge Alert!* Price crossed above ${price:,.2f}",
@@ -42,108 +49,285 @@ def get_strategic_phrase(symbol, condition, price):
 
 # --- PRICE DATA ENGINE ---
 
-def get_batch_prices(symbols):
+def get_batch_quotes(symbols):
     """
-    Fetch live prices for multiple symbols in a single high-speed Bybit V5 request.
+    Live quotes (price and 24h range) for multiple symbols from the shared
+    price engine: one bulk Bybit V5 request per refresh, served from memory
+    in between.
     """
     if not symbols: return {}
     try:
-        # Optimization: Fetch only the specific tickers needed
-        sym_string = ",".join(symbols)
-        url = f"https://api.bybit.com/v5/market/tickers?category=spot&symbol={sym_string}"
-        response = requests.get(url, timeout=10)
-        data = response.json()
-        
-        prices = {}
-        if data.get('retCode') == 0:
-            for item in data['result']['list']:
-                prices[item['symbol']] = float(item['lastPrice'])
-        return prices
+        return price_engine.get_quotes(symbols)
     except Exception as e:
         print(f"⚠️ Market Data Error: {e}")
         return {}
 
 # --- MONITORING LOGIC ---
 
-def check_markets():
-    # Ensure database connection is fresh
-    if db.is_closed():
-        db.connect()
-
-    # 1. Pull all active alerts with User info
-    active_alerts = Alert.select(Alert, User).join(User).where(Alert.is_active == True)
-    
-    if not active_alerts:
-        return
-
-    # 2. Extract unique symbols for batch processing
-    unique_symbols = list(set([a.symbol for a in active_alerts]))
-    
-    # 3. Get real-time prices
-    live_prices = get_batch_prices(unique_symbols)
-    
-    # 4. Process each alert
-    for alert in active_alerts:
-        symbol = alert.symbol
-        if symbol not in live_prices:
-            continue
-            
-        current_price = live_prices[symbol]
-        target = alert.target_price
-        triggered = False
-        
-        # Check condition
-        if alert.condition == 'above' and current_price >= target:
-            triggered = True
-        elif alert.condition == 'below' and current_price <= target:
-            triggered = True
-            
-        if triggered:
-            print(f"✅ ALERT TRIGGERED: {symbol} at {current_price}")
-            
-            # Formulate and Send Notification
-            phrase = get_strategic_phrase(symbol, alert.condition, target)
-            phrase += f"\n\n💰 Current Rate: `${current_price:,.2f}`\n🔗 Trade on *PPAY*"
-            
-            send_whatsapp(alert.user.phone, phrase)
-            
-            # Deactivate to prevent spamming
-            alert.is_active = False
-            alert.save()
+# Active alerts by symbol and threshold (see services/alert_index.py)
+alert_index = AlertIndex()
+# Alerts are created by the web process, so new ones are picked up by id on
+# every sync; a periodic full rebuild catches rows changed out of band
+FULL_SYNC_INTERVAL = int(os.getenv("ALERT_FULL_SYNC_INTERVAL", 600))
+next_full_sync = 0.0
 
-def send_whatsapp(to_number, body_text):
+def sync_alerts():
+    """Brings the alert index up to date; returns the symbols with active alerts."""
+    global next_full_sync
+    if time.time() >= next_full_sync:
+        next_full_sync = time.time() + FULL_SYNC_INTERVAL
+        alert_index.sync(full=True)
+    else:
+        alert_index.sync()
+    return alert_index.symbols()
+
+def claim_alerts(alert_ids):
     """
-    Sends the WhatsApp message via Twilio.
+    Claims the fired alerts among alert_ids in bulk (two UPDATEs per 500
+    ids): one-shot alerts are deactivated, re-arming alerts (with a band)
+    are disarmed. Returns (kind, condition, target, reference, band, phone)
+    for the ones this call flipped. The stream and the polling fallback can
+    both see a crossing; only the caller that flips the row notifies.
     """
-    try:
-        client.messages.create(
-            from_=f"whatsapp:{twilio_phone}",
-            body=body_text,
-            to=f"whatsapp:{to_number}"
+    claimed = []
+    fields = (Alert.kind, Alert.condition, Alert.target_price, Alert.reference_price, Alert.band, Alert.user)
+    for start in range(0, len(alert_ids), 500):
+        chunk = Alert.id.in_(alert_ids[start:start + 500]) & (Alert.is_active == True)
+        claimed += (Alert
+                    .update(is_active=False)
+                    .where(chunk & Alert.band.is_null())
+                    .returning(*fields)
+                    .tuples()
+                    .execute())
+        claimed += (Alert
+                    .update(armed=False)
+                    .where(chunk & Alert.band.is_null(False) & (Alert.armed == True))
+                    .returning(*fields)
+                    .tuples()
+                    .execute())
+    user_ids = list({row[-1] for row in claimed})
+    phones = {}
+    for start in range(0, len(user_ids), 500):
+        phones.update(User.select(User.id, User.phone).where(User.id.in_(user_ids[start:start + 500])).tuples())
+    return [(*row[:-1], phones[row[-1]]) for row in claimed]
+
+def rearm_alerts(alert_ids):
+    """Marks re-arming alerts armed again once price retreated past their band."""
+    for start in range(0, len(alert_ids), 500):
+        (Alert
+         .update(armed=True)
+         .where(Alert.id.in_(alert_ids[start:start + 500]) & (Alert.is_active == True) & Alert.band.is_null(False))
+         .execute())
+
+def send_whatsapp(to_number, body_text):
+    """Queues the WhatsApp message in the outbox; outbox_worker.py sends it."""
+    outbox.enqueue(to_number, body_text)
+
+# --- PIPELINE ---
+#
+#   fetch (ticker stream, or REST poll while it is down)
+#     -> ticks queue -> evaluate (index + bulk claim)
+#     -> outbox (one INSERT per batch of fired alerts; outbox_worker.py sends)
+#
+# Each stage is its own asyncio task, and Twilio is only called by the
+# outbox worker, so a slow send never delays a fetch. Scheduled jobs run
+# on a fixed cadence that does not drift with their own duration.
+# peewee connections are per thread, so every database call goes through
+# one dedicated thread.
+
+TICK_QUEUE_SIZE = int(os.getenv("MONITOR_TICK_QUEUE", 10000))
+POLL_INTERVAL = float(os.getenv("MONITOR_POLL_INTERVAL", 10))
+# How often new alerts are picked up (and stream subscriptions updated)
+ALERT_SYNC_INTERVAL = float(os.getenv("ALERT_SYNC_INTERVAL", 2))
+HEARTBEAT_INTERVAL = float(os.getenv("MONITOR_HEARTBEAT_INTERVAL", 90))
+# Periodic wallet snapshots keep balance rebuilds/audits bounded
+LEDGER_SNAPSHOT_INTERVAL = float(os.getenv("LEDGER_SNAPSHOT_INTERVAL", 3600))
+
+class StageTimer:
+    """Count, mean and max duration of one stage since the last heartbeat."""
+    def __init__(self):
+        self.count, self.total, self.worst = 0, 0.0, 0.0
+
+    def record(self, seconds):
+        self.count += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+
+    def report(self):
+        if not self.count:
+            return "idle"
+        text = f"{self.count}x avg {self.total / self.count * 1000:.1f}ms max {self.worst * 1000:.0f}ms"
+        self.count, self.total, self.worst = 0, 0.0, 0.0
+        return text
+
+class Monitor:
+    def __init__(self, stream=None):
+        self.stream = stream
+        self.queued = 0
+        self.queue_latencies = deque(maxlen=10000) # tick -> queued in the outbox
+        self.ticks = asyncio.Queue(TICK_QUEUE_SIZE)
+        self.symbols = []
+        self.fired = 0
+        self.timers = {stage: StageTimer() for stage in ('sync', 'fetch', 'evaluate')}
+        self.lag = 0.0 # worst scheduler lateness since the last heartbeat
+        self._db_executor = ThreadPoolExecutor(1, thread_name_prefix="monitor-db")
+
+    async def db_call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, fn, *args)
+
+    async def every(self, interval, job, start_in=0):
+        """
+        Runs `job` every `interval` seconds on a fixed cadence: slots are
+        computed from the start time, not from when the last run finished.
+        A run that overruns skips the slots it missed instead of bursting.
+        """
+        loop = asyncio.get_running_loop()
+        next_run = loop.time() + start_in
+        await asyncio.sleep(start_in)
+        while True:
+            self.lag = max(self.lag, loop.time() - next_run)
+            try:
+                await job()
+            except Exception as e:
+                print(f"🛑 CRITICAL MONITOR ERROR ({job.__name__}): {e}")
+            next_run += interval
+            now = loop.time()
+            if next_run < now:
+                next_run += ((now - next_run) // interval + 1) * interval
+            await asyncio.sleep(next_run - now)
+
+    # --- STAGES ---
+
+    async def sync(self):
+        started = time.monotonic()
+        self.symbols = await self.db_call(sync_alerts)
+        self.timers['sync'].record(time.monotonic() - started)
+        if self.stream is not None:
+            self.stream.set_symbols(self.symbols)
+
+    async def poll(self):
+        """REST fetch stage: only while there is no live stream."""
+        if (self.stream is not None and self.stream.is_live()) or not self.symbols:
+            return
+        started = time.monotonic()
+        quotes = await asyncio.to_thread(get_batch_quotes, self.symbols)
+        self.timers['fetch'].record(time.monotonic() - started)
+        now = time.time()
+        for quote in quotes.values():
+            await self.ticks.put(quote._replace(updated_at=now))
+
+    async def evaluate_ticks(self):
+        """Evaluation stage: consumes the ticks queue until cancelled."""
+        while True:
+            batch = [await self.ticks.get()]
+            while not self.ticks.empty() and len(batch) < 5000:
+                batch.append(self.ticks.get_nowait())
+            started = time.monotonic()
+            # A backlog is coalesced per symbol; its high and low still
+            # cover every threshold any of the ticks crossed
+            ranges = {}
+            for quote in batch:
+                low, high, origin, _ = ranges.get(quote.symbol, (quote.price, quote.price, quote.updated_at, None))
+                ranges[quote.symbol] = (min(low, quote.price), max(high, quote.price), origin, quote)
+            try:
+                for symbol, (low, high, origin, latest) in ranges.items():
+                    await self.evaluate(symbol, high, origin)
+                    if low != high:
+                        await self.evaluate(symbol, low, origin)
+                    # Breakouts in the next batch compare against this 24h range
+                    alert_index.update_range(symbol, latest.low_24h, latest.high_24h)
+            except Exception as e:
+                print(f"🛑 CRITICAL MONITOR ERROR (evaluate): {e}")
+            finally:
+                for _ in batch:
+                    self.ticks.task_done()
+            self.timers['evaluate'].record(time.monotonic() - started)
+
+    async def evaluate(self, symbol, current_price, origin=None):
+        """
+        Fires the indexed alerts on `symbol` that current_price crosses.
+        `origin` is when the price was received. Returns how many fired.
+        """
+        before = {}
+        crossed, rearmed = alert_index.pop_triggered(symbol, current_price, before)
+        try:
+            if rearmed:
+                await self.db_call(rearm_alerts, rearmed)
+            if not crossed:
+                return 0
+            fired = await self.db_call(claim_alerts, crossed)
+        except Exception:
+            # Not recorded: back in the index, so the next tick tries again
+            alert_index.restore(before)
+            raise
+        if fired:
+            print(f"✅ {len(fired)} ALERT(S) TRIGGERED: {symbol} at {current_price}")
+        messages = []
+        for kind, condition, target, reference, band, phone in fired:
+            # Formulate the notification; the outbox worker delivers it
+            phrase = get_strategic_phrase(symbol, condition, current_price if kind == 'breakout' else target, kind, reference)
+            phrase += f"\n\n💰 Current Rate: `${current_price:,.2f}`\n🔗 Trade on *PPAY*"
+            if band:
+                phrase += f"\n🔁 Re-arms after a {band * 100:g}% pullback"
+            messages.append((phone, phrase))
+        if messages:
+            self.queued += await self.db_call(outbox.enqueue_many, messages)
+            if origin is not None:
+                self.queue_latencies.append(time.time() - origin)
+        self.fired += len(fired)
+        return len(fired)
+
+    async def snapshot(self):
+        print(f"📸 Ledger snapshot: {await self.db_call(ledger.take_snapshots)} wallet(s)")
+
+    async def heartbeat(self):
+        print(f"💓 Monitor Heartbeat: {self.status()}")
+
+    def status(self):
+        if self.stream is None:
+            feed = "polling"
+        else:
+            feed = f"stream {'live' if self.stream.is_live() else 'DOWN'} ({self.stream.ticks} ticks, {self.stream.reconnects} reconnects)"
+        latencies = sorted(self.queue_latencies)
+        pct = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))] if latencies else 0.0
+        return (
+            f"{feed} | {len(alert_index)} alerts on {len(self.symbols)} symbols, {self.fired} fired\n"
+            f"   sync {self.timers['sync'].report()} | fetch {self.timers['fetch'].report()} | "
+            f"evaluate {self.timers['evaluate'].report()}\n"
+            f"   queues: ticks {self.ticks.qsize()}/{self.ticks.maxsize} | outbox: {self.queued} queued, "
+            f"tick-to-queued p50/p99 {pct(0.5) * 1000:.0f}/{pct(0.99) * 1000:.0f}ms\n"
+            f"   scheduler lag max {self._take_lag() * 1000:.0f}ms"
+            + "".join(f"\n   http {host}: {h['requests']} req, {h['errors']} err, {h['retries']} retried, "
+                      f"{h['connections']} conn, p50/p99 {h['p50'] * 1000:.0f}/{h['p99'] * 1000:.0f}ms"
+                      for host, h in http_client.stats().items())
         )
-    except Exception as e:
-        print(f"❌ WhatsApp Delivery Failed for {to_number}: {e}")
+
+    def _take_lag(self):
+        lag, self.lag = self.lag, 0.0
+        return lag
+
+    async def run(self):
+        await self.sync()
+        tasks = [
+            self.every(ALERT_SYNC_INTERVAL, self.sync, start_in=ALERT_SYNC_INTERVAL),
+            self.every(POLL_INTERVAL, self.poll),
+            self.evaluate_ticks(),
+            self.every(HEARTBEAT_INTERVAL, self.heartbeat, start_in=HEARTBEAT_INTERVAL),
+            self.every(LEDGER_SNAPSHOT_INTERVAL, self.snapshot, start_in=LEDGER_SNAPSHOT_INTERVAL),
+        ]
+        if self.stream is not None:
+            tasks.append(self.stream.run(self.ticks))
+        await asyncio.gather(*tasks)
 
 # --- EXECUTION LOOP ---
 
 if __name__ == "__main__":
     print(f"🚀 PPAY Market Monitor Online")
     print(f"📡 Scanning {os.getenv('ENV', 'Production')} Environment...")
-    
-    heartbeat_counter = 0
-    
-    while True:
-        try:
-            check_markets()
-            
-            # Log a heartbeat every 10 iterations (approx 1.5 mins)
-            heartbeat_counter += 1
-            if heartbeat_counter >= 10:
-                print("💓 Monitor Heartbeat: OK")
-                heartbeat_counter = 0
-                
-        except Exception as e:
-            print(f"🛑 CRITICAL MONITOR ERROR: {e}")
-            time.sleep(5) # Cooldown before retry
-            
-        time.sleep(10) # 10-second scan interval (optimized for rate limits)
\ No newline at end of file
+
+    # MARKET_FEED=stream (default) evaluates alerts on every websocket tick;
+    # MARKET_FEED=poll keeps the REST scan. The stream falls back to polling while down.
+    stream = None
+    if os.getenv("MARKET_FEED", "stream") == "stream":
+        stream = TickerStream(engine=price_engine.get_engine())
+    asyncio.run(Monitor(stream).run())
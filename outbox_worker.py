@@ -0,0 +1,48 @@
+"""
+Outbox worker: sends the WhatsApp messages queued by the bot, the VTU
+worker and the monitor (see services/outbox.py), at most TWILIO_MPS per
+second, retrying transient failures and dead-lettering the rest.
+
+Run one per Twilio sender, so the rate limit holds globally.
+
+Usage: python outbox_worker.py
+"""
+import os
+import signal
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+import database
+from services import outbox
+
+HEARTBEAT_INTERVAL = int(os.getenv("OUTBOX_HEARTBEAT_INTERVAL", 300))
+
+def status(worker):
+    done = worker.stats()
+    with database.db.connection_context():
+        queue = ", ".join(f"{s} {n}" for s, n in sorted(outbox.counts().items())) or "empty"
+        waiting = outbox.oldest_queued()
+    return (
+        f"queue: {queue} | oldest waiting {waiting:.0f}s | sending {done['inflight']}\n"
+        f"   {done['sent']} sent, {done['retried']} retried, {done['dead']} dead-lettered, "
+        f"queued-to-sent p50/p99 {done['p50']:.2f}/{done['p99']:.2f}s"
+    )
+
+if __name__ == "__main__":
+    database.init_db()
+    worker = outbox.OutboxWorker()
+    print(f"🚀 PPAY Outbox Worker Online ({worker.workers} workers, {worker.limiter.rate:g} msg/s)")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    thread = threading.Thread(target=worker.run, args=(stop,), daemon=True)
+    thread.start()
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            print(f"💓 Outbox Heartbeat: {status(worker)}")
+    except KeyboardInterrupt:
+        stop.set()
+    thread.join()
+    # Messages already claimed still get sent (or requeued)
+    worker.drain()
+    print("👋 Outbox Worker stopped")
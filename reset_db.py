@@ -1,4 +1,4 @@
-from database import db, User, Wallet, Transaction, Alert, SupportTicket
+from database import db, User, Wallet, Transaction, Alert, SupportTicket, ChatSession, JournalEntry, Posting, WalletSnapshot
 
 def reset():
     print("🔥 Resetting Database...")
@@ -9,11 +9,11 @@ def reset():
 
     # 1. Drop old tables (Delete old structure)
     print("🗑️ Dropping old tables...")
-    db.drop_tables([User, Wallet, Transaction, Alert, SupportTicket], safe=True)
+    db.drop_tables([User, Wallet, Transaction, Alert, SupportTicket, ChatSession, JournalEntry, Posting, WalletSnapshot], safe=True)
 
     # 2. Create new tables (Apply new structure)
     print("✨ Creating new tables...")
-    db.create_tables([User, Wallet, Transaction, Alert, SupportTicket], safe=True)
+    db.create_tables([User, Wallet, Transaction, Alert, SupportTicket, ChatSession, JournalEntry, Posting, WalletSnapshot], safe=True)
     
     print("✅ Database Reset Complete! You are ready.")
     db.close()
@@ -0,0 +1,104 @@
+# router.py
+"""
+Table-driven message router.
+
+Each module registers its multi-step flows and static commands once, at
+import time. main.bot() then resolves every inbound message with a single
+lookup of the sender's active flow plus a hash lookup on the command, so
+routing cost stays flat no matter how many flows are registered.
+"""
+import state_manager
+
+class Flow:
+    def __init__(self, name, handler, admin=False, start=None):
+        self.name = name
+        self.handler = handler  # handler(user, msg, session) -> (text, session, done)
+        self.admin = admin
+        self.start = start      # start(msg) -> initial session dict
+
+class Command:
+    def __init__(self, handler, admin=False):
+        self.handler = handler  # handler(user, msg) -> text
+        self.admin = admin
+
+# --- REGISTRIES ---
+_flows = {}     # flow name -> Flow
+_triggers = {}  # exact message -> Flow that it starts fresh
+_commands = {}  # exact message -> Command
+_prefixes = {}  # first word -> Command taking arguments (e.g. `price BTC`)
+
+def register_flow(name, handler, triggers=None, admin=False, start=None):
+    """
+    Registers a multi-step flow. Typing any of its trigger words starts the
+    flow fresh; while the flow is active other messages are routed to it.
+    """
+    flow = Flow(name, handler, admin=admin, start=start)
+    _flows[name] = flow
+    for word in (triggers or [name]):
+        _triggers[word] = flow
+    return flow
+
+def register_command(words, handler, admin=False, prefix=False):
+    """
+    Registers a one-shot command. `prefix=True` matches messages whose first
+    word is one of `words` and which carry arguments (e.g. `price BTC`).
+    """
+    command = Command(handler, admin=admin)
+    table = _prefixes if prefix else _commands
+    for word in words:
+        table[word] = command
+    return command
+
+# --- DISPATCH ---
+
+def dispatch(user, sender, incoming_msg, is_admin=False, media_url=None):
+    """
+    Routes one message. Returns the response text, or None when nothing
+    matched so the caller can send its fallback.
+    """
+    msg = incoming_msg.lower()
+
+    # 1. Sender's active flow (one session lookup)
+    flow_name, session = state_manager.get_active_flow(sender)
+    flow = _flows.get(flow_name) if flow_name else None
+    if flow and flow.admin and not is_admin:
+        flow = None
+
+    # 2. Trigger word (one hash lookup)
+    trigger = _triggers.get(msg)
+    if trigger and trigger.admin and not is_admin:
+        trigger = None
+
+    # Admin flows consume every message; a user flow can be interrupted by
+    # another flow's trigger word (its own trigger restarts it).
+    if flow and (trigger is None or (flow.admin and trigger is not flow)):
+        return _run_flow(flow, user, sender, incoming_msg, session, media_url)
+    if trigger:
+        state_manager.clear_all_sessions(sender)
+        session = trigger.start(msg) if trigger.start else {'step': 1}
+        return _run_flow(trigger, user, sender, incoming_msg, session, media_url)
+
+    # 3. Static commands
+    command = _commands.get(msg)
+    if command is None and ' ' in msg:
+        command = _prefixes.get(msg.split(' ', 1)[0])
+    if command and (is_admin or not command.admin):
+        return command.handler(user, incoming_msg)
+    return None
+
+def _run_flow(flow, user, sender, incoming_msg, session, media_url):
+    # Inject media_url into session if present (for gift cards/support)
+    if media_url:
+        session['media_url'] = media_url
+    try:
+        response_text, session, done = flow.handler(user, incoming_msg, session)
+        # Save or Clear Session State
+        if done:
+            state_manager.clear_session(sender, flow.name)
+        else:
+            state_manager.set_session(sender, flow.name, session)
+    except Exception as e:
+        print(f"⚠️ Flow Error [{flow.name}]: {e}")
+        response_text = "⚠️ An error occurred during the process. Type `cancel` and try again."
+        state_manager.clear_all_sessions(sender)
+    return response_text
@@ -0,0 +1,271 @@
+"""
+In-memory index of active price alerts for the monitor.
+
+Per symbol, the threshold alerts are kept in two sorted arrays of prices
+(with a parallel array of alert ids). A new price finds every crossed
+threshold with one bisect per side:
+
+- above: targets <= price  -> prefix  [0, bisect_right(targets, price))
+- below: targets >= price  -> suffix  [bisect_left(targets, price), n)
+
+so a tick costs O(log n + k) for k crossed thresholds, however many alerts
+are waiting. Alerts are added as they are created and removed as they
+trigger; nothing is re-read from the database per tick.
+
+Alert kinds (Alert.kind):
+
+- cross:    fires when price crosses target_price.
+- pct:      the same, with target_price derived from the price at creation
+            (reference_price); indexed exactly like cross.
+- breakout: fires when price goes past the symbol's previous 24h high
+            ('above') or low ('below'), taken from the quotes the monitor
+            already receives (see update_range).
+
+An alert with a `band` re-arms instead of being deactivated. Once fired it
+is disarmed and waits for price to retreat by `band` (a fraction) past the
+trigger: a disarmed cross/pct alert sits in the opposite array at that
+retreat level, so re-arming is found by the same bisects; a disarmed
+breakout waits in an array sorted by band and re-arms when price is that
+far back inside the 24h range.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from database import db, Alert
+from services.price_engine import normalize
+
+Entry = namedtuple('Entry', 'symbol kind condition target band armed')
+
+OPPOSITE = {'above': 'below', 'below': 'above'}
+
+def rearm_level(condition, target, band):
+    """Price at which a fired cross/pct alert re-arms."""
+    return target * (1 - band) if condition == 'above' else target * (1 + band)
+
+class AlertIndex:
+    def __init__(self):
+        self.sides = {}     # symbol -> {'above': (targets, ids), 'below': (targets, ids)}
+        self.breakouts = {} # symbol -> {'above': armed ids, 'below': armed ids}
+        self.retreats = {}  # symbol -> {'above': (bands, ids), 'below': (bands, ids)} of disarmed breakouts
+        self.ranges = {}    # symbol -> (low_24h, high_24h) of the last evaluated quote
+        self.alerts = {}    # alert_id -> Entry
+        self.high_water = 0 # largest alert id loaded from the database
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def symbols(self):
+        return list(self.sides.keys() | self.breakouts.keys() | self.retreats.keys())
+
+    @staticmethod
+    def _entry(symbol, kind, condition, target, band, armed):
+        """Entry for a database row, or None for rows the index cannot evaluate."""
+        if condition not in ('above', 'below'):
+            return None
+        kind = kind or 'cross'
+        if kind != 'breakout' and target is None:
+            return None
+        return Entry(symbol, kind, condition, target, band or None, bool(armed) or not band)
+
+    @staticmethod
+    def _slot(entry):
+        """(structure, side, key) where the entry currently waits."""
+        if entry.kind == 'breakout':
+            return ('breakouts', entry.condition, None) if entry.armed else ('retreats', entry.condition, entry.band)
+        if entry.armed:
+            return 'sides', entry.condition, entry.target
+        return 'sides', OPPOSITE[entry.condition], rearm_level(entry.condition, entry.target, entry.band)
+
+    def _place(self, alert_id, entry):
+        structure, side, key = self._slot(entry)
+        if structure == 'breakouts':
+            self.breakouts.setdefault(entry.symbol, {'above': set(), 'below': set()})[side].add(alert_id)
+        else:
+            keys, ids = getattr(self, structure).setdefault(entry.symbol, {'above': ([], []), 'below': ([], [])})[side]
+            # Equal keys stay in id order, as load() sorts them
+            position = bisect_right(keys, key)
+            keys.insert(position, key)
+            ids.insert(position, alert_id)
+        self.alerts[alert_id] = entry
+
+    def _unplace(self, alert_id, entry):
+        structure, side, key = self._slot(entry)
+        groups = getattr(self, structure)[entry.symbol]
+        if structure == 'breakouts':
+            groups[side].discard(alert_id)
+        else:
+            keys, ids = groups[side]
+            position = bisect_left(keys, key)
+            while ids[position] != alert_id:
+                position += 1
+            del keys[position]
+            del ids[position]
+        self._drop_if_empty(entry.symbol)
+
+    def _drop_if_empty(self, symbol):
+        for structure in (self.sides, self.breakouts, self.retreats):
+            groups = structure.get(symbol)
+            if groups is None:
+                continue
+            # (keys, ids) arrays or a set of armed breakout ids
+            if not any(group[1] if isinstance(group, tuple) else group for group in groups.values()):
+                del structure[symbol]
+
+    def add(self, alert_id, symbol, kind, condition, target, band=None, armed=True):
+        """Indexes an active alert; re-adding a known id is a no-op."""
+        entry = self._entry(normalize(symbol), kind, condition, target, band, armed)
+        if entry is None:
+            return
+        with self._lock:
+            if alert_id in self.alerts:
+                return
+            self._place(alert_id, entry)
+            self.high_water = max(self.high_water, alert_id)
+
+    def load(self, rows):
+        """
+        Replaces the index with (alert_id, symbol, kind, condition, target,
+        band, armed) rows, sorting once.
+        """
+        grouped, alerts, symbols = {}, {}, {}
+        for alert_id, symbol, kind, condition, target, band, armed in rows:
+            if symbol not in symbols:
+                symbols[symbol] = normalize(symbol)
+            entry = self._entry(symbols[symbol], kind, condition, target, band, armed)
+            if entry is None:
+                continue
+            structure, side, key = self._slot(entry)
+            grouped.setdefault((structure, entry.symbol, side), []).append((key, alert_id))
+            alerts[alert_id] = entry
+        built = {'sides': {}, 'breakouts': {}, 'retreats': {}}
+        for (structure, symbol, side), pairs in grouped.items():
+            if structure == 'breakouts':
+                built[structure].setdefault(symbol, {'above': set(), 'below': set()})[side].update(i for _, i in pairs)
+                continue
+            pairs.sort()
+            keys, ids = built[structure].setdefault(symbol, {'above': ([], []), 'below': ([], [])})[side]
+            keys.extend(key for key, _ in pairs)
+            ids.extend(alert_id for _, alert_id in pairs)
+        with self._lock:
+            self.sides, self.breakouts, self.retreats = built['sides'], built['breakouts'], built['retreats']
+            self.alerts = alerts
+            self.high_water = max([self.high_water, *alerts])
+        return len(alerts)
+
+    def remove(self, alert_id):
+        with self._lock:
+            entry = self.alerts.pop(alert_id, None)
+            if entry is None:
+                return False
+            self._unplace(alert_id, entry)
+            return True
+
+    def triggered(self, symbol, price):
+        """Ids of the cross/pct entries on `symbol` that `price` crosses (left in the index)."""
+        sides = self.sides.get(symbol)
+        if sides is None:
+            return []
+        above_targets, above_ids = sides['above']
+        below_targets, below_ids = sides['below']
+        return above_ids[:bisect_right(above_targets, price)] + below_ids[bisect_left(below_targets, price):]
+
+    def pop_triggered(self, symbol, price, before=None):
+        """
+        Evaluates every alert on `symbol` against `price` in one pass.
+        Returns (fired, rearmed) alert ids. Fired one-shot alerts leave the
+        index; fired alerts with a band stay in it, disarmed, and come back
+        in `rearmed` once price has retreated far enough. A `before` dict
+        receives each flipped alert's previous entry, for restore().
+        """
+        with self._lock:
+            fired, rearmed = [], []
+            sides = self.sides.get(symbol)
+            if sides is not None:
+                above_targets, above_ids = sides['above']
+                below_targets, below_ids = sides['below']
+                cut_above = bisect_right(above_targets, price)
+                cut_below = bisect_left(below_targets, price)
+                crossed = above_ids[:cut_above] + below_ids[cut_below:]
+                del above_targets[:cut_above], above_ids[:cut_above]
+                del below_targets[cut_below:], below_ids[cut_below:]
+                for alert_id in crossed:
+                    self._flip(alert_id, fired, rearmed, before)
+            if symbol in self.breakouts or symbol in self.retreats:
+                self._pop_breakouts(symbol, price, fired, rearmed, before)
+            self._drop_if_empty(symbol)
+            return fired, rearmed
+
+    def _flip(self, alert_id, fired, rearmed, before=None):
+        """Fires an armed alert or re-arms a disarmed one (already out of its slot)."""
+        entry = self.alerts.pop(alert_id)
+        if before is not None:
+            before[alert_id] = entry
+        if entry.armed:
+            fired.append(alert_id)
+            if entry.band:
+                self._place(alert_id, entry._replace(armed=False))
+        else:
+            rearmed.append(alert_id)
+            self._place(alert_id, entry._replace(armed=True))
+
+    def _pop_breakouts(self, symbol, price, fired, rearmed, before):
+        # Breakouts compare against the range before this price arrived
+        low, high = self.ranges.get(symbol, (0.0, 0.0))
+        if not high:
+            return
+        waiting = self.retreats.get(symbol)
+        if waiting is not None:
+            # How far price is back inside the range from each edge
+            for side, retreat in (('above', 1 - price / high), ('below', price / low - 1)):
+                bands, ids = waiting[side]
+                cut = bisect_right(bands, retreat)
+                crossed = ids[:cut]
+                del bands[:cut], ids[:cut]
+                for alert_id in crossed:
+                    self._flip(alert_id, fired, rearmed, before)
+        armed = self.breakouts.get(symbol)
+        if armed is not None:
+            for side, broken in (('above', price > high), ('below', price < low)):
+                if broken and armed[side]:
+                    crossed = sorted(armed[side])
+                    armed[side].clear()
+                    for alert_id in crossed:
+                        self._flip(alert_id, fired, rearmed, before)
+
+    def restore(self, before):
+        """
+        Puts alerts flipped by pop_triggered back as they were ({alert_id:
+        entry} from its `before`), when the database could not record it.
+        """
+        with self._lock:
+            for alert_id, entry in before.items():
+                current = self.alerts.pop(alert_id, None)
+                if current is not None:
+                    self._unplace(alert_id, current)
+                self._place(alert_id, entry)
+
+    def update_range(self, symbol, low_24h, high_24h):
+        """Records the 24h range of the latest quote; the next breakout check compares against it."""
+        if low_24h > 0 and high_24h > 0:
+            self.ranges[symbol] = (low_24h, high_24h)
+
+    # --- DATABASE SYNC ---
+
+    def sync(self, full=False):
+        """
+        Loads alerts created since the last sync (id above the high-water
+        mark), or rebuilds from every active alert with full=True. Returns
+        the number of alerts added.
+        """
+        query = (Alert
+                 .select(Alert.id, Alert.symbol, Alert.kind, Alert.condition, Alert.target_price, Alert.band, Alert.armed)
+                 .where(Alert.is_active == True))
+        if full:
+            # Plain cursor rows: at a million alerts peewee's per-row conversion dominates
+            return self.load(db.execute_sql(*query.sql()))
+        added = 0
+        for row in query.where(Alert.id > self.high_water).order_by(Alert.id).tuples().iterator():
+            self.add(*row)
+            added += 1
+        return added
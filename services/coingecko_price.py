@@ -1,47 +1,199 @@
-from pycoingecko import CoinGeckoAPI
-from functools import lru_cache
+"""
+CoinGecko spot prices with a process-wide TTL cache.
+
+- Quotes are cached per (coin id, vs currency) for `ttl` seconds
+  (COINGECKO_TTL, default 60; CoinGecko itself refreshes about once a
+  minute). Concurrent misses for the same coin share one HTTP call: the
+  first caller fetches, the others wait for its result.
+- get_prices(symbols) fetches every missing coin with one multi-id
+  /simple/price request. A 'usdt' request also asks for 'usd', which is
+  used when CoinGecko has no USDT quote, so that fallback costs nothing.
+- Symbols are resolved to CoinGecko ids through an index built once from
+  /coins/list, loaded from a local snapshot file when one exists
+  (COINGECKO_COINS_FILE) and written there after a fetch.
+
+Use get_service() for the shared instance; CoinGeckoPriceService() objects
+created elsewhere share nothing and start cold.
+"""
+import json
+import os
+import threading
 import time
+from pycoingecko import CoinGeckoAPI
+
+IDS_PER_REQUEST = 250 # keeps the /simple/price query string well under URL limits
+COINS_FILE = os.getenv("COINGECKO_COINS_FILE", os.path.join(os.path.dirname(__file__), "coingecko_coins.json"))
+
+# Symbols shared by many listings resolve to the coin people mean
+PINNED_IDS = {
+    'btc': 'bitcoin',
+    'xbt': 'bitcoin',
+    'eth': 'ethereum',
+    'usdt': 'tether',
+    'usdc': 'usd-coin',
+    'bnb': 'binancecoin',
+    'sol': 'solana',
+    'xrp': 'ripple',
+    'ada': 'cardano',
+    'doge': 'dogecoin',
+    'trx': 'tron',
+    'ton': 'the-open-network',
+    'dot': 'polkadot',
+    'matic': 'matic-network',
+    'ltc': 'litecoin',
+    'avax': 'avalanche-2',
+    'link': 'chainlink',
+}
+
+class CoinIndex:
+    """symbol -> CoinGecko id, built once per process."""
+    def __init__(self, path=COINS_FILE):
+        self.path = path
+        self.by_symbol = None
+        self.named_ids = set() # ids spelled like the coin's name ('ethereum'), accepted as-is
+        self._lock = threading.Lock()
+
+    def _coins(self, cg):
+        if self.path and os.path.exists(self.path):
+            with open(self.path) as f:
+                return json.load(f)
+        coins = cg.get_coins_list()
+        if self.path:
+            try:
+                with open(self.path, 'w') as f:
+                    json.dump(coins, f)
+            except OSError as e:
+                print(f"[CoinGecko] Could not write coin list snapshot: {e}")
+        return coins
+
+    def build(self, cg):
+        with self._lock:
+            if self.by_symbol is not None:
+                return
+            try:
+                coins = self._coins(cg)
+            except Exception as e:
+                # Pinned ids still resolve; the next call retries the list
+                print(f"[CoinGecko] Coin list unavailable: {e}")
+                return
+            candidates = {}
+            for coin in coins:
+                candidates.setdefault(coin['symbol'].lower(), []).append(coin)
+            by_symbol = {}
+            for symbol, listed in candidates.items():
+                # Among same-symbol listings prefer the one named like its id
+                # (bitcoin/Bitcoin), then the shortest id (wrapped and bridged
+                # tokens get suffixed ids)
+                best = min(listed, key=lambda c: (c['id'] != c['name'].lower().replace(' ', '-'), len(c['id']), c['id']))
+                by_symbol[symbol] = best['id']
+            by_symbol.update(PINNED_IDS)
+            self.named_ids = {coin['id'] for coin in coins if coin['id'] == coin['name'].lower().replace(' ', '-')}
+            self.by_symbol = by_symbol
+
+    def resolve(self, symbol, cg):
+        """CoinGecko id for a ticker symbol ('sol') or an id passed as-is ('solana')."""
+        symbol = symbol.lower().strip()
+        if symbol in PINNED_IDS:
+            return PINNED_IDS[symbol]
+        if self.by_symbol is None:
+            self.build(cg)
+        if self.by_symbol is None or symbol in self.named_ids:
+            return symbol
+        return self.by_symbol.get(symbol, symbol)
 
 class CoinGeckoPriceService:
-    def __init__(self):
-        self.cg = CoinGeckoAPI()
+    def __init__(self, ttl=None, timeout=10, cg=None, index=None):
+        self.cg = cg or CoinGeckoAPI()
+        self.cg.request_timeout = timeout
+        self.ttl = float(os.getenv("COINGECKO_TTL", 60)) if ttl is None else ttl
+        self.index = index or CoinIndex()
+        self.quotes = {}   # (coin_id, vs) -> (price, fetched_at)
+        self.inflight = {} # (coin_id, vs) -> Event set when the fetch finishes
+        self.requests = 0
+        self._lock = threading.Lock()
 
-    @lru_cache(maxsize=128)
     def get_price(self, symbol: str, vs_currency: str = 'usdt'):
         """
-        Fetch the current price for a given symbol from CoinGecko.
-        Uses LRU cache to avoid rate limits and improve performance.
+        Current price for a symbol from CoinGecko, or None.
+        Served from the TTL cache; a miss costs at most one shared request.
+        """
+        return self.get_prices([symbol], vs_currency).get(symbol)
+
+    def get_prices(self, symbols, vs_currency='usdt', max_age=None):
         """
+        {symbol: price} for the symbols CoinGecko quotes, with one request for
+        all misses. max_age=0 refetches everything (sharing in-flight fetches).
+        """
+        vs = vs_currency.lower()
+        max_age = self.ttl if max_age is None else max_age
+        ids = {symbol: self.index.resolve(symbol, self.cg) for symbol in symbols}
+        now = time.time()
+        with self._lock:
+            cached = {coin_id: self.quotes.get((coin_id, vs)) for coin_id in set(ids.values())}
+            missing = [coin_id for coin_id, hit in cached.items() if hit is None or now - hit[1] >= max_age]
+            # Misses someone else is already fetching are waited for, the rest fetched here
+            waiting = {self.inflight[(c, vs)] for c in missing if (c, vs) in self.inflight}
+            mine = [c for c in missing if (c, vs) not in self.inflight]
+            done = threading.Event()
+            for coin_id in mine:
+                self.inflight[(coin_id, vs)] = done
+        if mine:
+            try:
+                self._fetch(mine, vs)
+            finally:
+                with self._lock:
+                    for coin_id in mine:
+                        del self.inflight[(coin_id, vs)]
+                done.set()
+        for event in waiting:
+            event.wait()
+        if missing:
+            with self._lock:
+                cached.update((c, self.quotes.get((c, vs))) for c in missing)
+        # A failed fetch leaves an expired quote behind; it is never served
+        now = time.time()
+        prices = {coin_id: hit[0] for coin_id, hit in cached.items() if hit is not None and now - hit[1] <= max(max_age, self.ttl)}
+        return {symbol: prices[coin_id] for symbol, coin_id in ids.items() if prices.get(coin_id) is not None}
+
+    def _fetch(self, coin_ids, vs):
+        currencies = f"{vs},usd" if vs == 'usdt' else vs
+        coin_ids = sorted(coin_ids)
+        data = {}
         try:
-            # CoinGecko uses ids, not symbols. Map common symbols to ids.
-            symbol_map = {
-                'btc': 'bitcoin',
-                'xbt': 'bitcoin',
-                'eth': 'ethereum',
-                'usdt': 'tether',
-                'bnb': 'binancecoin',
-                'sol': 'solana',
-                # Add more as needed
-            }
-            # Try to map symbol, fallback to lower-case
-            coin_id = symbol_map.get(symbol.lower(), symbol.lower())
-            # Special handling for ETH (common issue)
-            if symbol.lower() in ['eth', 'ethereum']:
-                coin_id = 'ethereum'
-            print(f"[DEBUG][CoinGecko] Fetching price for symbol: {symbol}, coin_id: {coin_id}, vs_currency: {vs_currency}")
-            data = self.cg.get_price(ids=coin_id, vs_currencies=vs_currency)
-            print(f"[DEBUG][CoinGecko] API response for {coin_id}: {data}")
-            price = data.get(coin_id, {}).get(vs_currency)
-            if price is None and vs_currency.lower() == 'usdt':
-                print(f"[DEBUG][CoinGecko] No USDT price for {coin_id}, trying USD fallback...")
-                data_usd = self.cg.get_price(ids=coin_id, vs_currencies='usd')
-                print(f"[DEBUG][CoinGecko] USD API response for {coin_id}: {data_usd}")
-                price_usd = data_usd.get(coin_id, {}).get('usd')
-                return price_usd
-            return price
+            for start in range(0, len(coin_ids), IDS_PER_REQUEST):
+                self.requests += 1
+                data.update(self.cg.get_price(ids=coin_ids[start:start + IDS_PER_REQUEST], vs_currencies=currencies))
         except Exception as e:
-            print(f"[DEBUG][CoinGecko] API error for symbol: {symbol}, coin_id: {coin_id}, vs_currency: {vs_currency} | Error: {e}")
-            return None
+            print(f"[CoinGecko] API error for {', '.join(coin_ids)} ({vs}): {e}")
+            coin_ids = coin_ids[:start]
+        now = time.time()
+        with self._lock:
+            for coin_id in coin_ids:
+                prices = data.get(coin_id) or {}
+                price = prices.get(vs)
+                if price is None and vs == 'usdt':
+                    price = prices.get('usd')
+                # Unknown ids are cached as None too, so they are not re-requested every call
+                self.quotes[(coin_id, vs)] = (price, now)
 
     def clear_cache(self):
-        self.get_price.cache_clear()
+        with self._lock:
+            self.quotes.clear()
+
+_service = None
+_service_lock = threading.Lock()
+
+def get_service():
+    """The shared service for this process."""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = CoinGeckoPriceService()
+    return _service
+
+def get_price(symbol, vs_currency='usdt'):
+    return get_service().get_price(symbol, vs_currency)
+
+def get_prices(symbols, vs_currency='usdt'):
+    return get_service().get_prices(symbols, vs_currency)
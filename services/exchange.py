@@ -1,45 +1,165 @@
+"""
+One long-lived ccxt exchange session per process (get_session()).
+
+Building a ccxt exchange is not free: every new instance starts with an
+empty rate limiter, recalibrates the clock offset and downloads the market
+list again (a dozen requests on Bybit). The session creates the instance
+once and keeps it:
+
+- markets are loaded once, from a JSON cache on disk when it is younger
+  than EXCHANGE_MARKETS_TTL (default 6h), otherwise from the exchange
+  (then written back); refresh_markets() reloads them on demand.
+- ccxt's own throttle is per instance and not thread-safe, so requests go
+  through a RateLimiter shared by every thread instead, spaced by the
+  exchange's rateLimit.
+- fetch_tickers(symbols) prices a batch with one request.
+"""
+import json
+import os
+import threading
+import time
 import ccxt
 import config
 
-def get_exchange():
-    # --- DEBUG SPY REMOVED (We know keys are present) ---
+MARKETS_TTL = float(os.getenv("EXCHANGE_MARKETS_TTL", 6 * 3600))
 
-    try:
-        exchange_class = getattr(ccxt, config.EXCHANGE_ID)
+class RateLimiter:
+    """Spaces calls at least `interval` seconds apart across all threads."""
+    def __init__(self, interval):
+        self.interval = interval
+        self.next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+class ExchangeSession:
+    def __init__(self, exchange_id=None, api_key=None, secret=None, markets_file=None, markets_ttl=MARKETS_TTL):
+        self.exchange_id = exchange_id or config.EXCHANGE_ID
+        self.api_key = api_key if api_key is not None else config.API_KEY
+        self.secret = secret if secret is not None else config.API_SECRET
+        self.markets_file = markets_file or os.getenv(
+            "EXCHANGE_MARKETS_FILE", os.path.join(os.path.dirname(__file__), f"{self.exchange_id}_markets.json"))
+        self.markets_ttl = markets_ttl
+        self.markets_loaded_at = 0.0
+        self.limiter = None
+        self._exchange = None
+        self._lock = threading.Lock()
+
+    def _create(self):
+        exchange_class = getattr(ccxt, self.exchange_id)
         exchange = exchange_class({
-            'apiKey': config.API_KEY,
-            'secret': config.API_SECRET,
-            'enableRateLimit': True,
+            'apiKey': self.api_key,
+            'secret': self.secret,
+            # Throttled by the shared RateLimiter instead (see call())
+            'enableRateLimit': False,
             'options': {
-                'defaultType': 'swap', # Try 'spot' first, if fails we try 'swap'
+                'defaultType': 'spot',
                 'adjustForTimeDifference': True, # crucial for syncing timestamps
                 'recvWindow': 10000, # gives more time for request to process
             }
         })
-        
-        # FORCE V5 API (Crucial for new Bybit accounts)
-        if config.EXCHANGE_ID == 'bybit':
-            exchange.options['defaultType'] = 'spot' 
-            # Note: CCXT uses V5 by default now, but let's be sure
-        
+        if self.exchange_id == 'bybit':
+            # Only spot is traded: skip the derivatives/options market lists
+            exchange.options['fetchMarkets'] = {**exchange.options.get('fetchMarkets', {}), 'types': ['spot']}
+        self.limiter = RateLimiter(exchange.rateLimit / 1000)
         return exchange
+
+    @property
+    def exchange(self):
+        """The shared instance, with markets loaded (created on first use)."""
+        if self._exchange is None or time.time() - self.markets_loaded_at > self.markets_ttl:
+            with self._lock:
+                if self._exchange is None:
+                    exchange = self._create()
+                    self._load_markets(exchange)
+                    self._exchange = exchange
+                elif time.time() - self.markets_loaded_at > self.markets_ttl:
+                    self._load_markets(self._exchange, reload=True)
+        return self._exchange
+
+    def _load_markets(self, exchange, reload=False):
+        if not reload and self._load_cached_markets(exchange):
+            if exchange.options.get('adjustForTimeDifference'):
+                self.limiter.acquire()
+                exchange.load_time_difference()
+            return
+        self.limiter.acquire()
+        exchange.load_markets(reload=True)
+        self.markets_loaded_at = time.time()
+        try:
+            with open(self.markets_file, 'w') as f:
+                json.dump({'saved_at': self.markets_loaded_at, 'markets': exchange.markets,
+                           'currencies': exchange.currencies}, f)
+        except (OSError, TypeError) as e:
+            print(f"⚠️ Could not cache {self.exchange_id} markets: {e}")
+
+    def _load_cached_markets(self, exchange):
+        try:
+            with open(self.markets_file) as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if time.time() - cached.get('saved_at', 0) > self.markets_ttl:
+            return False
+        exchange.set_markets(cached['markets'], cached.get('currencies') or None)
+        self.markets_loaded_at = cached['saved_at']
+        return True
+
+    def refresh_markets(self):
+        """Reloads the market list from the exchange and rewrites the disk cache."""
+        exchange = self.exchange
+        with self._lock:
+            self._load_markets(exchange, reload=True)
+
+    def call(self, method, *args, **kwargs):
+        """Runs one exchange API method under the shared rate limit."""
+        exchange = self.exchange
+        self.limiter.acquire()
+        return getattr(exchange, method)(*args, **kwargs)
+
+    def fetch_tickers(self, symbols):
+        """{symbol: last price} for a batch of unified symbols ('BTC/USDT'), in one request."""
+        tickers = self.call('fetch_tickers', list(symbols))
+        return {symbol: ticker['last'] for symbol, ticker in tickers.items() if ticker.get('last') is not None}
+
+_session = None
+_session_lock = threading.Lock()
+
+def get_session():
+    """The shared session for this process."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = ExchangeSession()
+    return _session
+
+def get_exchange():
+    try:
+        return get_session().exchange
     except Exception as e:
         print(f"Error initializing exchange: {e}")
         return None
 
 def get_price(symbol):
-    exchange = get_exchange()
-    ticker = exchange.fetch_ticker(symbol)
+    ticker = get_session().call('fetch_ticker', symbol)
     return ticker['last']
 
+def fetch_tickers(symbols):
+    return get_session().fetch_tickers(symbols)
+
 def get_balance():
-    exchange = get_exchange()
     # This is the line that fails if keys are missing
-    balance = exchange.fetch_balance()
+    balance = get_session().call('fetch_balance')
     total = balance['total']
     return {k: v for k, v in total.items() if v > 0}
 
 def execute_trade(symbol, side, amount):
-    exchange = get_exchange()
-    order = exchange.create_order(symbol, 'market', side, amount)
-    return order
\ No newline at end of file
+    order = get_session().call('create_order', symbol, 'market', side, amount)
+    return order
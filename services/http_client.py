@@ -0,0 +1,173 @@
+"""
+Shared outbound HTTP layer for the API clients (Bybit, vtu.ng, ...).
+
+A bare requests.get/post opens a new TCP+TLS connection every time. Here
+each host gets one long-lived requests.Session whose connection pool keeps
+up to `pool_size` keep-alive connections, so consecutive calls skip the
+handshake. Pool size and timeouts default to HTTP_POOL_SIZE /
+HTTP_CONNECT_TIMEOUT / HTTP_READ_TIMEOUT and can be set per host with
+configure().
+
+Idempotent calls (GET/HEAD/OPTIONS/PUT/DELETE, or idempotent=True for a
+read that happens to be a POST) are retried on connection errors,
+timeouts and 429/502/503/504, with jittered exponential backoff. Other
+POSTs are sent exactly once: a retried purchase could be charged twice.
+
+stats() reports per host: requests, errors, retries, connections opened
+and latency p50/p99.
+"""
+import os
+import random
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+
+RequestException = requests.exceptions.RequestException
+
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 10))
+TIMEOUT = (float(os.getenv("HTTP_CONNECT_TIMEOUT", 5)), float(os.getenv("HTTP_READ_TIMEOUT", 20)))
+RETRIES = int(os.getenv("HTTP_RETRIES", 2))
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'}
+RETRY_STATUSES = {429, 502, 503, 504}
+
+class HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=10000)
+
+class HttpClient:
+    def __init__(self, pool_size=None, timeout=None, retries=None, backoff=0.3):
+        self.pool_size = pool_size or POOL_SIZE
+        self.timeout = timeout or TIMEOUT
+        self.retries = RETRIES if retries is None else retries
+        self.backoff = backoff
+        self.hosts = {}    # host -> {'pool_size': n, 'timeout': t}
+        self.sessions = {} # scheme://host -> (Session, HTTPAdapter)
+        self.counters = {} # host -> HostStats
+        self._lock = threading.Lock()
+
+    def configure(self, host, pool_size=None, timeout=None):
+        """Per-host pool size / timeout; applies to sessions created afterwards."""
+        self.hosts[host] = {'pool_size': pool_size, 'timeout': timeout}
+
+    def session_for(self, url):
+        parts = urlsplit(url)
+        key = f"{parts.scheme}://{parts.netloc}"
+        entry = self.sessions.get(key)
+        if entry is None:
+            with self._lock:
+                entry = self.sessions.get(key)
+                if entry is None:
+                    settings = self.hosts.get(parts.netloc, {})
+                    size = settings.get('pool_size') or self.pool_size
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size, max_retries=0)
+                    session = requests.Session()
+                    session.mount(f"{parts.scheme}://", adapter)
+                    entry = self.sessions[key] = (session, adapter)
+                    self.counters.setdefault(parts.netloc, HostStats())
+        return entry[0]
+
+    def _sleep(self, attempt, response=None):
+        retry_after = response is not None and response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            delay = float(retry_after)
+        else:
+            delay = self.backoff * 2 ** attempt * random.uniform(0.5, 1.0)
+        time.sleep(delay)
+
+    def request(self, method, url, idempotent=None, retries=None, **kwargs):
+        """
+        Sends one request through the host's pooled session. Returns the
+        response (status not checked) or raises RequestException.
+        """
+        method = method.upper()
+        session = self.session_for(url)
+        host = urlsplit(url).netloc
+        counters = self.counters[host]
+        kwargs.setdefault('timeout', self.hosts.get(host, {}).get('timeout') or self.timeout)
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        attempts = 1 + ((self.retries if retries is None else retries) if idempotent else 0)
+        for attempt in range(attempts):
+            counters.requests += 1
+            started = time.monotonic()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                counters.errors += 1
+                if attempt == attempts - 1:
+                    raise
+                counters.retries += 1
+                self._sleep(attempt)
+                continue
+            counters.latencies.append(time.monotonic() - started)
+            if response.status_code >= 500 or response.status_code == 429:
+                counters.errors += 1
+                if response.status_code in RETRY_STATUSES and attempt < attempts - 1:
+                    counters.retries += 1
+                    response.close()
+                    self._sleep(attempt, response)
+                    continue
+            return response
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """{host: {...}} counters since start."""
+        pct = lambda values, q: values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+        report = {}
+        for key, (_, adapter) in list(self.sessions.items()):
+            host = urlsplit(key).netloc
+            counters = self.counters[host]
+            latencies = sorted(counters.latencies)
+            pools = adapter.poolmanager.pools
+            connections = sum(pools[pool_key].num_connections for pool_key in list(pools.keys()))
+            report[host] = {
+                'requests': counters.requests,
+                'errors': counters.errors,
+                'retries': counters.retries,
+                'connections': connections,
+                'p50': pct(latencies, 0.5),
+                'p99': pct(latencies, 0.99),
+            }
+        return report
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The shared client for this process."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = HttpClient()
+    return _client
+
+def _forget_client():
+    # A forked worker must not share pooled sockets with its parent
+    global _client
+    _client = None
+
+os.register_at_fork(after_in_child=_forget_client)
+
+def request(method, url, **kwargs):
+    return get_client().request(method, url, **kwargs)
+
+def get(url, **kwargs):
+    return get_client().get(url, **kwargs)
+
+def post(url, **kwargs):
+    return get_client().post(url, **kwargs)
+
+def stats():
+    return get_client().stats()
@@ -0,0 +1,281 @@
+"""
+Durable outbox for outbound WhatsApp messages.
+
+enqueue() stores the message (OutboxMessage) and returns at once, so a
+webhook or the monitor never waits on Twilio. Inside a caller's database
+transaction the message commits, or rolls back, with it.
+
+OutboxWorker (run by outbox_worker.py) claims due messages with a
+conditional UPDATE (two workers never take the same one), transactional
+before bulk (broadcasts), oldest first, and sends them on `workers`
+threads. All threads share one token bucket, so the process never sends
+faster than TWILIO_MPS messages per second: run a single outbox worker,
+or give each its share of the rate. Transient failures (network errors,
+HTTP 429/5xx) are retried with backoff up to OUTBOX_MAX_ATTEMPTS; after
+that, or on an error Twilio will not change its mind about (invalid
+number, unsubscribed...), the message is dead-lettered with the error.
+A message left 'sending' by a worker that died is sent again, so
+delivery is at-least-once.
+
+counts() / dead_letters() / retry() back the admin `outbox` view.
+"""
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from peewee import fn
+from database import db, retry_if_busy, OutboxMessage
+
+WORKERS = int(os.getenv("OUTBOX_WORKERS", 8))
+RATE = float(os.getenv("TWILIO_MPS", 10)) # messages/s across all workers
+BURST = int(os.getenv("OUTBOX_BURST", 1))
+MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 5))
+RETRY_DELAY = float(os.getenv("OUTBOX_RETRY_DELAY", 2)) # first retry; doubles per attempt
+RETRY_MAX_DELAY = 600
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 0.2))
+STUCK_AFTER = float(os.getenv("OUTBOX_STUCK_AFTER", 120)) # 'sending' this long: the worker died
+
+TRANSACTIONAL = 0
+BULK = 1
+CHUNK = 500 # rows per multi-row INSERT
+
+# --- ENQUEUE ---
+
+def _row(phone, body, media_url, priority):
+    if media_url and isinstance(media_url, str):
+        media_url = [media_url]
+    return {'to': phone.replace('whatsapp:', ''), 'body': body,
+            'media_url': json.dumps(media_url) if media_url else None, 'priority': priority}
+
+@retry_if_busy
+def enqueue(phone, body, media_url=None, priority=TRANSACTIONAL):
+    """Queues one message; returns its id."""
+    return OutboxMessage.insert(_row(phone, body, media_url, priority)).execute()
+
+@retry_if_busy
+def enqueue_many(messages, priority=TRANSACTIONAL):
+    """Queues [(phone, body), ...] with multi-row INSERTs; returns how many."""
+    rows = [_row(phone, body, None, priority) for phone, body in messages]
+    with db.atomic():
+        for start in range(0, len(rows), CHUNK):
+            OutboxMessage.insert_many(rows[start:start + CHUNK]).execute()
+    return len(rows)
+
+# --- TWILIO ---
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """The process's Twilio client (one keep-alive session)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from twilio.rest import Client
+                _client = Client(os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+    return _client
+
+def _forget_client():
+    global _client
+    _client = None
+
+# A forked worker must not share the parent's sockets
+os.register_at_fork(after_in_child=_forget_client)
+
+def sender():
+    """TWILIO_PHONE with the 'whatsapp:' prefix, or None if not configured."""
+    phone = os.getenv("TWILIO_PHONE")
+    if not phone:
+        return None
+    return phone if phone.startswith('whatsapp:') else f"whatsapp:{phone}"
+
+def twilio_send(phone, body, media_url=None):
+    """Sends one WhatsApp message; returns the message SID. Raises on failure."""
+    from_ = sender()
+    if not from_:
+        raise RuntimeError("TWILIO_PHONE not configured")
+    kwargs = {'from_': from_, 'body': body, 'to': f"whatsapp:{phone}"}
+    if media_url:
+        kwargs['media_url'] = media_url
+    return get_client().messages.create(**kwargs).sid
+
+def is_transient(error):
+    """Network errors and HTTP 429/5xx: worth sending again later."""
+    status = getattr(error, 'status', None)
+    if status is None:
+        return not isinstance(error, (RuntimeError, ValueError, TypeError))
+    return status == 429 or status >= 500
+
+# --- WORKER ---
+
+class RateLimiter:
+    """Token bucket shared by the worker threads."""
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.capacity = float(burst or 1)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class OutboxWorker:
+    def __init__(self, workers=None, rate=None, burst=None, max_attempts=None, retry_delay=None, poll_interval=None,
+                 stuck_after=None, send=twilio_send):
+        self.workers = workers or WORKERS
+        self.limiter = RateLimiter(rate or RATE, burst or BURST)
+        self.max_attempts = max_attempts or MAX_ATTEMPTS
+        self.retry_delay = RETRY_DELAY if retry_delay is None else retry_delay
+        self.poll_interval = POLL_INTERVAL if poll_interval is None else poll_interval
+        self.stuck_after = STUCK_AFTER if stuck_after is None else stuck_after
+        self.send = send
+        self.inflight = 0
+        self.results = {'sent': 0, 'retried': 0, 'dead': 0}
+        self.latencies = deque(maxlen=10000) # queued -> sent
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="outbox")
+
+    def claim(self, count):
+        """Takes up to `count` due messages, transactional first, oldest first."""
+        due = (OutboxMessage.select(OutboxMessage.id)
+               .where(OutboxMessage.status == 'queued', OutboxMessage.next_attempt_at <= time.time())
+               .order_by(OutboxMessage.priority, OutboxMessage.id).limit(count))
+        return list(OutboxMessage
+                    .update(status='sending', claimed_at=time.time())
+                    .where(OutboxMessage.id.in_(due) & (OutboxMessage.status == 'queued'))
+                    .returning(OutboxMessage)
+                    .execute())
+
+    def recover(self):
+        """Puts messages left 'sending' by a dead worker back in the queue; returns how many."""
+        return (OutboxMessage.update(status='queued', claimed_at=None)
+                .where(OutboxMessage.status == 'sending', OutboxMessage.claimed_at < time.time() - self.stuck_after)
+                .execute())
+
+    def poll(self):
+        """Claims and starts as many messages as there are free workers; returns how many."""
+        with self._lock:
+            free = self.workers * 2 - self.inflight # a second round waits on the limiter, not on the poll
+        if free <= 0:
+            return 0
+        messages = self.claim(free)
+        with self._lock:
+            self.inflight += len(messages)
+        for message in messages:
+            self._executor.submit(self._deliver, message)
+        return len(messages)
+
+    def _deliver(self, message):
+        try:
+            self.limiter.acquire()
+            try:
+                sid = self.send(message.to, message.body, json.loads(message.media_url) if message.media_url else None)
+                error = None
+            except Exception as e:
+                sid, error = None, e
+            with db.connection_context():
+                self._record(message, sid, error)
+        except Exception as e:
+            print(f"❌ [Outbox] Message {message.id} could not be recorded: {e}")
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+    def _record(self, message, sid, error):
+        attempts = message.attempts + 1
+        if error is None:
+            outcome, fields = 'sent', {'sid': sid, 'error': None, 'sent_at': datetime.datetime.now()}
+            self.latencies.append(time.time() - message.created_at.timestamp())
+        elif is_transient(error) and attempts < self.max_attempts:
+            delay = min(RETRY_MAX_DELAY, self.retry_delay * 2 ** (attempts - 1)) * random.uniform(0.5, 1.5)
+            outcome, fields = 'queued', {'next_attempt_at': time.time() + delay, 'error': str(error)[:255]}
+        else:
+            outcome, fields = 'dead', {'error': str(error)[:255]}
+            print(f"☠️ [Outbox] Dead letter {message.id} to {message.to}: {error}")
+        (OutboxMessage.update(status=outcome, attempts=attempts, claimed_at=None, **fields)
+         .where(OutboxMessage.id == message.id, OutboxMessage.status == 'sending').execute())
+        outcome = 'retried' if outcome == 'queued' else outcome
+        with self._lock:
+            self.results[outcome] += 1
+
+    def run(self, stop_event):
+        last_recover = 0
+        while not stop_event.is_set():
+            try:
+                with db.connection_context():
+                    if time.monotonic() - last_recover > self.stuck_after / 4:
+                        self.recover()
+                        last_recover = time.monotonic()
+                    started = self.poll()
+            except Exception as e:
+                print(f"⚠️ [Outbox] Poll failed: {e}")
+                started = 0
+            if not started:
+                stop_event.wait(self.poll_interval)
+
+    def drain(self):
+        """Waits for the messages already claimed."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        pct = lambda values, q: values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+        with self._lock:
+            return {**self.results, 'inflight': self.inflight, 'p50': pct(latencies, 0.5), 'p99': pct(latencies, 0.99)}
+
+# --- STATUS ---
+
+def counts():
+    """{status: messages} across the outbox."""
+    return dict(OutboxMessage.select(OutboxMessage.status, fn.COUNT(OutboxMessage.id))
+                .group_by(OutboxMessage.status).tuples())
+
+def oldest_queued():
+    """Seconds the oldest due queued message has waited (0 if none)."""
+    row = (OutboxMessage.select(OutboxMessage.created_at)
+           .where(OutboxMessage.status == 'queued', OutboxMessage.next_attempt_at <= time.time())
+           .order_by(OutboxMessage.id).tuples().first())
+    return (datetime.datetime.now() - row[0]).total_seconds() if row else 0.0
+
+def dead_letters(limit=10):
+    return list(OutboxMessage.select().where(OutboxMessage.status == 'dead').order_by(OutboxMessage.id.desc()).limit(limit))
+
+def retry(message_id=None):
+    """Queues dead letters again (one, or all); returns how many."""
+    query = OutboxMessage.update(status='queued', attempts=0, next_attempt_at=0).where(OutboxMessage.status == 'dead')
+    if message_id is not None:
+        query = query.where(OutboxMessage.id == message_id)
+    return query.execute()
+
+def format_status(limit=5):
+    """Admin view: queue by status, oldest wait, latest dead letters."""
+    by_status = counts()
+    lines = [
+        "📤 *OUTBOX*",
+        "━━━━━━━━━━━━━━━━",
+        " | ".join(f"{status}: {by_status.get(status, 0):,}" for status in ('queued', 'sending', 'sent', 'dead')),
+        f"Oldest waiting: {oldest_queued():.0f}s",
+    ]
+    dead = dead_letters(limit)
+    if dead:
+        lines.append("\n*Dead letters*")
+        for message in dead:
+            lines.append(f"#{message.id} {message.to} ({message.attempts} tries): {message.error}")
+        lines.append("\nRequeue: outbox retry [ID|all]")
+    return "\n".join(lines)
@@ -1,37 +1,99 @@
+"""
+Background CoinGecko price cache for a fixed list of symbols.
+
+A daemon thread refreshes every symbol with one batched request (see
+CoinGeckoPriceService.get_prices), entirely outside any lock, then
+publishes a new immutable snapshot by swapping a single reference.
+Readers only ever read that reference, so get()/get_many() never wait for
+a refresh, however slow CoinGecko is.
+
+Each entry keeps the time its price was last refreshed: a symbol missing
+from one response keeps its previous price and ages, and get(max_age=...)
+refuses prices older than the caller accepts. Refreshes run every
+refresh_interval seconds +/- `jitter` (a fraction), so several processes
+started together do not hit CoinGecko in lockstep.
+"""
+import random
 import threading
 import time
-from services.coingecko_price import CoinGeckoPriceService
+from collections import namedtuple
+from types import MappingProxyType
+from services import coingecko_price
+
+CachedPrice = namedtuple('CachedPrice', 'price updated_at')
 
 class PriceCache:
-    def __init__(self, symbols, vs_currency='usdt', refresh_interval=60):
-        self.symbols = symbols
+    def __init__(self, symbols, vs_currency='usdt', refresh_interval=60, jitter=0.1, service=None, start=True):
+        self.symbols = list(symbols)
         self.vs_currency = vs_currency
         self.refresh_interval = refresh_interval
-        self.cache = {}
+        self.jitter = jitter
+        self.service = service or coingecko_price.get_service()
+        self.snapshot = MappingProxyType({}) # symbol (lower case) -> CachedPrice; replaced, never mutated
         self.last_update = 0
-        self.lock = threading.Lock()
+        self.refreshes = 0
+        self.failures = 0
         self._stop_event = threading.Event()
         self.thread = threading.Thread(target=self._update_loop, daemon=True)
-        self.thread.start()
+        if start:
+            self.thread.start()
+
+    def refresh(self):
+        """Fetches every symbol in one request and publishes the new snapshot."""
+        try:
+            prices = self.service.get_prices(self.symbols, self.vs_currency, max_age=0)
+        except Exception as e:
+            self.failures += 1
+            print(f"[PriceCache] Refresh failed: {e}")
+            return False
+        now = time.time()
+        snapshot = dict(self.snapshot)
+        for symbol, price in prices.items():
+            if price:
+                snapshot[symbol.lower()] = CachedPrice(price, now)
+        # The only write readers can observe: one reference assignment
+        self.snapshot = MappingProxyType(snapshot)
+        self.last_update = now
+        self.refreshes += 1
+        missing = len(self.symbols) - len(prices)
+        if missing:
+            print(f"[PriceCache] {missing} symbol(s) missing from refresh; keeping their last price")
+        return True
 
     def _update_loop(self):
-        cg_service = CoinGeckoPriceService()
         while not self._stop_event.is_set():
-            with self.lock:
-                for symbol in self.symbols:
-                    try:
-                        price = cg_service.get_price(symbol, self.vs_currency)
-                        if price:
-                            self.cache[symbol.lower()] = price
-                    except Exception as e:
-                        print(f"[PriceCache] Error updating {symbol}: {e}")
-                self.last_update = time.time()
-            time.sleep(self.refresh_interval)
-
-    def get(self, symbol):
-        with self.lock:
-            return self.cache.get(symbol.lower())
+            self.refresh()
+            delay = self.refresh_interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self._stop_event.wait(delay)
+
+    def get(self, symbol, max_age=None):
+        """Last price for `symbol`, or None if unknown or older than max_age seconds."""
+        entry = self.snapshot.get(symbol.lower())
+        if entry is None or (max_age is not None and time.time() - entry.updated_at > max_age):
+            return None
+        return entry.price
+
+    def get_many(self, symbols, max_age=None):
+        """{symbol: price} for the listed symbols that have a fresh enough price, from one snapshot."""
+        snapshot, now = self.snapshot, time.time()
+        found = {}
+        for symbol in symbols:
+            entry = snapshot.get(symbol.lower())
+            if entry is not None and (max_age is None or now - entry.updated_at <= max_age):
+                found[symbol] = entry.price
+        return found
+
+    def age(self, symbol):
+        """Seconds since `symbol` was last refreshed, or None if it never was."""
+        entry = self.snapshot.get(symbol.lower())
+        return None if entry is None else time.time() - entry.updated_at
+
+    def stale(self, max_age):
+        """Symbols with no price refreshed in the last max_age seconds."""
+        snapshot, now = self.snapshot, time.time()
+        return [s for s in self.symbols if s.lower() not in snapshot or now - snapshot[s.lower()].updated_at > max_age]
 
     def stop(self):
         self._stop_event.set()
-        self.thread.join()
+        if self.thread.is_alive():
+            self.thread.join()
@@ -0,0 +1,189 @@
+"""
+Process-wide spot price engine.
+
+One bulk Bybit V5 request (GET /v5/market/tickers?category=spot) returns
+every spot ticker, so each refresh costs one HTTP round trip no matter how
+many symbols market, swap, alerts, fiat and monitor ask for. The result is
+held as an immutable snapshot {symbol: Quote}, swapped in whole, so
+readers never lock and never see a half-applied refresh.
+
+A background thread (started lazily, so each gunicorn worker gets its own
+after fork) refreshes every PRICE_REFRESH_INTERVAL seconds. Reads are
+served from memory while the snapshot is younger than PRICE_MAX_AGE; only
+a stale snapshot triggers a synchronous refresh, and concurrent callers
+share that single request. Quotes older than the bound are never served.
+"""
+import os
+import threading
+import time
+from collections import namedtuple
+from services import http_client
+
+TICKERS_URL = "https://api.bybit.com/v5/market/tickers"
+QUOTE_ASSET = "USDT"
+STABLES = {'USDT': 1.0, 'USDC': 1.0}
+
+Quote = namedtuple('Quote', 'symbol price change_24h high_24h low_24h updated_at')
+
+def normalize(symbol):
+    """'btc', 'BTC/USDT', 'BTCUSDT' -> 'BTCUSDT'."""
+    clean = symbol.strip().upper().replace('/', '').replace('-', '')
+    if clean in STABLES:
+        return clean
+    return clean if clean.endswith(QUOTE_ASSET) else clean + QUOTE_ASSET
+
+class PriceEngine:
+    def __init__(self, refresh_interval=None, max_age=None, timeout=5, session=None, url=TICKERS_URL):
+        self.url = url
+        self.refresh_interval = refresh_interval or float(os.getenv("PRICE_REFRESH_INTERVAL", 5))
+        self.max_age = max_age or float(os.getenv("PRICE_MAX_AGE", 30))
+        self.timeout = timeout
+        self.http = session or http_client.get_client()
+        self.snapshot = {}
+        self.last_refresh = 0.0
+        self.last_attempt = 0.0
+        self.last_error = None
+        self.refresh_count = 0
+        self._refresh_lock = threading.Lock()
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    # --- FETCH ---
+
+    def _fetch(self):
+        response = self.http.get(self.url, params={'category': 'spot'}, timeout=self.timeout)
+        data = response.json()
+        if data.get('retCode') != 0:
+            raise RuntimeError(f"Bybit tickers error: {data.get('retMsg')}")
+        now = time.time()
+        snapshot = {}
+        for item in data['result']['list']:
+            try:
+                snapshot[item['symbol']] = Quote(
+                    item['symbol'], float(item['lastPrice']), float(item.get('price24hPcnt') or 0),
+                    float(item.get('highPrice24h') or 0), float(item.get('lowPrice24h') or 0), now)
+            except (KeyError, ValueError):
+                continue
+        return snapshot
+
+    def refresh(self):
+        """One bulk request; replaces the snapshot. Returns False on failure (old snapshot kept)."""
+        started = time.time()
+        with self._refresh_lock:
+            # Another caller tried while we waited for the lock: share its outcome
+            if self.last_attempt >= started:
+                return self.last_error is None
+            try:
+                snapshot = self._fetch()
+            except Exception as e:
+                self.last_attempt = time.time()
+                self.last_error = str(e)
+                print(f"⚠️ Price Engine Refresh Error: {e}")
+                return False
+            self.snapshot = snapshot
+            self.last_refresh = self.last_attempt = time.time()
+            self.last_error = None
+            self.refresh_count += 1
+            return True
+
+    def update(self, quotes):
+        """Merges individually-timestamped quotes (e.g. from a stream) into a new snapshot."""
+        snapshot = dict(self.snapshot)
+        for quote in quotes:
+            snapshot[quote.symbol] = quote
+        self.snapshot = snapshot
+
+    # --- BACKGROUND REFRESH ---
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._refresh_loop, daemon=True, name="price-engine")
+            self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            self.refresh()
+            self._stop_event.wait(self.refresh_interval)
+
+    # --- READS ---
+
+    def _ensure_fresh(self, max_age):
+        # Common case never refreshes here: the background thread keeps it fresh
+        self.start()
+        if time.time() - self.last_refresh > max_age:
+            self.refresh()
+
+    def _lookup(self, symbol, max_age):
+        symbol = normalize(symbol)
+        if symbol in STABLES:
+            return Quote(symbol, STABLES[symbol], 0.0, STABLES[symbol], STABLES[symbol], time.time())
+        quote = self.snapshot.get(symbol)
+        # A failed refresh keeps old quotes around; never serve them past max_age
+        if quote is None or time.time() - quote.updated_at > max_age:
+            return None
+        return quote
+
+    def quote(self, symbol, max_age=None):
+        """Quote for `symbol` no older than max_age, or None (unlisted or feed down)."""
+        max_age = self.max_age if max_age is None else max_age
+        self._ensure_fresh(max_age)
+        return self._lookup(symbol, max_age)
+
+    def price(self, symbol, max_age=None):
+        quote = self.quote(symbol, max_age)
+        return quote.price if quote else None
+
+    def quotes(self, symbols, max_age=None):
+        """{symbol: Quote} for every listed symbol, from one snapshot."""
+        max_age = self.max_age if max_age is None else max_age
+        self._ensure_fresh(max_age)
+        quotes = (self._lookup(symbol, max_age) for symbol in symbols)
+        return {quote.symbol: quote for quote in quotes if quote}
+
+    def prices(self, symbols, max_age=None):
+        """{symbol: price} for every listed symbol, from one snapshot."""
+        return {symbol: quote.price for symbol, quote in self.quotes(symbols, max_age).items()}
+
+    def tickers(self, max_age=None):
+        """The whole snapshot (all spot pairs), refreshed first if stale."""
+        self._ensure_fresh(self.max_age if max_age is None else max_age)
+        return self.snapshot
+
+    def age(self, symbol):
+        quote = self.snapshot.get(normalize(symbol))
+        return time.time() - quote.updated_at if quote else None
+
+    def stats(self):
+        return {
+            'symbols': len(self.snapshot),
+            'last_refresh_age': time.time() - self.last_refresh if self.last_refresh else None,
+            'refreshes': self.refresh_count,
+            'last_error': self.last_error,
+        }
+
+_engine = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """The shared engine for this process."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = PriceEngine()
+    return _engine
+
+def get_price(symbol, max_age=None):
+    return get_engine().price(symbol, max_age)
+
+def get_prices(symbols, max_age=None):
+    return get_engine().prices(symbols, max_age)
+
+def get_quotes(symbols, max_age=None):
+    return get_engine().quotes(symbols, max_age)
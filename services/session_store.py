@@ -0,0 +1,153 @@
+"""
+Session storage backends for state_manager.
+
+Every backend keeps one record per sender: (flow_type, data). Select one
+with SESSION_BACKEND:
+- memory: per-process OrderedDict (single worker / local dev)
+- sqlite: ChatSession table in the shared ledger database (WAL)
+- redis:  any Redis-protocol server at REDIS_URL
+
+The sqlite and redis backends are shared by every gunicorn worker, so a
+user's next message can land on any worker without losing its step.
+"""
+import json
+import os
+import time
+import threading
+from collections import OrderedDict
+
+def _dumps(value):
+    # Compact JSON: no whitespace, non-ASCII kept as-is
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+class MemorySessionStore:
+    """In-process store. Idle records are swept from the stale end on write."""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._records = OrderedDict()  # user_phone -> [flow_type, data, last_seen]
+        self._lock = threading.Lock()
+
+    def get(self, user_phone):
+        with self._lock:
+            record = self._records.get(user_phone)
+            if record is None:
+                return None
+            if time.monotonic() - record[2] > self.ttl:
+                del self._records[user_phone]
+                return None
+            return record[0], record[1]
+
+    def set(self, user_phone, flow_type, data):
+        with self._lock:
+            self._records[user_phone] = [flow_type, data, time.monotonic()]
+            self._records.move_to_end(user_phone)
+            self._evict_idle()
+
+    def delete(self, user_phone, flow_type=None):
+        with self._lock:
+            record = self._records.get(user_phone)
+            if record is not None and (flow_type is None or record[0] == flow_type):
+                del self._records[user_phone]
+
+    def _evict_idle(self):
+        """Amortised O(1): records are ordered by last write."""
+        cutoff = time.monotonic() - self.ttl
+        while self._records:
+            oldest = next(iter(self._records.values()))
+            if oldest[2] > cutoff:
+                break
+            self._records.popitem(last=False)
+
+class SQLiteSessionStore:
+    """
+    Stores sessions in the ChatSession table of the ledger database.
+    Expired rows are ignored on read and deleted in one batch statement
+    at most every `purge_interval` seconds.
+    """
+
+    def __init__(self, ttl, purge_interval=60):
+        from database import ChatSession
+        self.model = ChatSession
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0
+        ChatSession.create_table(safe=True)
+
+    def get(self, user_phone):
+        row = (self.model
+               .select(self.model.flow, self.model.payload)
+               .where((self.model.phone == user_phone) & (self.model.expires_at > int(time.time())))
+               .tuples()
+               .first())
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def set(self, user_phone, flow_type, data):
+        now = int(time.time())
+        payload = _dumps(data)
+        expires_at = now + self.ttl
+        (self.model
+         .insert(phone=user_phone, flow=flow_type, payload=payload, expires_at=expires_at)
+         .on_conflict(conflict_target=[self.model.phone],
+                      update={self.model.flow: flow_type,
+                              self.model.payload: payload,
+                              self.model.expires_at: expires_at})
+         .execute())
+        if now >= self._next_purge:
+            self.purge_expired(now)
+
+    def delete(self, user_phone, flow_type=None):
+        query = self.model.delete().where(self.model.phone == user_phone)
+        if flow_type is not None:
+            query = query.where(self.model.flow == flow_type)
+        query.execute()
+
+    def purge_expired(self, now=None):
+        now = now or int(time.time())
+        self._next_purge = now + self.purge_interval
+        return self.model.delete().where(self.model.expires_at <= now).execute()
+
+class RedisSessionStore:
+    """
+    Stores each session as one compact JSON string with a native TTL, so
+    expiry is handled by the server's own batched expire cycle.
+    """
+
+    def __init__(self, ttl, url=None, prefix="ppay:session:"):
+        import redis
+        # RESP2 keeps us compatible with any Redis-protocol server
+        self.client = redis.Redis.from_url(url or os.getenv("REDIS_URL", "redis://localhost:6379/0"), protocol=2)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, user_phone):
+        raw = self.client.get(self.prefix + user_phone)
+        if raw is None:
+            return None
+        flow_type, data = json.loads(raw)
+        return flow_type, data
+
+    def set(self, user_phone, flow_type, data):
+        self.client.set(self.prefix + user_phone, _dumps([flow_type, data]), ex=self.ttl)
+
+    def delete(self, user_phone, flow_type=None):
+        if flow_type is not None:
+            record = self.get(user_phone)
+            if record is None or record[0] != flow_type:
+                return
+        self.client.delete(self.prefix + user_phone)
+
+BACKENDS = {
+    'memory': MemorySessionStore,
+    'sqlite': SQLiteSessionStore,
+    'redis': RedisSessionStore,
+}
+
+def create_store(backend, ttl):
+    try:
+        store_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Unknown SESSION_BACKEND '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    return store_class(ttl)
@@ -0,0 +1,120 @@
+"""
+Bybit public spot ticker stream (wss://stream.bybit.com/v5/public/spot).
+
+An asyncio task (`await stream.run(ticks)`) subscribes to tickers.<SYMBOL>
+for exactly the symbols handed to set_symbols() and puts every update on
+the `ticks` queue as a Quote, the moment it arrives. The monitor calls
+set_symbols() with the symbols of the active alerts; the difference is
+applied to the live connection (subscribe/unsubscribe) within a second,
+without reconnecting.
+
+Dropped connections are retried with exponential backoff (1s doubling up
+to max_backoff, with jitter) and every wanted symbol is resubscribed on
+the new connection. Quotes are also pushed into the shared price engine
+so the rest of the process sees streamed prices.
+"""
+import asyncio
+import json
+import random
+import time
+from websockets.asyncio.client import connect
+from websockets.exceptions import ConnectionClosed
+from services.price_engine import Quote, STABLES, normalize
+
+STREAM_URL = "wss://stream.bybit.com/v5/public/spot"
+ARGS_PER_REQUEST = 10 # Bybit spot limit per subscribe message
+
+class TickerStream:
+    def __init__(self, url=STREAM_URL, ping_interval=20, max_backoff=30, engine=None):
+        self.url = url
+        self.ping_interval = ping_interval
+        self.max_backoff = max_backoff
+        self.engine = engine
+        self.wanted = frozenset()
+        self.subscribed = set()
+        self.live = False
+        self.reconnects = 0
+        self.ticks = 0
+        self.last_tick_at = 0.0
+
+    def set_symbols(self, symbols):
+        """Symbols to stream; applied to the live connection on the next loop."""
+        self.wanted = frozenset(normalize(s) for s in symbols if normalize(s) not in STABLES)
+
+    def is_live(self):
+        return self.live
+
+    # --- CONNECTION ---
+
+    async def run(self, ticks):
+        """Streams quotes onto `ticks` (an asyncio.Queue) until cancelled."""
+        backoff = 1
+        while True:
+            try:
+                async with connect(self.url, open_timeout=10, ping_interval=None) as ws:
+                    self.live = True
+                    print(f"📡 Ticker stream connected ({len(self.wanted)} symbols)")
+                    # Only a connection that delivered data resets the backoff
+                    if await self._session(ws, ticks):
+                        backoff = 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Ticker Stream Error: {e}")
+            finally:
+                self.live = False
+                self.subscribed = set()
+            self.reconnects += 1
+            delay = backoff * random.uniform(0.5, 1.0)
+            print(f"🔌 Ticker stream down, reconnecting in {delay:.1f}s")
+            await asyncio.sleep(delay)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    async def _session(self, ws, ticks):
+        """Streams until the connection closes; returns whether it delivered any data."""
+        received = False
+        next_ping = time.monotonic() + self.ping_interval
+        try:
+            while True:
+                await self._sync_subscriptions(ws)
+                try:
+                    raw = await asyncio.wait_for(ws.recv(), max(0.0, min(1.0, next_ping - time.monotonic())))
+                except asyncio.TimeoutError: # not the builtin TimeoutError before 3.11
+                    raw = None
+                if time.monotonic() >= next_ping:
+                    await ws.send(json.dumps({'op': 'ping'}))
+                    next_ping = time.monotonic() + self.ping_interval
+                if raw is not None:
+                    received = True
+                    quote = self._parse(raw)
+                    if quote is not None:
+                        await ticks.put(quote)
+        except ConnectionClosed as e:
+            print(f"⚠️ Ticker stream closed: {e}")
+            return received
+
+    async def _sync_subscriptions(self, ws):
+        wanted = self.wanted
+        for op, symbols in (('unsubscribe', self.subscribed - wanted), ('subscribe', wanted - self.subscribed)):
+            topics = sorted(f"tickers.{s}" for s in symbols)
+            for start in range(0, len(topics), ARGS_PER_REQUEST):
+                await ws.send(json.dumps({'op': op, 'args': topics[start:start + ARGS_PER_REQUEST]}))
+        self.subscribed = set(wanted)
+
+    def _parse(self, raw):
+        message = json.loads(raw)
+        if not message.get('topic', '').startswith('tickers.'):
+            if message.get('success') is False:
+                print(f"⚠️ Ticker Stream Rejected: {message.get('ret_msg')}")
+            return None
+        data = message['data']
+        try:
+            quote = Quote(data['symbol'], float(data['lastPrice']), float(data.get('price24hPcnt') or 0),
+                          float(data.get('highPrice24h') or 0), float(data.get('lowPrice24h') or 0), time.time())
+        except (KeyError, ValueError):
+            return None
+        self.ticks += 1
+        self.last_tick_at = quote.updated_at
+        if self.engine is not None:
+            self.engine.update([quote])
+        return quote
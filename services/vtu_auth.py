@@ -0,0 +1,126 @@
+"""
+vtu.ng JWT cache shared by every thread and gunicorn worker on the host.
+
+The token and its expiry (the JWT's `exp` claim) live in a small JSON file
+(VTU_TOKEN_FILE). A purchase reads it instead of authenticating first; a
+token within REFRESH_MARGIN of expiry is renewed ahead of time.
+
+Renewals are serialized: an in-process lock plus an flock on the file's
+.lock companion, re-reading the file once the lock is held, so a burst of
+purchases across workers costs one /jwt-auth/v1/token call. While a
+renewal is in flight, callers holding a still-valid token keep using it
+instead of waiting. invalidate() drops a token the API rejected.
+"""
+import base64
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+
+TOKEN_FILE = os.getenv("VTU_TOKEN_FILE", os.path.join(tempfile.gettempdir(), "ppay_vtu_token.json"))
+REFRESH_MARGIN = float(os.getenv("VTU_TOKEN_REFRESH_MARGIN", 600))
+# Used when a token carries no readable `exp`
+DEFAULT_TTL = float(os.getenv("VTU_TOKEN_TTL", 3600))
+
+def token_expiry(token):
+    """Expiry (unix time) from the JWT payload, or None if it cannot be read."""
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        return float(json.loads(base64.urlsafe_b64decode(payload))['exp'])
+    except (IndexError, ValueError, KeyError, TypeError):
+        return None
+
+class TokenManager:
+    def __init__(self, username, fetch, path=TOKEN_FILE, margin=REFRESH_MARGIN):
+        self.username = username
+        self.fetch = fetch # () -> token string; one call to the auth endpoint
+        self.path = path
+        self.margin = margin
+        self.cached = None # (token, expires_at)
+        self.refreshes = 0
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path) as f:
+                entry = json.load(f).get(self.username)
+        except (OSError, ValueError):
+            return None
+        return (entry['token'], entry['expires_at']) if entry else None
+
+    def _write(self, token, expires_at):
+        try:
+            with open(self.path) as f:
+                tokens = json.load(f)
+        except (OSError, ValueError):
+            tokens = {}
+        tokens[self.username] = {'token': token, 'expires_at': expires_at}
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump(tokens, f)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, self.path)
+
+    def token(self):
+        """A valid token, renewing it first if it is missing, expiring or expired."""
+        now = time.time()
+        cached = self.cached
+        if cached is None or cached[1] - now <= self.margin:
+            cached = self._read() or cached
+            self.cached = cached
+        if cached is not None and cached[1] - now > self.margin:
+            return cached[0]
+        if cached is not None and cached[1] > now:
+            # Due for renewal but still valid: renew unless someone already is
+            if not self._lock.acquire(blocking=False):
+                return cached[0]
+        else:
+            self._lock.acquire()
+        try:
+            return self._refresh()
+        finally:
+            self._lock.release()
+
+    def _refresh(self):
+        with open(f"{self.path}.lock", 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another thread or worker may have renewed while we waited
+                current = self._read()
+                if current is not None and current[1] - time.time() > self.margin:
+                    self.cached = current
+                    return current[0]
+                token = self.fetch()
+                expires_at = token_expiry(token) or time.time() + DEFAULT_TTL
+                self._write(token, expires_at)
+                self.cached = (token, expires_at)
+                self.refreshes += 1
+                return token
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def invalidate(self, token):
+        """Forgets `token` (rejected by the API) so the next token() renews it."""
+        with self._lock:
+            current = self._read()
+            if current is not None and current[0] == token:
+                self._write(token, 0)
+            if self.cached is not None and self.cached[0] == token:
+                self.cached = None
+
+_managers = {}
+_managers_lock = threading.Lock()
+
+def get_manager(username, fetch):
+    """The shared manager for `username` in this process."""
+    with _managers_lock:
+        manager = _managers.get(username)
+        if manager is None:
+            manager = _managers[username] = TokenManager(username, fetch)
+        return manager
+
+# A worker forked mid-renewal would inherit a lock nobody releases
+os.register_at_fork(after_in_child=_managers.clear)
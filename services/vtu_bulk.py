@@ -0,0 +1,243 @@
+"""
+Bulk VTU disbursement: airtime or data to many numbers at once
+(promotions, payroll top-ups) for admins and the corporate accounts in
+VTU_BULK_PHONES.
+
+- validate(service, text) parses a pasted list or CSV, one recipient per
+  line (`phone, network, amount` for airtime, `phone, network, plan` for
+  data), and returns the rows it accepts and the lines it rejects, with
+  the reason. A row repeating an earlier one (same number, network and
+  amount or plan) is kept, marked with the line it repeats: sending the
+  same top-up twice can be intended, so the submitter chooses (dedupe()).
+- submit(user, service, rows) debits the NGN wallet once for the total
+  (one VTU_BULK journal entry) and queues one VtuJob per row, all in one
+  database transaction. vtu_worker.py sends them with the single
+  purchases: at most VTU_BULK_CONCURRENCY batch rows at once, and queued
+  single purchases are always claimed first. Rows vtu.ng answers
+  ambiguously go to the reconciler, which requeries them; a failed row is
+  refunded on its own.
+- report(batch) / report_csv(batch) give the per-row results. The owner
+  gets one summary message when the last row is settled (row_settled).
+"""
+import csv
+import datetime
+import io
+import os
+import re
+import uuid
+import config
+import ledger
+import money
+from database import atomic_write, Transaction, VtuBatch, VtuJob
+from services import http_client, vtu_jobs, vtu_service
+
+MAX_ROWS = int(os.getenv("VTU_BULK_MAX_ROWS", 1000))
+MIN_AIRTIME = 100
+MAX_AIRTIME = int(os.getenv("VTU_BULK_MAX_AIRTIME", 50000)) # NGN per row
+BULK_PHONES = frozenset(p.strip() for p in os.getenv("VTU_BULK_PHONES", "").split(',') if p.strip())
+ADMIN_PHONES = frozenset(p.strip() for p in config.OWNER_PHONE.split(','))
+
+NETWORKS = {'mtn': 'MTN', 'airtel': 'Airtel', 'glo': 'Glo', '9mobile': '9mobile', 'etisalat': '9mobile'}
+PHONE_RE = re.compile(r'^0[789][01]\d{8}$')
+
+def allowed(user):
+    return user.phone in ADMIN_PHONES or user.phone in BULK_PHONES
+
+# --- VALIDATION ---
+
+def normalize_phone(raw):
+    """'0803 123 4567', '+2348031234567', '2348031234567' -> '08031234567' (None if invalid)."""
+    phone = re.sub(r'[\s\-()]', '', raw)
+    if phone.startswith('+234'):
+        phone = '0' + phone[4:]
+    elif phone.startswith('234') and len(phone) == 13:
+        phone = '0' + phone[3:]
+    return phone if PHONE_RE.match(phone) else None
+
+SEPARATORS = re.compile(r'[,;\t]')
+
+def _split(text):
+    # Comma/semicolon/tab separated (CSV export), else whitespace-separated (typed)
+    for line_no, line in enumerate(text.splitlines(), 1):
+        line = line.strip()
+        if line:
+            fields = SEPARATORS.split(line) if SEPARATORS.search(line) else line.split()
+            yield line_no, line, [f.strip().strip('"') for f in fields if f.strip()]
+
+def validate(service, text):
+    """
+    (rows, errors) for a pasted list. rows are dicts (line, target,
+    provider, amount in kobo, plan, variation_id, repeat_of: the line an
+    identical row was first seen on, or None); errors are (line_no, line,
+    reason). A header line is skipped.
+    """
+    service = service.lower()
+    rows, errors, seen = [], [], {}
+    prices = {} # (network, plan) -> (naira, variation_id); one catalog lookup per plan
+    for line_no, line, fields in _split(text):
+        if not rows and not errors and not any(ch.isdigit() for ch in line):
+            continue # header
+        if len(fields) != 3:
+            errors.append((line_no, line, "expected 3 columns: phone, network, " + ('amount' if service == 'airtime' else 'plan')))
+            continue
+        phone, network, value = fields
+        target = normalize_phone(phone)
+        if target is None:
+            errors.append((line_no, line, f"invalid phone number {phone}"))
+            continue
+        provider = NETWORKS.get(network.lower())
+        if provider is None:
+            errors.append((line_no, line, f"unknown network {network}"))
+            continue
+        plan, variation_id = None, None
+        if service == 'airtime':
+            try:
+                naira = int(value.replace('₦', '').replace(',', ''))
+            except ValueError:
+                errors.append((line_no, line, f"invalid amount {value}"))
+                continue
+            if not MIN_AIRTIME <= naira <= MAX_AIRTIME:
+                errors.append((line_no, line, f"amount must be ₦{MIN_AIRTIME:,}-₦{MAX_AIRTIME:,}"))
+                continue
+        else:
+            plan = value.upper()
+            if (provider, plan) not in prices:
+                prices[(provider, plan)] = vtu_service.get_data_plan_price(provider, plan)
+            naira, variation_id = prices[(provider, plan)]
+            if naira is None:
+                errors.append((line_no, line, f"no {provider} {plan} plan available"))
+                continue
+        key = (target, provider, naira, plan)
+        rows.append({'line': line_no, 'target': target, 'provider': provider, 'amount': money.to_minor(naira, 'NGN'),
+                     'plan': plan, 'variation_id': variation_id, 'repeat_of': seen.get(key)})
+        seen.setdefault(key, line_no)
+    if len(rows) > MAX_ROWS:
+        errors.append((rows[MAX_ROWS]['line'], '', f"more than {MAX_ROWS} rows; split the list"))
+        rows = rows[:MAX_ROWS]
+    return rows, errors
+
+def fetch_list(media_url):
+    """Text of a list uploaded to the chat (a CSV or text document hosted by Twilio)."""
+    auth = (os.getenv("TWILIO_ACCOUNT_SID"), os.getenv("TWILIO_AUTH_TOKEN"))
+    response = http_client.get(media_url, auth=auth if all(auth) else None)
+    response.raise_for_status()
+    return response.content.decode('utf-8-sig', errors='replace')
+
+def repeats(rows):
+    """The rows that repeat an earlier row of the list."""
+    return [row for row in rows if row.get('repeat_of')]
+
+def dedupe(rows):
+    """The rows without repeats: each number, network and amount (or plan) once."""
+    return [row for row in rows if not row.get('repeat_of')]
+
+def total(rows):
+    return sum(row['amount'] for row in rows)
+
+# --- SUBMISSION ---
+
+def submit(user, service, rows, reference=None):
+    """
+    Debits the total once and queues every row; returns the VtuBatch.
+    Raises ledger.InsufficientFunds (nothing is queued) or Wallet.DoesNotExist.
+    """
+    service = service.lower()
+    reference = reference or f"bulk_{uuid.uuid4().hex[:10]}"
+    amount = total(rows)
+    with atomic_write():
+        ledger.post('VTU_BULK', [(user, 'NGN', -amount), (ledger.VTU, 'NGN', amount)], memo=reference)
+        batch = VtuBatch.create(user=user, reference=reference, service=service, rows=len(rows), total=amount)
+        jobs = []
+        for i, row in enumerate(rows, 1):
+            # One Transaction per row, so each recipient shows (and settles) in the history
+            tx = Transaction.create(user=user, type=f'VTU_{service.upper()}', currency='NGN', amount=row['amount'],
+                                    status='pending', tx_hash=row['target'])
+            jobs.append({'tx': tx.id, 'user': user.id, 'batch': batch.id, 'request_id': f"{reference}_{i}",
+                         'service': service, 'provider': vtu_service.PROVIDER_SERVICE_IDS[row['provider']],
+                         'target': row['target'], 'amount': row['amount'], 'variation_id': row['variation_id']})
+        for start in range(0, len(jobs), 200):
+            VtuJob.insert_many(jobs[start:start + 200]).execute()
+    return batch
+
+def get_batch(reference, user=None):
+    """The batch with `reference` (owned by `user`, unless an admin asks), or None."""
+    batch = VtuBatch.get_or_none(VtuBatch.reference == reference.strip().lower())
+    if batch is None or (user is not None and batch.user_id != user.id and user.phone not in ADMIN_PHONES):
+        return None
+    return batch
+
+def requery(batch):
+    """Moves the batch's unsettled rows to the front of the reconciler's queue; returns how many."""
+    return (VtuJob.update(next_check_at=0)
+            .where(VtuJob.batch == batch, VtuJob.status == 'pending').execute())
+
+# --- REPORTS ---
+
+def report(batch):
+    """{'counts': {status: rows}, 'completed': kobo delivered, 'refunded': kobo refunded, 'rows': [...]}."""
+    rows = list(VtuJob.select(VtuJob.id, VtuJob.request_id, VtuJob.target, VtuJob.provider, VtuJob.amount,
+                              VtuJob.status, VtuJob.error)
+                .where(VtuJob.batch == batch).order_by(VtuJob.id).dicts())
+    counts = {}
+    for row in rows:
+        counts[row['status']] = counts.get(row['status'], 0) + 1
+    return {
+        'counts': counts,
+        'completed': sum(r['amount'] for r in rows if r['status'] == 'completed'),
+        'refunded': sum(r['amount'] for r in rows if r['status'] == 'refunded'),
+        'settled': all(r['status'] in vtu_jobs.SETTLED for r in rows),
+        'rows': rows,
+    }
+
+def report_csv(batch):
+    """One line per row: request_id, phone, network, amount, status, error."""
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(['request_id', 'phone', 'network', 'amount', 'status', 'error'])
+    for row in report(batch)['rows']:
+        writer.writerow([row['request_id'], row['target'], row['provider'], money.fmt(row['amount'], 'NGN', 2),
+                         row['status'], row['error'] or ''])
+    return out.getvalue()
+
+def format_report(batch, limit=15):
+    """Chat summary: progress and money, then the rows that failed or are still open."""
+    result = report(batch)
+    counts = result['counts']
+    lines = [
+        f"📦 *Bulk {batch.service.title()} {batch.reference}*",
+        "━━━━━━━━━━━━━━━━",
+        f"Rows: {batch.rows} | Total: ₦{money.fmt(batch.total, 'NGN', 2)}",
+        f"✅ Delivered: {counts.get('completed', 0)} (₦{money.fmt(result['completed'], 'NGN', 2)})",
+        f"❌ Refunded: {counts.get('refunded', 0)} (₦{money.fmt(result['refunded'], 'NGN', 2)})",
+    ]
+    open_rows = sum(n for status, n in counts.items() if status not in vtu_jobs.SETTLED)
+    if open_rows:
+        lines.append(f"⏳ In progress: {open_rows} ({counts.get('pending', 0)} awaiting requery)")
+    problems = [r for r in result['rows'] if r['status'] not in ('completed', 'queued', 'running')]
+    if problems:
+        lines.append("")
+        for row in problems[:limit]:
+            reason = f" - {row['error']}" if row['error'] else ""
+            lines.append(f"{row['target']} ₦{money.fmt(row['amount'], 'NGN', 2)}: {row['status']}{reason}")
+        if len(problems) > limit:
+            lines.append(f"...and {len(problems) - limit} more")
+    return "\n".join(lines)
+
+def row_settled(job):
+    """
+    Called as each batch row is settled; sends the summary once, when the
+    last row is. The conditional UPDATE makes sure only one caller sends it.
+    """
+    open_rows = VtuJob.select().where(VtuJob.batch == job.batch_id, VtuJob.status.not_in(vtu_jobs.SETTLED))
+    if open_rows.exists():
+        return False
+    batch = VtuBatch.get_by_id(job.batch_id)
+    claimed = (VtuBatch.update(reported_at=datetime.datetime.now())
+               .where(VtuBatch.id == batch.id, VtuBatch.reported_at.is_null()).execute())
+    if not claimed:
+        return False
+    from modules import notifications
+    summary = format_report(batch)
+    notifications.send_push(batch.user, summary + "\n\nFailed rows were refunded to your NGN wallet.")
+    notifications.notify_admins(f"📦 VTU BULK DONE: {batch.reference} by {batch.user.phone}\n" + summary)
+    return True
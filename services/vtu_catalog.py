@@ -0,0 +1,253 @@
+"""
+Local catalog of vtu.ng variations: data plans and TV bouquets per provider.
+
+Lists live in SQLite (VtuVariation, one VtuCatalogSync row per list with
+its ETag and fetch time) and in an immutable in-memory snapshot indexed by
+(kind, service_id) and, within a list, by variation_id and plan name.
+Lookups only read that snapshot, so a purchase never waits on a download;
+the one exception is a list this host has never fetched at all.
+
+A daemon thread re-fetches each list every refresh_interval seconds
+(+/- jitter), sending the stored ETag as If-None-Match so an unchanged list
+costs a 304. Before fetching it checks the list's age in the database:
+if another worker refreshed it already, it just reloads the rows. A lookup
+on a list older than refresh_interval wakes the thread early; lists older
+than stale_after are not served (a price that old may no longer be what
+vtu.ng charges).
+
+Electricity is not listed: vtu.ng has no variations endpoint for it, the
+meter type ('prepaid' / 'postpaid') is the variation.
+"""
+import os
+import random
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+from peewee import chunked
+import money
+from database import atomic_write, VtuVariation, VtuCatalogSync
+from services import http_client, vtu_service
+
+KINDS = {
+    'data': ('mtn', 'airtel', 'glo', '9mobile'),
+    'tv': ('dstv', 'gotv', 'startimes', 'showmax'),
+}
+REFRESH_INTERVAL = float(os.getenv("VTU_CATALOG_REFRESH", 900))
+STALE_AFTER = float(os.getenv("VTU_CATALOG_STALE_AFTER", 6 * 3600))
+
+Variation = namedtuple('Variation', 'variation_id name price available') # price: whole NGN
+CatalogList = namedtuple('CatalogList', 'variations by_id by_name fetched_at')
+
+def _catalog_list(variations, fetched_at):
+    variations = tuple(variations)
+    return CatalogList(variations,
+                       {v.variation_id: v for v in variations},
+                       {v.name.lower(): v for v in reversed(variations)}, # first listed wins
+                       fetched_at)
+
+def _variation_name(item):
+    return str(item.get('data_plan') or item.get('package_bouquet') or item.get('name') or '')
+
+class VtuCatalog:
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, stale_after=STALE_AFTER, jitter=0.1, start=True):
+        self.refresh_interval = refresh_interval
+        self.stale_after = stale_after
+        self.jitter = jitter
+        self.snapshot = MappingProxyType({}) # (kind, service_id) -> CatalogList; replaced, never mutated
+        self.fetches = 0
+        self.not_modified = 0
+        self.failures = 0
+        self._lock = threading.Lock() # one refresh at a time in this process
+        self._wake = threading.Event()
+        self._stop_event = threading.Event()
+        self.load()
+        self.thread = threading.Thread(target=self._update_loop, daemon=True)
+        if start:
+            self.thread.start()
+
+    # --- STORAGE ---
+
+    def load(self, kind=None, service_id=None):
+        """Publishes the stored lists (all, or one) from the database."""
+        syncs = VtuCatalogSync.select()
+        rows = VtuVariation.select().order_by(VtuVariation.kind, VtuVariation.service_id, VtuVariation.position)
+        if kind is not None:
+            syncs = syncs.where(VtuCatalogSync.kind == kind, VtuCatalogSync.service_id == service_id)
+            rows = rows.where(VtuVariation.kind == kind, VtuVariation.service_id == service_id)
+        lists = {(s.kind, s.service_id): [] for s in syncs}
+        fetched = {(s.kind, s.service_id): s.fetched_at for s in syncs}
+        for row in rows:
+            key = (row.kind, row.service_id)
+            if key in lists:
+                price = int(money.from_minor(row.price, 'NGN'))
+                lists[key].append(Variation(row.variation_id, row.name, price, row.available))
+        self._publish({key: _catalog_list(variations, fetched[key]) for key, variations in lists.items()})
+
+    def _publish(self, lists):
+        snapshot = dict(self.snapshot)
+        snapshot.update(lists)
+        # The only write readers can observe: one reference assignment
+        self.snapshot = MappingProxyType(snapshot)
+
+    def _store(self, kind, service_id, items, etag, now):
+        rows, seen = [], set()
+        for position, item in enumerate(items):
+            variation_id = str(item.get('variation_id'))
+            try:
+                price = money.to_minor(item.get('price', 0), 'NGN')
+            except ValueError:
+                continue
+            if variation_id in seen: # a list can repeat a variation; keep the first
+                continue
+            seen.add(variation_id)
+            rows.append({
+                'kind': kind,
+                'service_id': service_id,
+                'variation_id': variation_id,
+                'name': _variation_name(item),
+                'price': price,
+                'available': str(item.get('availability', 'available')).lower() == 'available',
+                'position': position,
+            })
+        with atomic_write():
+            VtuVariation.delete().where(VtuVariation.kind == kind, VtuVariation.service_id == service_id).execute()
+            for batch in chunked(rows, 100):
+                VtuVariation.insert_many(batch).execute()
+            self._touch(kind, service_id, etag, now)
+
+    def _touch(self, kind, service_id, etag, now):
+        (VtuCatalogSync
+         .insert(kind=kind, service_id=service_id, etag=etag, fetched_at=now)
+         .on_conflict(conflict_target=[VtuCatalogSync.kind, VtuCatalogSync.service_id],
+                      update={VtuCatalogSync.etag: etag, VtuCatalogSync.fetched_at: now})
+         .execute())
+
+    # --- REFRESH ---
+
+    def refresh(self, kind, service_id, force=False):
+        """
+        Re-fetches one list unless another worker did within refresh_interval
+        (force skips that check). Returns True if the list is fresh now.
+        """
+        with self._lock:
+            try:
+                sync = VtuCatalogSync.get_or_none(VtuCatalogSync.kind == kind, VtuCatalogSync.service_id == service_id)
+                current = self.snapshot.get((kind, service_id))
+                if not force and sync is not None and time.time() - sync.fetched_at < self.refresh_interval:
+                    if current is None or current.fetched_at < sync.fetched_at:
+                        self.load(kind, service_id)
+                    return True
+                # Only revalidate what we actually hold
+                headers = {'If-None-Match': sync.etag} if sync is not None and sync.etag and current is not None else {}
+                url = f"{vtu_service.API_URL}variations/{kind}?service_id={service_id}"
+                response = http_client.get(url, headers=headers)
+                now = time.time()
+                if response.status_code == 304:
+                    self._touch(kind, service_id, sync.etag, now)
+                    self._publish({(kind, service_id): current._replace(fetched_at=now)})
+                    self.not_modified += 1
+                    return True
+                response.raise_for_status()
+                body = response.json()
+                items = body.get('data')
+                if not isinstance(items, list) or not items:
+                    # Never replace a good list with an empty or error answer
+                    raise ValueError(body.get('message') or "empty variation list")
+                self._store(kind, service_id, items, response.headers.get('ETag'), now)
+                self.load(kind, service_id)
+            except Exception as e:
+                # vtu.ng or the database: either way the published prices stay as they are
+                self.failures += 1
+                print(f"[VtuCatalog] Refresh of {kind}/{service_id} failed: {e}")
+                return False
+            self.fetches += 1
+            return True
+
+    def refresh_all(self, force=False):
+        """Refreshes every list that is due; returns how many are fresh."""
+        return sum(self.refresh(kind, service_id, force)
+                   for kind, service_ids in KINDS.items() for service_id in service_ids)
+
+    def _update_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh_all()
+            except Exception as e:
+                print(f"[VtuCatalog] Refresh loop failed: {e}")
+            self._wake.wait(self.refresh_interval * random.uniform(1 - self.jitter, 1 + self.jitter))
+            self._wake.clear()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake.set()
+        if self.thread.is_alive():
+            self.thread.join()
+
+    # --- LOOKUPS ---
+
+    def _list(self, kind, service_id):
+        entry = self.snapshot.get((kind, service_id))
+        if entry is None:
+            # Never fetched on this host: the only lookup that waits on vtu.ng
+            self.refresh(kind, service_id)
+            entry = self.snapshot.get((kind, service_id))
+            if entry is None:
+                return None
+        age = time.time() - entry.fetched_at
+        if age > self.refresh_interval:
+            self._wake.set()
+        return entry if age <= self.stale_after else None
+
+    def variations(self, kind, service_id, available_only=True):
+        """The provider's variations in vtu.ng's order ([] if unknown or stale)."""
+        entry = self._list(kind, service_id)
+        if entry is None:
+            return []
+        return [v for v in entry.variations if v.available or not available_only]
+
+    def get(self, kind, service_id, variation_id):
+        """The variation with this id, or None."""
+        entry = self._list(kind, service_id)
+        return None if entry is None else entry.by_id.get(str(variation_id))
+
+    def find(self, kind, service_id, plan):
+        """
+        First available variation whose name is `plan` or contains it
+        (e.g. '1GB' matches '1GB - 30 days'), or None.
+        """
+        entry = self._list(kind, service_id)
+        if entry is None:
+            return None
+        plan = plan.lower()
+        variation = entry.by_name.get(plan)
+        if variation is not None and variation.available:
+            return variation
+        for variation in entry.variations:
+            if variation.available and plan in variation.name.lower():
+                return variation
+        return None
+
+    def status(self):
+        now = time.time()
+        return {f"{kind}/{service_id}": {'variations': len(entry.variations), 'age': now - entry.fetched_at}
+                for (kind, service_id), entry in sorted(self.snapshot.items())}
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """The shared catalog for this process; starts its refresher on first use."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = VtuCatalog()
+    return _catalog
+
+def _forget_catalog():
+    # The refresher thread does not survive a fork; the child starts its own
+    global _catalog
+    _catalog = None
+
+os.register_at_fork(after_in_child=_forget_catalog)
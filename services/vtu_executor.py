@@ -0,0 +1,266 @@
+"""
+One execution path for every vtu.ng purchase: airtime, data, TV,
+electricity, ePINs and betting funding.
+
+execute(product, request_id, send) runs `send(client)` with:
+
+- Idempotency: each request_id is recorded (VtuRequest) before it is
+  sent and its final answer stored, so executing it again returns that
+  answer instead of buying twice. An attempt whose outcome is unknown
+  (timeout, connection reset, 5xx after the request went out) is never
+  re-sent blind: the retry requeries the request_id first and only
+  re-sends if vtu.ng has no such order.
+- Retries with exponential backoff and full jitter, within `deadline`
+  seconds overall.
+- A circuit breaker per product: after `threshold` consecutive transport
+  failures it opens and calls fail at once with CircuitOpen for
+  `reset_timeout` seconds, then one probe decides whether it closes.
+  Business errors (vtu.ng answered) count as successes for the breaker.
+- A latency histogram per product (fixed buckets, with outcome counts).
+"""
+import datetime
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from peewee import IntegrityError
+from database import db, VtuRequest
+from services import http_client, vtu_service
+
+ATTEMPTS = int(os.getenv("VTU_ATTEMPTS", 3))
+BASE_DELAY = float(os.getenv("VTU_RETRY_BASE_DELAY", 0.5))
+MAX_DELAY = float(os.getenv("VTU_RETRY_MAX_DELAY", 8))
+DEADLINE = float(os.getenv("VTU_DEADLINE", 30)) # seconds one execute() may take, retries included
+BREAKER_THRESHOLD = int(os.getenv("VTU_BREAKER_THRESHOLD", 5))
+BREAKER_RESET = float(os.getenv("VTU_BREAKER_RESET", 30))
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30) # seconds; one more bucket for slower
+
+class CircuitOpen(Exception):
+    """vtu.ng is failing for this product; the call was not sent."""
+
+def is_transient(error):
+    """Transport failures and 429/5xx: vtu.ng may be down, the outcome is unknown."""
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return response.status_code == 429 or response.status_code >= 500
+    return isinstance(error, http_client.RequestException)
+
+class CircuitBreaker:
+    def __init__(self, threshold=None, reset_timeout=None):
+        self.threshold = threshold or BREAKER_THRESHOLD
+        self.reset_timeout = BREAKER_RESET if reset_timeout is None else reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+        self.trips = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'open' if time.monotonic() - self.opened_at < self.reset_timeout else 'half-open'
+
+    def allow(self):
+        """True if a call may go out now (closed, or the single half-open probe)."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_timeout or self.probing:
+                return False
+            self.probing = True
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probing = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probing or self.failures >= self.threshold:
+                if self.opened_at is None or self.probing:
+                    self.trips += 1
+                self.opened_at = time.monotonic()
+            self.probing = False
+
+class LatencyHistogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.outcomes = {}
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, outcome):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+            self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (inf past the last)."""
+        count = sum(self.counts)
+        if not count:
+            return 0.0
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= q * count:
+                return self.buckets[i] if i < len(self.buckets) else float('inf')
+
+    def snapshot(self):
+        count = sum(self.counts)
+        return {
+            'count': count,
+            'mean': self.total / count if count else 0.0,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+            'buckets': dict(zip([*self.buckets, float('inf')], self.counts)),
+            'outcomes': dict(self.outcomes),
+        }
+
+@contextmanager
+def _connected():
+    # Borrows a pooled connection unless the calling thread already holds one
+    opened = db.is_closed() and db.connect()
+    try:
+        yield
+    finally:
+        if opened:
+            db.close()
+
+class IdempotencyStore:
+    def begin(self, request_id, product):
+        """
+        Records an attempt. Returns ('new', None), ('sending', None) when an
+        earlier attempt's outcome is unknown, or ('done', response).
+        """
+        with _connected():
+            try:
+                VtuRequest.create(request_id=request_id, product=product)
+                return 'new', None
+            except IntegrityError:
+                row = VtuRequest.get(VtuRequest.request_id == request_id)
+                return row.status, json.loads(row.response) if row.response else None
+
+    def finish(self, request_id, response):
+        with _connected():
+            (VtuRequest.update(status='done', response=json.dumps(response), updated_at=datetime.datetime.now())
+             .where(VtuRequest.request_id == request_id).execute())
+
+class VtuExecutor:
+    def __init__(self, client=None, store=None, attempts=None, base_delay=None, max_delay=None, deadline=None,
+                 breaker_threshold=None, breaker_reset=None):
+        self.client = client or vtu_service.VTUApiClient()
+        self.store = store or IdempotencyStore()
+        self.attempts = attempts or ATTEMPTS
+        self.base_delay = BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = MAX_DELAY if max_delay is None else max_delay
+        self.deadline = DEADLINE if deadline is None else deadline
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self.breakers = {}   # product -> CircuitBreaker
+        self.histograms = {} # product -> LatencyHistogram
+        self._lock = threading.Lock()
+
+    def breaker(self, product):
+        breaker = self.breakers.get(product)
+        if breaker is None:
+            with self._lock:
+                breaker = self.breakers.setdefault(product, CircuitBreaker(self.breaker_threshold, self.breaker_reset))
+        return breaker
+
+    def histogram(self, product):
+        histogram = self.histograms.get(product)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(product, LatencyHistogram())
+        return histogram
+
+    def available(self, product):
+        return self.breaker(product).state != 'open'
+
+    def _find(self, request_id):
+        """vtu.ng's answer for an order sent earlier, or None if it has no such order."""
+        response = self.client.requery_order(request_id)
+        return response if response.get('code') == 'success' else None
+
+    def execute(self, product, request_id, send, attempts=None):
+        """
+        vtu.ng's answer for the purchase `send(client)` (which must use
+        request_id). Raises CircuitOpen while the product's breaker is open,
+        or the last error once attempts or the deadline run out.
+        """
+        started = time.monotonic()
+        histogram = self.histogram(product)
+        state, stored = self.store.begin(request_id, product)
+        if state == 'done':
+            histogram.observe(time.monotonic() - started, 'replayed')
+            return stored
+        breaker = self.breaker(product)
+        uncertain = state == 'sending' # an earlier attempt may have reached vtu.ng
+        attempts = attempts or self.attempts
+        for attempt in range(attempts):
+            if not breaker.allow():
+                histogram.observe(time.monotonic() - started, 'rejected')
+                raise CircuitOpen(f"vtu.ng {product} unavailable, retry in {breaker.reset_timeout:.0f}s")
+            try:
+                response = self._find(request_id) if uncertain else None
+                if response is None:
+                    response = send(self.client)
+            except Exception as e:
+                if not is_transient(e):
+                    breaker.success() # vtu.ng answered; it just said no
+                    response = getattr(e, 'response', None)
+                    if response is None:
+                        histogram.observe(time.monotonic() - started, 'error')
+                        raise
+                    try:
+                        body = response.json()
+                    except ValueError:
+                        body = {'code': 'error', 'message': f"HTTP {response.status_code}"}
+                    self.store.finish(request_id, body)
+                    histogram.observe(time.monotonic() - started, 'failed')
+                    return body
+                breaker.failure()
+                uncertain = True
+                delay = min(self.max_delay, self.base_delay * 2 ** attempt) * random.random()
+                if attempt == attempts - 1 or time.monotonic() - started + delay > self.deadline:
+                    histogram.observe(time.monotonic() - started, 'error')
+                    raise
+                time.sleep(delay)
+                continue
+            breaker.success()
+            self.store.finish(request_id, response)
+            histogram.observe(time.monotonic() - started, 'ok' if response.get('code') == 'success' else 'failed')
+            return response
+
+    def stats(self):
+        """{product: histogram snapshot + breaker state and trips}."""
+        return {product: {**histogram.snapshot(), 'breaker': self.breaker(product).state,
+                          'trips': self.breaker(product).trips}
+                for product, histogram in sorted(self.histograms.items())}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """The shared executor for this process."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = VtuExecutor()
+    return _executor
+
+def execute(product, request_id, send, attempts=None):
+    return get_executor().execute(product, request_id, send, attempts)
+
+def stats():
+    return get_executor().stats()
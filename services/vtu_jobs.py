@@ -0,0 +1,332 @@
+"""
+Durable queue of VTU purchases (airtime, data) sent to vtu.ng outside the
+webhook.
+
+The chat flow debits the wallet, records the pending VTU_* Transaction and
+enqueue()s a VtuJob in the same database transaction, then answers at once
+with the job's request_id as the reference. The vtu_worker.py process runs:
+
+- WorkerPool: claims queued jobs (a conditional UPDATE, so two pools never
+  take the same job) and sends the purchases on a thread pool, at most
+  `workers` at once and at most the provider's limit per provider
+  (VTU_PROVIDER_LIMIT, per provider in VTU_PROVIDER_LIMITS="mtn=8,glo=2").
+  Rows of a bulk batch (services/vtu_bulk.py) take at most
+  VTU_BULK_CONCURRENCY of those slots, and queued single purchases are
+  claimed before them, so a large batch never holds up a user's top-up.
+- Reconciler: requeries jobs vtu.ng has not settled yet ('pending') in
+  concurrent batches and finalizes or refunds them. A purchase that failed
+  in transit (timeout, 5xx) may still have been executed, so it is never
+  refunded blind: it goes to the reconciler, and only an order vtu.ng
+  reports failed, or still does not know VTU_STUCK_AFTER seconds after it
+  was sent, is refunded. Jobs left 'running' by a worker that died are
+  handed to the reconciler the same way.
+
+Every transition is a conditional UPDATE on the job's status, so the pool
+and the reconciler can race on a job and only one of them settles it.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from peewee import fn
+import ledger
+import money
+from database import db, atomic_write, User, Transaction, VtuJob
+from services import vtu_executor, vtu_service
+
+WORKERS = int(os.getenv("VTU_WORKERS", 16))
+PROVIDER_LIMIT = int(os.getenv("VTU_PROVIDER_LIMIT", 4))
+PROVIDER_LIMITS = {name.strip(): int(limit) for name, _, limit in
+                   (item.partition('=') for item in os.getenv("VTU_PROVIDER_LIMITS", "").split(',') if '=' in item)}
+POLL_INTERVAL = float(os.getenv("VTU_POLL_INTERVAL", 0.5))
+REQUERY_DELAY = float(os.getenv("VTU_REQUERY_DELAY", 30)) # first requery; doubles per attempt
+REQUERY_MAX_DELAY = 3600
+REQUERY_BATCH = int(os.getenv("VTU_REQUERY_BATCH", 50))
+RECONCILE_INTERVAL = float(os.getenv("VTU_RECONCILE_INTERVAL", 15))
+STUCK_AFTER = float(os.getenv("VTU_STUCK_AFTER", 300)) # 'running' this long: the worker died
+BULK_CONCURRENCY = int(os.getenv("VTU_BULK_CONCURRENCY", 8)) # batch rows sent at once, across providers
+
+SETTLED = ('completed', 'refunded')
+SERVICES = ('airtime', 'data')
+
+def enqueue(tx, user, request_id, service, provider, target, amount, variation_id=None):
+    """
+    Queues a purchase. Call inside the transaction that debited the wallet
+    and created `tx`, so the debit and the job commit together.
+    """
+    return VtuJob.create(tx=tx, user=user, request_id=request_id, service=service.lower(), provider=provider,
+                         target=target, amount=amount, variation_id=variation_id)
+
+FINAL_FAILURES = ('failed', 'refunded', 'reversed', 'cancelled')
+
+def _succeeded(response):
+    return response.get('code') == 'success' or response.get('status') == 'success'
+
+def _order_status(response):
+    data = response.get('data')
+    status = str(data.get('status', 'completed') if isinstance(data, dict) else 'completed').lower()
+    if status.startswith(('completed', 'successful', 'delivered')):
+        return 'completed'
+    if status.startswith(FINAL_FAILURES):
+        return 'failed'
+    return 'processing'
+
+def outcome(response):
+    """'completed', 'processing' or 'failed' for a purchase answer (vtu.ng refusing the order is final)."""
+    if not _succeeded(response):
+        return 'failed'
+    return _order_status(response)
+
+def requery_outcome(response, sent_ago, stuck_after=STUCK_AFTER):
+    """
+    'completed', 'processing' or 'failed' for a requery answer. Only an
+    order vtu.ng reports failed/refunded/reversed/cancelled, or one it still
+    does not know `stuck_after` seconds after it was sent, is 'failed'. Any
+    other refusal (rate limit, expired token, maintenance, an order not
+    visible yet) says nothing about the order: 'processing', ask again.
+    """
+    if not _succeeded(response):
+        not_found = 'not found' in str(response.get('message', '')).lower()
+        return 'failed' if not_found and sent_ago > stuck_after else 'processing'
+    return _order_status(response)
+
+# --- SETTLEMENT ---
+
+def notify_user(job, text, admin_text=None):
+    if job.batch_id:
+        # Bulk rows: one summary when the batch is done, not a message per row
+        from services import vtu_bulk
+        vtu_bulk.row_settled(job)
+        return
+    from modules import notifications
+    user = User.get_by_id(job.user_id)
+    notifications.send_push(user, text)
+    if admin_text:
+        notifications.notify_admins(admin_text)
+
+def _describe(job):
+    naira = money.from_minor(job.amount, 'NGN')
+    return f"{job.service.title()} ₦{naira:,.2f} for {job.target}"
+
+def finalize(job, notify=notify_user):
+    """Marks the job and its Transaction completed. False if already settled."""
+    with atomic_write():
+        claimed = (VtuJob.update(status='completed', error=None)
+                   .where(VtuJob.id == job.id, VtuJob.status.not_in(SETTLED)).execute())
+        if not claimed:
+            return False
+        Transaction.update(status='completed').where(Transaction.id == job.tx_id).execute()
+    notify(job,
+           f"📱 *{job.service.title()} Purchase Successful*\n"
+           "━━━━━━━━━━━━━━━━\n"
+           f"Amount: ₦{money.from_minor(job.amount, 'NGN'):,.2f}\n"
+           f"Recipient: {job.target}\n"
+           f"Reference: {job.request_id}\n\n"
+           "Thank you for using PPAY!",
+           f"📱 VTU SUCCESS: {_describe(job)} ({job.request_id})")
+    return True
+
+def refund(job, reason, notify=notify_user):
+    """Credits the debit back and fails the Transaction. False if already settled."""
+    with atomic_write():
+        claimed = (VtuJob.update(status='refunded', error=str(reason)[:255])
+                   .where(VtuJob.id == job.id, VtuJob.status.not_in(SETTLED)).execute())
+        if not claimed:
+            return False
+        ledger.post('VTU_REFUND', [(ledger.VTU, 'NGN', -job.amount), (job.user_id, 'NGN', job.amount)], memo=job.target)
+        Transaction.update(status='failed').where(Transaction.id == job.tx_id).execute()
+    notify(job, f"❌ {_describe(job)} failed: {reason}. Your balance was refunded.\nReference: {job.request_id}")
+    return True
+
+def defer(job, reason, delay=REQUERY_DELAY):
+    """Leaves the job to the reconciler, which requeries it after `delay` seconds."""
+    (VtuJob.update(status='pending', next_check_at=time.time() + delay, error=str(reason)[:255] if reason else None)
+     .where(VtuJob.id == job.id, VtuJob.status.not_in(SETTLED)).execute())
+
+def settle(job, result, message, notify=notify_user):
+    if result == 'completed':
+        return finalize(job, notify)
+    if result == 'failed':
+        return refund(job, message or "provider error", notify)
+    defer(job, message, min(REQUERY_DELAY * 2 ** job.attempts, REQUERY_MAX_DELAY))
+    return False
+
+# --- WORKERS ---
+
+class WorkerPool:
+    def __init__(self, workers=None, limits=None, default_limit=None, poll_interval=None, bulk_limit=None,
+                 notify=notify_user):
+        self.workers = workers or WORKERS
+        self.limits = PROVIDER_LIMITS if limits is None else limits
+        self.default_limit = default_limit or PROVIDER_LIMIT
+        self.bulk_limit = bulk_limit or BULK_CONCURRENCY
+        self.bulk_inflight = 0
+        self.poll_interval = POLL_INTERVAL if poll_interval is None else poll_interval
+        self.notify = notify
+        self.inflight = {} # provider -> purchases being sent
+        self.results = {'completed': 0, 'processing': 0, 'failed': 0, 'error': 0}
+        self.latencies = deque(maxlen=10000) # queued -> vtu.ng answered
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="vtu")
+
+    def limit(self, provider):
+        return self.limits.get(provider, self.default_limit)
+
+    def claim(self, provider, count, services=SERVICES, bulk=False):
+        """Takes up to `count` of the provider's oldest queued jobs for `services` (batch rows if `bulk`)."""
+        if count <= 0:
+            return []
+        oldest = (VtuJob.select(VtuJob.id)
+                  .where(VtuJob.status == 'queued', VtuJob.provider == provider, VtuJob.service.in_(services),
+                         VtuJob.batch.is_null(not bulk))
+                  .order_by(VtuJob.id).limit(count))
+        return list(VtuJob
+                    .update(status='running', claimed_at=time.time())
+                    .where(VtuJob.id.in_(oldest) & (VtuJob.status == 'queued'))
+                    .returning(VtuJob)
+                    .execute())
+
+    def poll(self):
+        """Claims and starts as many queued jobs as the limits allow; returns how many."""
+        started = 0
+        # Leave jobs queued while vtu.ng is failing for their product
+        services = [s for s in SERVICES if vtu_executor.get_executor().available(s)]
+        if not services:
+            return 0
+        providers = [p for (p,) in VtuJob.select(VtuJob.provider).where(VtuJob.status == 'queued').distinct().tuples()]
+        for provider in providers:
+            with self._lock:
+                free = min(self.limit(provider) - self.inflight.get(provider, 0),
+                           self.workers - sum(self.inflight.values()))
+            if free <= 0:
+                continue
+            jobs = self.claim(provider, free, services)
+            with self._lock:
+                bulk_free = min(free - len(jobs), self.bulk_limit - self.bulk_inflight)
+            jobs += self.claim(provider, bulk_free, services, bulk=True)
+            for job in jobs:
+                with self._lock:
+                    self.inflight[provider] = self.inflight.get(provider, 0) + 1
+                    if job.batch_id:
+                        self.bulk_inflight += 1
+                self._executor.submit(self._run, job)
+                started += 1
+        return started
+
+    def _purchase(self, job):
+        if job.service == 'airtime':
+            naira = int(money.from_minor(job.amount, 'NGN'))
+            send = lambda client: client.purchase_airtime(job.request_id, job.target, job.provider, naira)
+        else:
+            send = lambda client: client.purchase_data(job.request_id, job.target, job.provider, job.variation_id)
+        # One attempt: a job whose outcome is unknown goes to the reconciler
+        return vtu_executor.execute(job.service, job.request_id, send, attempts=1)
+
+    def _run(self, job):
+        try:
+            try:
+                response = self._purchase(job)
+                result, message = outcome(response), response.get('message')
+            except vtu_executor.CircuitOpen:
+                # Never sent: back in the queue until the breaker lets calls through
+                with db.connection_context():
+                    (VtuJob.update(status='queued', claimed_at=None)
+                     .where(VtuJob.id == job.id, VtuJob.status == 'running').execute())
+                return
+            except Exception as e:
+                # The order may or may not have reached vtu.ng: the requery decides
+                result, message = 'error', str(e)
+            finally:
+                with self._lock:
+                    self.inflight[job.provider] -= 1
+                    if job.batch_id:
+                        self.bulk_inflight -= 1
+            with self._lock:
+                self.results[result] += 1
+            self.latencies.append(time.time() - job.created_at.timestamp())
+            with db.connection_context():
+                settle(job, result, message, self.notify)
+        except Exception as e:
+            print(f"❌ [VTU] Job {job.request_id} could not be settled: {e}")
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                with db.connection_context():
+                    started = self.poll()
+            except Exception as e:
+                print(f"⚠️ [VTU] Worker poll failed: {e}")
+                started = 0
+            if not started:
+                stop_event.wait(self.poll_interval)
+
+    def drain(self):
+        """Waits for the purchases already started."""
+        self._executor.shutdown(wait=True)
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+        pct = lambda values, q: values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+        with self._lock:
+            inflight = {p: n for p, n in self.inflight.items() if n}
+        return {**self.results, 'inflight': inflight, 'bulk_inflight': self.bulk_inflight,
+                'p50': pct(latencies, 0.5), 'p99': pct(latencies, 0.99)}
+
+# --- RECONCILER ---
+
+class Reconciler:
+    def __init__(self, batch=None, concurrency=8, interval=None, stuck_after=None, notify=notify_user):
+        self.batch = batch or REQUERY_BATCH
+        self.interval = RECONCILE_INTERVAL if interval is None else interval
+        self.stuck_after = STUCK_AFTER if stuck_after is None else stuck_after
+        self.notify = notify
+        self.requeries = 0
+        self.finalized = 0
+        self.refunded = 0
+        self._executor = ThreadPoolExecutor(concurrency, thread_name_prefix="vtu-requery")
+
+    def _requery(self, job):
+        try:
+            response = vtu_service.VTUApiClient().requery_order(job.request_id)
+        except Exception as e:
+            return None, str(e)
+        sent_at = job.claimed_at or job.created_at.timestamp()
+        return requery_outcome(response, time.time() - sent_at, self.stuck_after), response.get('message')
+
+    def run_once(self):
+        """Requeries one batch of due jobs; returns how many were settled."""
+        now = time.time()
+        (VtuJob.update(status='pending', next_check_at=now)
+         .where(VtuJob.status == 'running', VtuJob.claimed_at < now - self.stuck_after).execute())
+        jobs = list(VtuJob.select()
+                    .where(VtuJob.status == 'pending', VtuJob.next_check_at <= now)
+                    .order_by(VtuJob.next_check_at).limit(self.batch))
+        settled = 0
+        for job, (result, message) in zip(jobs, self._executor.map(self._requery, jobs)):
+            self.requeries += 1
+            if result in (None, 'processing'):
+                # Not settled yet, or vtu.ng unreachable: ask again later, backing off
+                job.attempts += 1
+                VtuJob.update(attempts=job.attempts).where(VtuJob.id == job.id).execute()
+                result = 'processing'
+            if settle(job, result, message, self.notify):
+                settled += 1
+                if result == 'completed':
+                    self.finalized += 1
+                else:
+                    self.refunded += 1
+        return settled
+
+    def run(self, stop_event):
+        while not stop_event.is_set():
+            try:
+                with db.connection_context():
+                    self.run_once()
+            except Exception as e:
+                print(f"⚠️ [VTU] Reconcile failed: {e}")
+            stop_event.wait(self.interval)
+
+def counts():
+    """{status: jobs} across the queue."""
+    return dict(VtuJob.select(VtuJob.status, fn.COUNT(VtuJob.id)).group_by(VtuJob.status).tuples())
@@ -2,7 +2,7 @@ from dotenv import load_dotenv
 load_dotenv()
 # VTU.ng API Integration
 import os
-import requests
+from services import http_client, vtu_auth
 import hmac
 import hashlib
 import json
@@ -16,37 +16,53 @@ class VTUApiClient:
         self.password = password or os.getenv("VTU_PASSWORD", "your_vtu_password")
         self.user_pin = user_pin or os.getenv("VTU_USER_PIN", "your_user_pin")
         self.token = None
+        # JWT shared by every client, thread and worker (see services/vtu_auth.py)
+        self.tokens = vtu_auth.get_manager(self.username, self._authenticate)
 
-    def get_access_token(self):
+    def _authenticate(self):
+        """One round trip to the JWT endpoint; returns a fresh token."""
         payload = {"username": self.username, "password": self.password}
         headers = {"Content-Type": "application/json"}
         try:
-            response = requests.post(AUTH_URL, json=payload, headers=headers)
+            response = http_client.post(AUTH_URL, json=payload, headers=headers, idempotent=True)
             print(f"[DEBUG] Auth POST {AUTH_URL} status={response.status_code}")
-            print(f"[DEBUG] Auth response: {response.text}")
             response.raise_for_status()
             data = response.json()
             if "token" in data:
-                self.token = data["token"]
-                return self.token
+                return data["token"]
             raise Exception(data.get("message", "Authentication failed"))
         except Exception as e:
             print(f"[DEBUG] Auth exception: {e}")
             raise
 
+    def get_access_token(self):
+        self.token = self.tokens.token()
+        return self.token
+
     def get_headers(self):
-        if not self.token:
-            self.get_access_token()
         return {
-            "Authorization": f"Bearer {self.token}",
+            "Authorization": f"Bearer {self.get_access_token()}",
             "Content-Type": "application/json"
         }
 
-    def check_balance(self):
-        response = requests.get(f"{API_URL}balance", headers=self.get_headers())
+    def _send(self, method, url, payload=None, idempotent=None):
+        """
+        Authenticated call. A token the API rejects (401/403) is dropped and
+        the call is sent once more with a renewed one; a rejected request
+        was never executed, so this is safe for purchases too.
+        """
+        for attempt in range(2):
+            headers = self.get_headers()
+            response = http_client.request(method, url, json=payload, headers=headers, idempotent=idempotent)
+            if response.status_code not in (401, 403) or attempt:
+                break
+            self.tokens.invalidate(self.token)
         response.raise_for_status()
         return response.json()
 
+    def check_balance(self):
+        return self._send('GET', f"{API_URL}balance")
+
     def purchase_airtime(self, request_id, phone, service_id, amount):
         payload = {
             "request_id": request_id,
@@ -54,16 +70,14 @@ class VTUApiClient:
             "service_id": service_id,
             "amount": amount
         }
-        response = requests.post(f"{API_URL}airtime", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}airtime", payload)
 
     def get_data_variations(self, service_id=None):
         # Corrected endpoint and parameter for VTU.ng API v2
         url = f"{API_URL}variations/data"
         if service_id:
             url += f"?service_id={service_id}"
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
         return response.json()
 
@@ -74,17 +88,13 @@ class VTUApiClient:
             "service_id": service_id,
             "variation_id": variation_id
         }
-        response = requests.post(f"{API_URL}data", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}data", payload)
 
     def verify_customer(self, service_id, customer_id, variation_id=None):
         payload = {"customer_id": customer_id, "service_id": service_id}
         if variation_id:
             payload["variation_id"] = variation_id
-        response = requests.post(f"{API_URL}verify-customer", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}verify-customer", payload, idempotent=True)
 
     def purchase_electricity(self, request_id, customer_id, service_id, variation_id, amount):
         payload = {
@@ -94,9 +104,7 @@ class VTUApiClient:
             "variation_id": variation_id,
             "amount": amount
         }
-        response = requests.post(f"{API_URL}electricity", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}electricity", payload)
 
     def fund_betting_account(self, request_id, customer_id, service_id, amount):
         payload = {
@@ -105,15 +113,13 @@ class VTUApiClient:
             "service_id": service_id,
             "amount": amount
         }
-        response = requests.post(f"{API_URL}betting", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}betting", payload)
 
     def get_tv_variations(self, service_id=None):
         url = f"{API_URL}variations/tv"
         if service_id:
             url += f"?service_id={service_id}"
-        response = requests.get(url)
+        response = http_client.get(url)
         response.raise_for_status()
         return response.json()
 
@@ -128,9 +134,7 @@ class VTUApiClient:
             payload["subscription_type"] = subscription_type
         if amount:
             payload["amount"] = amount
-        response = requests.post(f"{API_URL}tv", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}tv", payload)
 
     def purchase_epins(self, request_id, service_id, value, quantity):
         payload = {
@@ -139,15 +143,11 @@ class VTUApiClient:
             "value": value,
             "quantity": quantity
         }
-        response = requests.post(f"{API_URL}epins", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}epins", payload)
 
     def requery_order(self, request_id):
         payload = {"request_id": request_id}
-        response = requests.post(f"{API_URL}requery", json=payload, headers=self.get_headers())
-        response.raise_for_status()
-        return response.json()
+        return self._send('POST', f"{API_URL}requery", payload, idempotent=True)
 
     def verify_webhook(self, payload, signature):
         computed_signature = hmac.new(
@@ -158,60 +158,36 @@ class VTUApiClient:
         return hmac.compare_digest(computed_signature, signature)
 
     def get_data_plan_price(self, provider, plan):
-        """
-        Fetch the live price and variation_id for a data plan from vtu.ng for the given provider and plan.
-        provider: 'MTN', 'Airtel', 'Glo', '9mobile'
-        plan: e.g. '500MB', '1GB', '2GB', '5GB'
-        Returns: (price as int, variation_id as str) or (None, None) if not found
-        """
-        provider_service_ids = {
-            'MTN': 'mtn',
-            'Airtel': 'airtel',
-            'Glo': 'glo',
-            '9mobile': '9mobile',
-        }
-        service_id = provider_service_ids.get(provider)
-        if not service_id:
-            return None, None
-        try:
-            client = VTUApiClient()
-            variations = client.get_data_variations(service_id)
-            for v in variations.get('data', []):
-                if plan.lower() in v.get('data_plan', '').lower() and v.get('availability', '').lower() == 'available':
-                    price = int(float(v.get('price', 0)))
-                    variation_id = str(v.get('variation_id'))
-                    return price, variation_id
-        except Exception as e:
-            print(f"[VTU] Error fetching data plan price: {e}")
-            return None, None
-        return None, None
+        return get_data_plan_price(provider, plan)
+
+# Network name (as shown in the menus) -> vtu.ng service_id
+PROVIDER_SERVICE_IDS = {
+    'MTN': 'mtn',
+    'Airtel': 'airtel',
+    'Glo': 'glo',
+    '9mobile': '9mobile',
+}
 
 def get_data_plan_price(provider, plan):
     """
-    Fetch the live price and variation_id for a data plan from vtu.ng for the given provider and plan.
+    Price and variation_id of a data plan, from the local catalog
+    (services/vtu_catalog.py) rather than a download per lookup.
+    provider: 'MTN', 'Airtel', 'Glo', '9mobile'
+    plan: e.g. '500MB', '1GB', '2GB', '5GB'
     Returns: (price as int, variation_id as str) or (None, None) if not found
     """
-    provider_service_ids = {
-        'MTN': 'mtn',
-        'Airtel': 'airtel',
-        'Glo': 'glo',
-        '9mobile': '9mobile',
-    }
-    service_id = provider_service_ids.get(provider)
+    from services import vtu_catalog
+    service_id = PROVIDER_SERVICE_IDS.get(provider)
     if not service_id:
         return None, None
     try:
-        client = VTUApiClient()
-        variations = client.get_data_variations(service_id)
-        for v in variations.get('data', []):
-            if plan.lower() in v.get('data_plan', '').lower() and v.get('availability', '').lower() == 'available':
-                price = int(float(v.get('price', 0)))
-                variation_id = str(v.get('variation_id'))
-                return price, variation_id
+        variation = vtu_catalog.get_catalog().find('data', service_id, plan)
     except Exception as e:
-        print(f"[VTU] Error fetching data plan price: {e}")
+        print(f"[VTU] Error looking up data plan price: {e}")
+        return None, None
+    if variation is None:
         return None, None
-    return None, None
+    return variation.price, variation.variation_id
 
 # Example usage:
 # vtu_client = VTUApiClient()
@@ -224,7 +200,6 @@ Production-grade VTU (Virtual Top-Up) Service Module Scaffold
 - Pluggable for any VTU API provider
 - Handles user balance deduction, transaction logging, and provider API integration
 """
-import requests
 import os
 from database import Transaction, db, Wallet
 
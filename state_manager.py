@@ -1,15 +1,39 @@
 # state_manager.py
-_sessions = {}
+"""
+Per-sender conversation state.
+
+Each sender has at most one record holding the active flow name and its
+step data, so get/set/clear/clear_all are single store operations. Records
+left idle for longer than SESSION_TTL seconds (users who never typed
+`cancel`) expire. The storage backend is chosen with SESSION_BACKEND
+(memory, sqlite or redis); see services/session_store.py.
+"""
+import os
+from services import session_store
+
+SESSION_TTL = int(os.getenv("SESSION_TTL", 1800))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+
+_store = session_store.create_store(SESSION_BACKEND, SESSION_TTL)
 
 def get_session(user_phone, flow_type):
-    return _sessions.get(f"{user_phone}_{flow_type}")
+    record = _store.get(user_phone)
+    if record is not None and record[0] == flow_type:
+        return record[1]
+    return None
+
+def get_active_flow(user_phone):
+    """Returns (flow_type, data) for the sender's current flow, or (None, None)."""
+    record = _store.get(user_phone)
+    if record is None:
+        return None, None
+    return record
 
 def set_session(user_phone, flow_type, data):
-    _sessions[f"{user_phone}_{flow_type}"] = data
+    _store.set(user_phone, flow_type, data)
 
 def clear_session(user_phone, flow_type):
-    _sessions.pop(f"{user_phone}_{flow_type}", None)
+    _store.delete(user_phone, flow_type)
 
 def clear_all_sessions(user_phone):
-    global _sessions
-    _sessions = {k: v for k, v in _sessions.items() if not k.startswith(f"{user_phone}_")}
\ No newline at end of file
+    _store.delete(user_phone)
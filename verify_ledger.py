@@ -0,0 +1,35 @@
+"""
+Audits the double-entry ledger in one streaming pass (see ledger.verify):
+balanced entries, wallet balances vs postings, snapshots vs postings.
+
+Usage: python verify_ledger.py [--snapshot]
+    --snapshot  also take fresh wallet snapshots after a clean audit
+"""
+import sys
+import time
+from database import db
+import ledger
+
+def run(snapshot=False):
+    db.connect(reuse_if_open=True)
+    start = time.perf_counter()
+    problems = ledger.verify()
+    elapsed = time.perf_counter() - start
+    if problems:
+        print(f"❌ Ledger verification found {len(problems)} problem(s) in {elapsed:.2f}s:")
+        for problem in problems[:50]:
+            print(f"   {problem}")
+        if len(problems) > 50:
+            print(f"   ... and {len(problems) - 50} more")
+        return False
+    print(f"✅ Ledger consistent ({elapsed:.2f}s)")
+    if snapshot:
+        print(f"📸 Snapshotted {ledger.take_snapshots()} wallet(s).")
+    return True
+
+if __name__ == "__main__":
+    try:
+        ok = run(snapshot='--snapshot' in sys.argv)
+    finally:
+        db.close()
+    sys.exit(0 if ok else 1)
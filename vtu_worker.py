@@ -0,0 +1,55 @@
+"""
+VTU purchase worker: sends the purchases queued by the chat flow to vtu.ng
+and reconciles the ones vtu.ng has not settled (see services/vtu_jobs.py).
+
+Usage: python vtu_worker.py
+"""
+import os
+import signal
+import threading
+from dotenv import load_dotenv
+load_dotenv()
+import database
+from services import http_client, vtu_executor, vtu_jobs
+
+HEARTBEAT_INTERVAL = int(os.getenv("VTU_HEARTBEAT_INTERVAL", 300))
+
+def status(pool, reconciler):
+    done = pool.stats()
+    inflight = ", ".join(f"{p} {n}" for p, n in sorted(done['inflight'].items())) or "idle"
+    if done['bulk_inflight']:
+        inflight += f" ({done['bulk_inflight']} bulk)"
+    queue = ", ".join(f"{s} {n}" for s, n in sorted(vtu_jobs.counts().items())) or "empty"
+    return (
+        f"queue: {queue} | sending: {inflight}\n"
+        f"   sent: {done['completed']} completed, {done['processing']} processing, {done['failed']} failed, "
+        f"{done['error']} errors, queued-to-answer p50/p99 {done['p50']:.2f}/{done['p99']:.2f}s\n"
+        f"   requery: {reconciler.requeries} sent, {reconciler.finalized} finalized, {reconciler.refunded} refunded"
+        + "".join(f"\n   {product}: {e['count']} calls, p50/p99 ≤{e['p50']}/≤{e['p99']}s, breaker {e['breaker']} "
+                  f"({e['trips']} trips)" for product, e in vtu_executor.stats().items())
+        + "".join(f"\n   http {host}: {h['requests']} req, {h['errors']} err, p50/p99 "
+                  f"{h['p50'] * 1000:.0f}/{h['p99'] * 1000:.0f}ms" for host, h in http_client.stats().items())
+    )
+
+if __name__ == "__main__":
+    database.init_db()
+    pool = vtu_jobs.WorkerPool()
+    reconciler = vtu_jobs.Reconciler()
+    print(f"🚀 PPAY VTU Worker Online ({pool.workers} workers, {pool.default_limit} per provider)")
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    threads = [threading.Thread(target=pool.run, args=(stop,), daemon=True),
+               threading.Thread(target=reconciler.run, args=(stop,), daemon=True)]
+    for t in threads:
+        t.start()
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            print(f"💓 VTU Heartbeat: {status(pool, reconciler)}")
+    except KeyboardInterrupt:
+        stop.set()
+    for t in threads:
+        t.join()
+    # Purchases already sent still get their answer recorded
+    pool.drain()
+    print("👋 VTU Worker stopped")